@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# Same default as settings (in production), so that the master and its workers agree on it. This
+# must be set before prometheus_client is imported anywhere, as it decides then
+# whether to keep metrics in files (otherwise workers inherit in-memory ones)
+METRICS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "pelotourney-metrics"),
+)
+
+
+def on_starting(server):
+    # Start with fresh metrics (files from old workers are otherwise summed forever)
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
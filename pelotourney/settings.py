@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 import dj_database_url
@@ -43,6 +47,8 @@ load_dotenv(os.path.join(BASE_DIR, ".env"))
 # SECURITY WARNING: don't run with debug turned on in production!
 ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 DEBUG = getenv_bool("DEBUG", True if ENVIRONMENT == "dev" else False)
+# Whether this is a `manage.py test` run
+TESTING = sys.argv[1:2] == ["test"]
 
 # Django Debug Toolbar
 # Only enabled if (a) it's installed and (b) DEBUG is set
@@ -99,6 +105,8 @@ MIDDLEWARE.extend(
         "django.contrib.messages.middleware.MessageMiddleware",
         "django.middleware.clickjacking.XFrameOptionsMiddleware",
         "django_structlog.middlewares.RequestMiddleware",
+        "tournaments.metrics.ViewContextMiddleware",
+        "tournaments.nplusone.NPlusOneMiddleware",
     ]
 )
 
@@ -227,6 +235,7 @@ LOGGING = {
 
 structlog.configure(
     processors=[
+        structlog.contextvars.merge_contextvars,
         structlog.stdlib.filter_by_level,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.stdlib.add_logger_name,
@@ -262,3 +271,93 @@ AUTHENTICATION_BACKENDS = {
 if ENVIRONMENT == "prod":
     SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", True)
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+
+# Tournament sync (background job queue processed by `manage.py sync_worker`)
+SYNC_WORKER_POLL_INTERVAL = float(os.getenv("SYNC_WORKER_POLL_INTERVAL", "2"))
+# Base delay (seconds) before retrying a failed sync; doubles with each attempt
+SYNC_JOB_RETRY_DELAY = int(os.getenv("SYNC_JOB_RETRY_DELAY", "30"))
+# Seconds without progress before a running sync is assumed abandoned by its worker
+SYNC_JOB_STALE_AFTER = int(os.getenv("SYNC_JOB_STALE_AFTER", "600"))
+# Number of participants whose Peloton data is fetched concurrently during a sync
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "8"))
+# Workouts stored per batch as a participant's pages arrive during a sync
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "200"))
+# Most queued syncs a worker claims and runs together (fetching shared riders once)
+SYNC_JOBS_PER_BATCH = int(os.getenv("SYNC_JOBS_PER_BATCH", "10"))
+
+# Automatic syncs of tournaments in progress (queued by `manage.py autosync`)
+AUTOSYNC_POLL_INTERVAL = float(os.getenv("AUTOSYNC_POLL_INTERVAL", "30"))
+# Estimated Peloton calls per minute the queued syncs may make (leaving room for others)
+AUTOSYNC_CALLS_PER_MINUTE = float(os.getenv("AUTOSYNC_CALLS_PER_MINUTE", "300"))
+# Seconds between syncs of tournaments with riders mid-workout (or recently active)...
+AUTOSYNC_MIN_INTERVAL = int(os.getenv("AUTOSYNC_MIN_INTERVAL", "120"))
+# ...doubling after each quiet sync, up to this
+AUTOSYNC_MAX_INTERVAL = int(os.getenv("AUTOSYNC_MAX_INTERVAL", "3600"))
+# How recent (in seconds) a workout must be for its tournament to count as active
+AUTOSYNC_RECENT_ACTIVITY = int(os.getenv("AUTOSYNC_RECENT_ACTIVITY", "1800"))
+
+# Seconds to trust the last check of a linked Peloton session before re-checking it
+PELOTON_SESSION_TTL = int(os.getenv("PELOTON_SESSION_TTL", "3600"))
+
+# Retries of failed (or throttled) GETs to the Peloton API, with jittered exponential backoff
+PELOTON_RETRY_ATTEMPTS = int(os.getenv("PELOTON_RETRY_ATTEMPTS", "4"))
+PELOTON_RETRY_BACKOFF = float(os.getenv("PELOTON_RETRY_BACKOFF", "0.5"))
+# Longest delay (seconds) worth waiting for, including any requested by `Retry-After`
+PELOTON_RETRY_MAX_DELAY = float(os.getenv("PELOTON_RETRY_MAX_DELAY", "30"))
+# Requests per second to the Peloton API, shared by all processes on a host (0 disables)
+PELOTON_RATE_LIMIT = float(os.getenv("PELOTON_RATE_LIMIT", "10"))
+PELOTON_RATE_LIMIT_BURST = float(os.getenv("PELOTON_RATE_LIMIT_BURST", "20"))
+PELOTON_RATE_LIMIT_STATE = os.getenv(
+    "PELOTON_RATE_LIMIT_STATE",
+    os.path.join(tempfile.gettempdir(), "pelotourney-peloton-rate-limit.json"),
+)
+# Directory caching rarely changing Peloton responses (rides, instructors), empty disables
+PELOTON_RESPONSE_CACHE_DIR = os.getenv(
+    "PELOTON_RESPONSE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "pelotourney-peloton-cache"),
+)
+PELOTON_RESPONSE_CACHE_MAX_BYTES = int(
+    os.getenv("PELOTON_RESPONSE_CACHE_MAX_BYTES", str(50 * 1024 * 1024))
+)
+
+# Caching (defaults to per-process memory; point at a shared cache in production)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# Seconds to keep rendered tournament page fragments (they're also versioned on edit/sync)
+TOURNAMENT_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv("TOURNAMENT_FRAGMENT_CACHE_TIMEOUT", "86400")
+)
+# Seconds to keep each rider's dashboard (also keyed by when its tournaments last changed)
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "3600"))
+
+# Metrics are shared by every process on a host (e.g. - gunicorn workers) through
+# files in this directory (prometheus_client reads it from the environment). Unless
+# it's configured, it's only used in production, and tests get their own for the run
+if TESTING:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+        prefix="pelotourney-metrics-"
+    )
+    atexit.register(shutil.rmtree, os.environ["PROMETHEUS_MULTIPROC_DIR"], True)
+elif ENVIRONMENT == "prod":
+    os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR",
+        os.path.join(tempfile.gettempdir(), "pelotourney-metrics"),
+    )
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+# Bearer token required to scrape /metrics (unless DEBUG is set)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# N+1 query detection: the fraction of requests checked, and how many near-identical
+# queries a request may make before it's logged (or raises, e.g. - in tests)
+NPLUSONE_SAMPLE_RATE = float(
+    os.getenv("NPLUSONE_SAMPLE_RATE", "1" if DEBUG else "0.01")
+)
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "5"))
+NPLUSONE_RAISE = getenv_bool("NPLUSONE_RAISE", False)
@@ -16,6 +16,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from tournaments.metrics import metrics
+
 from . import settings
 from .views import index, logout
 
@@ -27,6 +29,7 @@ urlpatterns = [
     path("accounts/", include("django.contrib.auth.urls")),
     path("social/", include("social_django.urls")),
     path("admin/", admin.site.urls),
+    path("metrics", metrics, name="metrics"),
 ]
 if settings.debug_toolbar:
     urlpatterns.append(path("__debug__/", include(settings.debug_toolbar.urls)))
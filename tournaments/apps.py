@@ -1,6 +1,33 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tournaments"
+
+    def ready(self):
+        from .external.metrics import RequestMetrics
+        from .external.peloton import DiskResponseCache, PelotonClient
+        from .external.throttling import RetryPolicy, TokenBucket
+        from .metrics import install_query_metrics
+
+        PelotonClient.retry_policy = RetryPolicy(
+            max_attempts=settings.PELOTON_RETRY_ATTEMPTS,
+            backoff=settings.PELOTON_RETRY_BACKOFF,
+            max_delay=settings.PELOTON_RETRY_MAX_DELAY,
+        )
+        if settings.PELOTON_RATE_LIMIT:
+            PelotonClient.rate_limiter = TokenBucket(
+                settings.PELOTON_RATE_LIMIT_STATE,
+                rate=settings.PELOTON_RATE_LIMIT,
+                capacity=settings.PELOTON_RATE_LIMIT_BURST,
+            )
+        if settings.PELOTON_RESPONSE_CACHE_DIR:
+            PelotonClient.response_cache = DiskResponseCache(
+                settings.PELOTON_RESPONSE_CACHE_DIR,
+                max_bytes=settings.PELOTON_RESPONSE_CACHE_MAX_BYTES,
+            )
+        PelotonClient.metrics = RequestMetrics()
+        connection_created.connect(install_query_metrics)
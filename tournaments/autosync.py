@@ -0,0 +1,195 @@
+"""Keeps the standings of tournaments in progress fresh without anyone clicking sync.
+
+Used by `manage.py autosync`, which queues `SyncJob`s (run by the usual
+`sync_worker`) as often as each tournament's riders' activity calls for.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import structlog
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import SyncCursor, SyncJob, Tournament, TournamentMember, TournamentRide
+
+logger = structlog.get_logger(__name__)
+
+
+class SyncBudget:
+    """Caps the (estimated) Peloton calls made by scheduled syncs, per minute.
+
+    A token bucket refilling at `calls_per_minute`, which may go into debt,
+    so that a tournament costing more than a minute's budget is still synced
+    (while everything else waits for the debt to be paid off).
+    """
+
+    def __init__(
+        self, calls_per_minute: float, clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = calls_per_minute / 60
+        self.capacity = calls_per_minute
+        self.tokens = calls_per_minute
+        self.clock = clock
+        self.updated_at = clock()
+
+    def available(self) -> float:
+        now = self.clock()
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+        return self.tokens
+
+    def spend(self, calls: float) -> None:
+        self.available()
+        self.tokens -= calls
+
+
+class TournamentActivity(NamedTuple):
+    """What the last syncs of a tournament found (from its `SyncCursor`s)."""
+
+    riders: int
+    rides: int
+    # Riders never synced, or with workouts that weren't yet `COMPLETED`
+    in_progress: int
+    latest_workout_at: Optional[datetime]
+
+    @property
+    def estimated_calls(self) -> int:
+        """A rough count of the Peloton calls a sync would make.
+
+        Each rider takes a profile and (usually) a single page of workouts,
+        plus another page or so if they were mid-workout.
+        """
+        return self.rides + 2 * self.riders + self.in_progress
+
+
+class AutoSyncScheduler:
+    """Decides when to sync each tournament in progress.
+
+    Tournaments with riders mid-workout, or a workout newer than `recent`,
+    are synced every `min_interval`.  Otherwise, each sync turning up nothing
+    new doubles the time until the next one (up to `max_interval`).  Syncs
+    are queued most overdue first, for as long as `budget` has calls to spare.
+    """
+
+    def __init__(
+        self,
+        budget: SyncBudget,
+        min_interval: timedelta,
+        max_interval: timedelta,
+        recent: timedelta,
+    ):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.recent = recent
+        # The interval and activity each tournament was last scheduled with
+        self.intervals: Dict[int, timedelta] = {}
+        self.activity: Dict[int, Optional[datetime]] = {}
+
+    def tick(self, now: datetime = None) -> List[SyncJob]:
+        """Queues syncs for the tournaments that are due, returning their jobs."""
+        now = now or timezone.now()
+        tournaments = list(
+            active_tournaments(now).exclude(
+                sync_jobs__status__in=SyncJob.PENDING_STATUSES
+            )
+        )
+        activity = tournament_activity(tournaments)
+
+        due = []
+        for tournament in tournaments:
+            interval = self.interval(tournament, activity[tournament.pk], now)
+            if tournament.last_synced:
+                overdue = now - (tournament.last_synced + interval)
+                if overdue < timedelta(0):
+                    continue
+            else:
+                overdue = timedelta.max
+            due.append((overdue, tournament, interval))
+        due.sort(key=lambda item: item[0], reverse=True)
+
+        jobs = []
+        for overdue, tournament, interval in due:
+            if self.budget.available() <= 0:
+                logger.info("Sync budget spent", waiting=len(due) - len(jobs))
+                break
+            self.budget.spend(activity[tournament.pk].estimated_calls)
+            self.intervals[tournament.pk] = interval
+            self.activity[tournament.pk] = activity[tournament.pk].latest_workout_at
+            # Sync as one of the tournament's admins, if any have linked Peloton
+            requested_by = next(
+                (admin for admin in tournament.admins if admin.peloton_session_id),
+                None,
+            )
+            jobs.append(SyncJob.enqueue(tournament, requested_by=requested_by))
+            logger.info(
+                "Queued sync",
+                tournament=tournament.uid,
+                interval=interval.total_seconds(),
+                estimated_calls=activity[tournament.pk].estimated_calls,
+            )
+        return jobs
+
+    def interval(
+        self, tournament: Tournament, activity: TournamentActivity, now: datetime
+    ) -> timedelta:
+        """Returns how long after its last sync the tournament should be synced."""
+        latest = activity.latest_workout_at
+        if (
+            tournament.pk not in self.intervals
+            or activity.in_progress
+            or (latest and latest >= now - self.recent)
+            or latest != self.activity[tournament.pk]
+        ):
+            return self.min_interval
+        return min(self.max_interval, self.intervals[tournament.pk] * 2)
+
+
+def active_tournaments(now: datetime):
+    """Returns the tournaments whose workouts are still being synced."""
+    return Tournament.objects.filter(
+        start_date__lte=now,
+        # (Allowing for the end date HACK in `sync.plan_sync`)
+        end_date__gte=now - timedelta(hours=17),
+    ).order_by("pk")
+
+
+def tournament_activity(
+    tournaments: List[Tournament],
+) -> Dict[int, TournamentActivity]:
+    """Sums up the riders, rides and sync cursors of each tournament."""
+    riders = dict(
+        TournamentMember.objects.filter(tournament__in=tournaments)
+        .values("tournament")
+        .annotate(count=Count("pk"))
+        .values_list("tournament", "count")
+    )
+    rides = dict(
+        TournamentRide.objects.filter(tournament__in=tournaments)
+        .values("tournament")
+        .annotate(count=Count("pk"))
+        .values_list("tournament", "count")
+    )
+    cursors = {
+        row["tournament"]: row
+        for row in SyncCursor.objects.filter(tournament__in=tournaments)
+        .values("tournament")
+        .annotate(
+            finalized=Count("pk", filter=Q(is_finalized=True)),
+            latest_workout_at=Max("latest_workout_at"),
+        )
+    }
+
+    activity = {}
+    for tournament in tournaments:
+        cursor = cursors.get(tournament.pk, {})
+        activity[tournament.pk] = TournamentActivity(
+            riders=riders.get(tournament.pk, 0),
+            rides=rides.get(tournament.pk, 0),
+            in_progress=riders.get(tournament.pk, 0) - cursor.get("finalized", 0),
+            latest_workout_at=cursor.get("latest_workout_at"),
+        )
+    return activity
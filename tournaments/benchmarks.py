@@ -0,0 +1,185 @@
+"""Page render benchmarks, with a budget for the SQL queries each page may make.
+
+Used by `manage.py benchmark_pages` (to report on scaled-up copies of the
+sample tournament) and `tournaments.test_pages` (to enforce the budgets).
+"""
+import statistics
+import time
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    PelotonProfile,
+    Ride,
+    Tournament,
+    TournamentMember,
+    TournamentRide,
+    TournamentTeam,
+    Workout,
+)
+from .standings import refresh_standings
+
+# The most queries each page may make, regardless of the tournament's size
+QUERY_BUDGETS: Dict[str, int] = {
+    "index": 6,
+    "detail": 15,
+    "edit:settings": 6,
+    "edit:teams": 9,
+    "edit:rides": 7,
+    "edit:permissions": 7,
+}
+
+# Each scale step adds two more teams of four, four more rides and one more tournament
+TEAM_SIZE = 4
+TEAMS_PER_SCALE = 2
+RIDES_PER_SCALE = 4
+
+
+class PageMeasurement(NamedTuple):
+    page: str
+    scale: int
+    queries: int
+    wall_ms: float  # Median across repeats
+
+    @property
+    def budget(self) -> int:
+        return QUERY_BUDGETS[self.page]
+
+    @property
+    def over_budget(self) -> bool:
+        return self.queries > self.budget
+
+
+def build_sample(scale: int = 1) -> Tuple[Tournament, User]:
+    """Loads the sample tournament, scaled up `scale` times, with synced workouts.
+
+    Returns the tournament and a user for its owner.
+    """
+    call_command("loaddata", "sample-tournament", verbosity=0)
+    tournament = Tournament.objects.get(pk=1)
+    now = timezone.now()
+    tournament.start_date = now - timedelta(days=7)
+    tournament.end_date = now + timedelta(days=7)
+    tournament.save()
+    prefix = f"scale-{tournament.uid}"
+
+    # Scale up the teams, riders and rides (bulk inserts are re-queried for pks)
+    TournamentTeam.objects.bulk_create(
+        TournamentTeam(tournament=tournament, name=f"Team {i}")
+        for i in range(TEAMS_PER_SCALE * (scale - 1))
+    )
+    new_teams = list(tournament.teams.order_by("pk")[TEAMS_PER_SCALE:])
+    PelotonProfile.objects.bulk_create(
+        PelotonProfile(username=f"{prefix}-rider-{i}", peloton_id=f"{prefix}-{i}")
+        for i in range(TEAM_SIZE * len(new_teams))
+    )
+    new_riders = PelotonProfile.objects.filter(username__startswith=prefix)
+    TournamentMember.objects.bulk_create(
+        TournamentMember(
+            tournament=tournament, peloton_profile=rider, team=new_teams[i // TEAM_SIZE]
+        )
+        for i, rider in enumerate(new_riders.order_by("pk"))
+    )
+    Ride.objects.bulk_create(
+        Ride(peloton_id=f"{prefix}-ride-{i}", title=f"Ride {i}")
+        for i in range(RIDES_PER_SCALE * (scale - 1))
+    )
+    TournamentRide.objects.bulk_create(
+        TournamentRide(tournament=tournament, ride=ride)
+        for ride in Ride.objects.filter(peloton_id__startswith=prefix)
+    )
+
+    # Everyone has done every ride
+    start = tournament.start_date + timedelta(days=1)
+    end = start + timedelta(minutes=30)
+    duration = (end - start).total_seconds()
+    workouts = []
+    rides = list(tournament.rides.all())
+    for rider in tournament.participants.all():
+        for ride in rides:
+            total_work = 200_000 + rider.pk * 1000 + ride.pk
+            workouts.append(
+                Workout(
+                    peloton_id=f"{prefix}-{rider.pk}-{ride.pk}",
+                    peloton_profile=rider,
+                    ride=ride,
+                    status="COMPLETED",
+                    start_time=start,
+                    end_time=end,
+                    total_work=total_work,
+                    duration_seconds=duration,
+                    average_output=total_work / duration,
+                )
+            )
+    Workout.objects.bulk_create(workouts)
+    refresh_standings(tournament)
+    tournament.last_synced = timezone.now()
+    tournament.save()
+
+    # The owner is also in other (smaller) tournaments, all listed on the index
+    owner = PelotonProfile.objects.get(pk=1)
+    for i in range(scale - 1):
+        other = Tournament.objects.create(
+            name=f"Other Tournament {i}",
+            start_date=tournament.start_date,
+            end_date=tournament.end_date,
+        )
+        TournamentMember.objects.create(
+            tournament=other, peloton_profile=owner, role=TournamentMember.Role.OWNER
+        )
+
+    user = User.objects.create(username=prefix)
+    owner.user = user
+    owner.peloton_session_id = "benchmark"
+    owner.session_valid = True
+    owner.session_verified_at = timezone.now()
+    owner.save()
+    return tournament, user
+
+
+def page_urls(tournament: Tournament) -> Dict[str, str]:
+    urls = {
+        "index": reverse("tournaments:index"),
+        "detail": reverse("tournaments:detail", args=[tournament.uid]),
+    }
+    for tab in ("settings", "teams", "rides", "permissions"):
+        urls[f"edit:{tab}"] = reverse("tournaments:edit", args=[tournament.uid, tab])
+    return urls
+
+
+# Manifest storage needs `collectstatic`, which isn't relevant to rendering time
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+def measure_pages(
+    tournament: Tournament, user: User, scale: int, repeats: int = 3
+) -> List[PageMeasurement]:
+    """Renders each page `repeats` times, with cold caches, as `user`."""
+    client = Client()
+    client.force_login(user)
+    measurements = []
+    for page, url in page_urls(tournament).items():
+        timings = []
+        queries = 0
+        for _ in range(repeats):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise AssertionError(f"{url} returned {response.status_code}")
+            queries = max(queries, len(captured))
+        measurements.append(
+            PageMeasurement(page, scale, queries, statistics.median(timings))
+        )
+    return measurements
@@ -0,0 +1,102 @@
+"""The tournaments a rider is in, as listed (and summarized) on the index page."""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Type
+
+from django.db import models
+from django.db.models import (
+    Case,
+    Count,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import (
+    PelotonProfile,
+    RiderStanding,
+    Tournament,
+    TournamentMember,
+    TournamentTeam,
+)
+
+# The dashboard's lists of tournaments, in the order they're shown
+BUCKETS = ("active", "upcoming", "recent")
+
+
+def bucket_filters(now: datetime) -> Dict[str, Q]:
+    """Returns which tournaments belong in each bucket of the dashboard."""
+    return {
+        "upcoming": Q(start_date__gt=now, start_date__lte=now + timedelta(weeks=2)),
+        "active": Q(start_date__lte=now, end_date__gte=now),
+        "recent": Q(end_date__lt=now, end_date__gte=now - timedelta(weeks=2)),
+    }
+
+
+def load_dashboard(profile: PelotonProfile, now: datetime) -> Dict[str, List[dict]]:
+    """Loads the rider's tournaments (see `dashboard_tournaments`) into buckets."""
+    dashboard: Dict[str, List[dict]] = {key: [] for key in BUCKETS}
+    for tournament in dashboard_tournaments(profile, now):
+        dashboard[tournament.pop("bucket")].append(tournament)
+    return dashboard
+
+
+def dashboard_tournaments(profile: PelotonProfile, now: datetime) -> QuerySet:
+    """Returns the rider's recent, current and upcoming tournaments, as one query.
+
+    Each tournament (a dict of its `uid`, `name`, `start_date` and `end_date`)
+    comes with its `bucket`, `team_count`, `participant_count` and the
+    rider's `rank` (by total output, or `None` if they haven't ridden yet).
+    """
+    return (
+        Tournament.objects.filter(participants=profile)
+        .annotate(
+            bucket=Case(
+                *(When(q, then=Value(key)) for key, q in bucket_filters(now).items()),
+                output_field=models.CharField(),
+            ),
+            team_count=_count(TournamentTeam),
+            participant_count=_count(TournamentMember),
+            total_work=Subquery(
+                RiderStanding.objects.filter(
+                    tournament=OuterRef("pk"), peloton_profile=profile
+                ).values("total_work")[:1]
+            ),
+        )
+        .exclude(bucket=None)
+        .annotate(
+            rank=Case(
+                When(total_work__isnull=True, then=Value(None)),
+                default=_count(RiderStanding, total_work__gt=OuterRef("total_work"))
+                + 1,
+                output_field=models.IntegerField(),
+            )
+        )
+        .order_by("-start_date")
+        .values(
+            "uid",
+            "name",
+            "start_date",
+            "end_date",
+            "bucket",
+            "team_count",
+            "participant_count",
+            "rank",
+        )
+    )
+
+
+def _count(model: Type[models.Model], **filters) -> Coalesce:
+    """Counts a model's rows for each tournament (as a subquery, to avoid joins)."""
+    rows = (
+        model.objects.filter(tournament=OuterRef("pk"), **filters)
+        .order_by()
+        .values("tournament")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(rows, output_field=models.IntegerField()), 0)
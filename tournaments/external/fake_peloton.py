@@ -0,0 +1,182 @@
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+
+class FakePeloton:
+    """Generated (but deterministic) Peloton data for local testing and benchmarks.
+
+    Any user, ride or instructor id is valid.  Every user has
+    `workouts_per_user` completed workouts, spread evenly across
+    `[start, end]` and cycling through `ride_ids`.
+    """
+
+    def __init__(
+        self,
+        ride_ids: List[str],
+        start: datetime,
+        end: datetime,
+        workouts_per_user: int = 30,
+    ):
+        self.ride_ids = ride_ids
+        self.start = start
+        self.end = end
+        self.workouts_per_user = workouts_per_user
+
+    def user(self, user_id: str) -> dict:
+        return {
+            "id": user_id,
+            "username": user_id,
+            "image_url": f"https://example.com/users/{user_id}.png",
+        }
+
+    def instructor(self, instructor_id: str) -> dict:
+        return {
+            "id": instructor_id,
+            "name": f"Instructor {instructor_id}",
+            "image_url": f"https://example.com/instructors/{instructor_id}.png",
+        }
+
+    def ride(self, ride_id: str) -> dict:
+        return {
+            "id": ride_id,
+            "title": f"Ride {ride_id}",
+            "description": "A generated ride",
+            "image_url": f"https://example.com/rides/{ride_id}.png",
+            "scheduled_start_time": self.start.timestamp(),
+            "instructor_id": f"instructor-{zlib.crc32(ride_id.encode()) % 10}",
+        }
+
+    def workout(self, workout_id: str) -> Optional[dict]:
+        match = re.match(r"^(.+)-(\d+)$", workout_id)
+        if not match or int(match.group(2)) >= self.workouts_per_user:
+            return None
+        return self._workout(match.group(1), int(match.group(2)))
+
+    def workouts(self, user_id: str, page: int, limit: int) -> dict:
+        """Returns a page of a user's workouts (newest first), with rides joined."""
+        indexes = range(self.workouts_per_user - 1, -1, -1)[
+            page * limit : (page + 1) * limit
+        ]
+        return {
+            "data": [self._workout(user_id, i) for i in indexes],
+            "page": page,
+            "limit": limit,
+            "total": self.workouts_per_user,
+        }
+
+    def _workout(self, user_id: str, index: int) -> dict:
+        step = (self.end - self.start) / max(1, self.workouts_per_user)
+        created_at = (self.start + step * index).timestamp()
+        rng = random.Random(zlib.crc32(f"{user_id}-{index}".encode()))
+        return {
+            "id": f"{user_id}-{index}",
+            "user_id": user_id,
+            "created_at": created_at,
+            "start_time": created_at,
+            "end_time": created_at + 30 * 60,
+            "status": "COMPLETED",
+            "total_work": rng.uniform(150_000, 450_000),
+            "ride": self.ride(self.ride_ids[index % len(self.ride_ids)]),
+        }
+
+
+class FakePelotonAdapter(BaseAdapter):
+    """A `requests` transport answering Peloton API calls from a `FakePeloton`.
+
+    Mount it on a client (see `PelotonClient.transport`) to run syncs without
+    the network.  Each call sleeps for `latency` seconds, and a `throttle_rate`
+    fraction of calls are answered with a 429.  Calls are counted per
+    endpoint in `calls`.
+    """
+
+    ROUTES = [
+        ("check_session", re.compile(r"^/auth/check_session$")),
+        ("user", re.compile(r"^/api/user/(?P<id>[^/]+)$")),
+        ("workouts", re.compile(r"^/api/user/(?P<id>[^/]+)/workouts$")),
+        ("workout", re.compile(r"^/api/workout/(?P<id>[^/]+)$")),
+        ("ride", re.compile(r"^/api/ride/(?P<id>[^/]+)$")),
+        ("instructor", re.compile(r"^/api/instructor/(?P<id>[^/]+)$")),
+    ]
+
+    def __init__(
+        self,
+        data: FakePeloton,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0,
+        seed: int = None,
+    ):
+        super().__init__()
+        self.data = data
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        url = urlsplit(request.url)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        endpoint, match = "unknown", None
+        for name, pattern in self.ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                endpoint = name
+                break
+        with self._lock:
+            self.calls[endpoint] += 1
+            throttled = self._random.random() < self.throttle_rate
+            if throttled:
+                self.calls["throttled"] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return self._response(
+                request, 429, {}, headers={"Retry-After": str(self.retry_after)}
+            )
+
+        body = None
+        if endpoint == "check_session":
+            body = {"is_valid": True, "user": {}}
+        elif endpoint == "workouts":
+            body = self.data.workouts(
+                match["id"],
+                page=int(params.get("page", 0)),
+                limit=int(params.get("limit", 20)),
+            )
+        elif endpoint in ("user", "workout", "ride", "instructor"):
+            body = getattr(self.data, endpoint)(match["id"])
+        if body is None:
+            return self._response(request, 404, {"status": 404})
+        return self._response(request, 200, body)
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _response(
+        request: requests.PreparedRequest, status: int, body, headers: dict = None
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.reason = requests.status_codes._codes[status][0].upper()
+        response.headers["Content-Type"] = "application/json"
+        response.headers.update(headers or {})
+        response._content = json.dumps(body).encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
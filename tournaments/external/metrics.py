@@ -0,0 +1,69 @@
+import re
+from typing import Optional
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+# Peloton ids (and usernames) in paths are templated away, to keep label values bounded
+ENDPOINT_TEMPLATES = (
+    (
+        re.compile(r"^/api/(user|workout|ride|instructor)/(?!search$|filters$)[^/]+"),
+        r"/api/\1/{id}",
+    ),
+)
+
+REQUESTS = Counter(
+    "peloton_requests_total",
+    "Peloton API calls (each retry counts as a call)",
+    ["method", "endpoint", "status", "view"],
+)
+REQUEST_DURATION = Histogram(
+    "peloton_request_duration_seconds",
+    "Time spent waiting on Peloton API calls",
+    ["method", "endpoint", "view"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RESPONSE_SIZE = Histogram(
+    "peloton_response_size_bytes",
+    "Size of Peloton API response bodies",
+    ["endpoint"],
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+
+def current_view() -> str:
+    """Returns the view (or process) bound to the structlog context, for labels."""
+    return structlog.contextvars.get_contextvars().get("view") or "none"
+
+
+def endpoint_template(url: str) -> str:
+    """Returns the path of a Peloton URL, with ids replaced by `{id}`."""
+    path = "/" + re.sub(r"^https?://[^/]+", "", url).split("?")[0].lstrip("/")
+    for pattern, template in ENDPOINT_TEMPLATES:
+        path = pattern.sub(template, path)
+    return path
+
+
+class RequestMetrics:
+    """Records each Peloton API call (see `PelotonClient.metrics`).
+
+    Metrics are kept with `prometheus_client`, which shares them between
+    processes through files in `PROMETHEUS_MULTIPROC_DIR`.
+    """
+
+    def observe(
+        self,
+        method: str,
+        url: str,
+        duration: float,
+        status: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        """Records a call (`status` is `None` if it failed to connect)."""
+        endpoint = endpoint_template(url)
+        view = current_view()
+        method = method.upper()
+        REQUESTS.labels(method, endpoint, status or "error", view).inc()
+        REQUEST_DURATION.labels(method, endpoint, view).observe(duration)
+        if size is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(size)
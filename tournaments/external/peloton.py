@@ -1,10 +1,33 @@
+import contextvars
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Collection, List, Union
+from typing import (
+    Collection,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import requests
 import structlog
+from requests.adapters import BaseAdapter
 from requests.cookies import RequestsCookieJar
 
+from .metrics import RequestMetrics
+from .throttling import RetryPolicy, TokenBucket
+
 logger = structlog.get_logger(__name__)
 
 
@@ -26,16 +49,235 @@ class NotAuthenticated(Exception):
         return f"{self.username} -> {self.message}"
 
 
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    """Caches the JSON responses of rarely changing Peloton endpoints.
+
+    Only URLs matching one of `ttls` (`(pattern, seconds)` pairs, first match
+    wins) are cached.  A response younger than its TTL is served without
+    contacting Peloton, while an older one is revalidated with
+    `If-None-Match`/`If-Modified-Since` (if Peloton sent validators for it).
+
+    Subclasses implement the storage (`get`, `set`).
+    """
+
+    DEFAULT_TTLS: Sequence[Tuple[str, float]] = (
+        (r"^/api/ride/filters$", 60 * 60),
+        (r"^/api/ride/[^/]+$", 24 * 60 * 60),
+        (r"^/api/instructor/[^/]+$", 7 * 24 * 60 * 60),
+    )
+
+    def __init__(self, ttls: Sequence[Tuple[str, float]] = DEFAULT_TTLS):
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        # Counts of "hit", "miss", "revalidated" and "evicted" (for this process)
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        path = "/" + url.lstrip("/")
+        for pattern, ttl in self.ttls:
+            if pattern.match(path):
+                return ttl
+        return None
+
+    def key_for(self, url: str, **kwargs) -> str:
+        request = {
+            "url": "/" + url.lstrip("/"),
+            "params": sorted((kwargs.get("params") or {}).items()),
+            "headers": sorted((kwargs.get("headers") or {}).items()),
+        }
+        return hashlib.sha256(json.dumps(request, default=str).encode()).hexdigest()
+
+    def is_fresh(self, cached: CachedResponse, ttl: float) -> bool:
+        return time.time() - cached.stored_at < ttl
+
+    def revalidation_headers(
+        self, cached: Optional[CachedResponse], headers: Optional[dict]
+    ) -> dict:
+        """Adds headers asking Peloton whether a stale response is still current."""
+        headers = dict(headers or {})
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def store_response(
+        self, key: str, cached: Optional[CachedResponse], response
+    ) -> bytes:
+        """Caches a response, returning the body to use.
+
+        A 304 response refreshes the stale response in the cache.
+        """
+        if cached and response.status_code == 304:
+            self.record("revalidated")
+            self.set(key, cached._replace(stored_at=time.time()))
+            return cached.body
+
+        response.raise_for_status()
+        self.record("miss")
+        self.set(
+            key,
+            CachedResponse(
+                body=response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                stored_at=time.time(),
+            ),
+        )
+        return response.content
+
+    def record(self, event: str, count: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[event] += count
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError()
+
+    def set(self, key: str, response: CachedResponse) -> None:
+        raise NotImplementedError()
+
+
+class DiskResponseCache(ResponseCache):
+    """Stores cached responses as files, evicting the least recently used.
+
+    Each hit refreshes its file's mtime, and once the directory grows past
+    `max_bytes` the files with the oldest mtimes are removed (down to
+    `EVICT_TO` of `max_bytes`, so the next few writes don't evict again).
+    Files are written atomically, so the directory can be shared between
+    processes.
+
+    The directory's size is tracked as responses are written, rather than
+    scanned each time; it's only rescanned every `RESCAN_EVERY` writes (to
+    count what other processes wrote) and when evicting.
+    """
+
+    EVICT_TO = 0.9
+    RESCAN_EVERY = 100
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        ttls: Sequence[Tuple[str, float]] = ResponseCache.DEFAULT_TTLS,
+    ):
+        super().__init__(ttls=ttls)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._size: Optional[int] = None
+        self._writes = 0
+        self._size_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(
+            body=data["body"].encode(),
+            etag=data["etag"],
+            last_modified=data["last_modified"],
+            stored_at=data["stored_at"],
+        )
+
+    def set(self, key: str, response: CachedResponse) -> None:
+        data = response._asdict()
+        data["body"] = response.body.decode()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        size = os.path.getsize(tmp_path)
+        path = os.path.join(self.directory, key)
+        try:
+            # (Replacing an older copy of the response)
+            size -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+
+        with self._size_lock:
+            self._writes += 1
+            if self._size is None or self._writes % self.RESCAN_EVERY == 0:
+                self._size = self._scan()[0]
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _scan(self) -> Tuple[int, List[Tuple[float, int, str]]]:
+        """Returns the directory's size and its files' `(mtime, size, path)`s."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sum(entry_size for _, entry_size, _ in entries), entries
+
+    def _evict(self) -> int:
+        """Removes the least recently used files, returning the size left."""
+        size, entries = self._scan()
+        if size <= self.max_bytes:
+            return size
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_bytes * self.EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            self.record("evicted")
+        return size
+
+
 class PelotonClient(requests.Session):
     SESSION_COOKIE = "peloton_session_id"
     COOKIE_DOMAIN = ".onepeloton.com"
 
+    # Defaults for all clients (configured from settings when the app loads)
+    retry_policy: RetryPolicy = RetryPolicy()
+    rate_limiter: Optional[TokenBucket] = None
+    response_cache: Optional[ResponseCache] = None
+    metrics: Optional[RequestMetrics] = None
+    # Replaces HTTP for calls to `base_url` (e.g. - a `FakePelotonAdapter`)
+    transport: Optional[BaseAdapter] = None
+
     def __init__(
         self, base_url: str = "https://api.onepeloton.com/", username: str = None
     ):
         self.base_url = base_url
         self.username = username
         super().__init__()
+        if self.transport is not None:
+            self.mount(base_url, self.transport)
+
+    def clone(self) -> "PelotonClient":
+        """Returns a new client sharing this client's configuration and session.
+
+        `requests.Session` is not thread-safe, so each thread making concurrent
+        calls should use its own clone.
+        """
+        client = type(self)(base_url=self.base_url, username=self.username)
+        client.cookies.update(self.cookies)
+        client.hooks = {event: list(hooks) for event, hooks in self.hooks.items()}
+        client.retry_policy = self.retry_policy
+        client.rate_limiter = self.rate_limiter
+        client.response_cache = self.response_cache
+        client.metrics = self.metrics
+        if self.transport is not client.transport:
+            client.transport = self.transport
+            client.mount(client.base_url, self.transport)
+        return client
 
     def login(self, *, username: str = None, password: str):
         username = username or self.username
@@ -57,20 +299,98 @@ class PelotonClient(requests.Session):
         cookie_jar.set(self.SESSION_COOKIE, session_id, domain=self.COOKIE_DOMAIN)
         resp = self.get("/auth/check_session", cookies=cookie_jar)
         if resp.status_code < 400 and resp.json().get("is_valid", False):
-            self.cookies.set(self.SESSION_COOKIE, session_id, domain=self.COOKIE_DOMAIN)
+            self.set_session(session_id)
             if self.username is None:
                 self.username = resp.json().get("user", {}).get("username")
         else:
             raise NotAuthenticated(username=self.username)
 
+    def set_session(self, session_id: str):
+        """Uses a session id without checking that it's still valid (see `load_session`)."""
+        self.cookies.set(self.SESSION_COOKIE, session_id, domain=self.COOKIE_DOMAIN)
+
     def request(self, method, url, *args, **kwargs) -> requests.Response:
+        """Sends a request, retrying throttled or failed requests per `retry_policy`."""
         url = self.base_url.rstrip("/") + "/" + url.lstrip("/")
-        return super().request(method, url, *args, **kwargs)
+        attempt = 1
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if self.metrics:
+                    self.metrics.observe(method, url, time.perf_counter() - started)
+                delay = self.retry_policy.get_delay(method, attempt)
+                if delay is None:
+                    raise
+                reason = repr(e)
+            else:
+                if self.metrics:
+                    self.metrics.observe(
+                        method,
+                        url,
+                        time.perf_counter() - started,
+                        status=resp.status_code,
+                        size=len(resp.content),
+                    )
+                delay = self.retry_policy.get_delay(method, attempt, resp)
+                if delay is None:
+                    return resp
+                reason = resp.status_code
+            logger.warning(
+                "Retrying Peloton request",
+                method=method,
+                url=url,
+                attempt=attempt,
+                reason=reason,
+                delay=delay,
+            )
+            time.sleep(delay)
+            attempt += 1
 
     def get_json(self, url, **kwargs):
+        cache = self.response_cache
+        ttl = cache.ttl_for(url) if cache else None
+        if ttl is None:
+            resp = self.get(url, **kwargs)
+            resp.raise_for_status()
+            return resp.json()
+
+        key = cache.key_for(url, **kwargs)
+        cached = cache.get(key)
+        if cached and cache.is_fresh(cached, ttl):
+            cache.record("hit")
+            return json.loads(cached.body)
+
+        kwargs["headers"] = cache.revalidation_headers(cached, kwargs.get("headers"))
         resp = self.get(url, **kwargs)
-        resp.raise_for_status()
-        return resp.json()
+        return json.loads(cache.store_response(key, cached, resp))
+
+    def get_json_many(self, urls: List[str], max_workers: int = 1, **kwargs) -> List:
+        """Fetches several JSON responses, up to `max_workers` at a time.
+
+        Responses are returned in the same order as `urls`.
+        """
+        if max_workers <= 1 or len(urls) <= 1:
+            return [self.get_json(url, **kwargs) for url in urls]
+
+        local = threading.local()
+
+        def get_json(url: str):
+            if not hasattr(local, "client"):
+                local.client = self.clone()
+            return local.client.get_json(url, **kwargs)
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(urls)), thread_name_prefix="peloton"
+        ) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, get_json, url)
+                for url in urls
+            ]
+            return [future.result() for future in futures]
 
     def get_workouts(
         self,
@@ -79,51 +399,73 @@ class PelotonClient(requests.Session):
         end_date: datetime = None,
         ride_ids: List[str] = None,
     ) -> List[dict]:
-        limit = 20
-        page = 0
-        workouts = []
-        while True:
+        return [
+            workout
+            for page in self.iter_workouts(user_id, start_date, end_date, ride_ids)
+            for workout in page
+        ]
+
+    def iter_workouts(
+        self,
+        user_id: str,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        ride_ids: List[str] = None,
+        page_size: int = 20,
+        max_page_size: int = 80,
+        prefetch_client: "PelotonClient" = None,
+    ) -> Iterator[List[dict]]:
+        """Yields a user's workouts (newest first) a page at a time.
+
+        Pages start small (often all an incremental sync needs) and double, up
+        to `max_page_size`, for as long as paging continues, which also
+        quickly skips past pages newer than `end_date`.  Paging stops once a
+        page reaches back past `start_date` or the user's first workout (or
+        after the first page, without a `start_date`).
+        While a page is being processed the next one is fetched in the
+        background (by `prefetch_client`, or else a clone of this client), so
+        no more than two pages are held at once.
+        """
+
+        def fetch(client: PelotonClient, offset: int, limit: int) -> dict:
+            page = offset // limit
             logger.info(
                 "Fetching page of workouts", user_id=user_id, page=page, limit=limit
             )
-            data = self.get_json(
+            return client.get_json(
                 f"/api/user/{user_id}/workouts",
                 params={"limit": limit, "page": page, "joins": "ride"},
             )
-            for workout in data["data"]:
-                keep = True
-                # Filter workouts outside the requested range
-                if start_date or end_date:
-                    workout_ts = float(workout["created_at"])
-                    if start_date and (workout_ts < start_date.timestamp()):
-                        keep = False
-                    if end_date and (workout_ts > end_date.timestamp()):
-                        keep = False
-                # Filter workouts not matching the requested ride ids
-                if ride_ids and workout["ride"]["id"] not in ride_ids:
-                    keep = False
-                # Only record workouts meeting all search criteria
-                if keep:
-                    workouts.append(workout)
-
-            # If end date is provided and the earliest workout doesn't yet exceed it,
-            # grab another page (reverse chronological) and repeat
-            if start_date and data["data"]:
-                earliest_workout_ts = data["data"][-1]["created_at"]
-                logger.info(
-                    "Comparing timestamps",
-                    start_date=start_date,
-                    earliest_workout=datetime.utcfromtimestamp(earliest_workout_ts),
-                )
-                if earliest_workout_ts > start_date.timestamp():
-                    logger.info("Grabbing next page")
-                    page += 1
-                else:
-                    logger.info("All good")
-                    break
-            else:
-                break
-        return workouts
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workouts")
+        try:
+            offset, limit = 0, page_size
+            data = fetch(self, offset, limit)
+            while data:
+                future = None
+                offset += len(data["data"])
+                if _has_more_workouts(data, start_date, limit):
+                    # Only grow pages that would still line up with the offset
+                    if offset % (limit * 2) == 0 and limit * 2 <= max_page_size:
+                        limit *= 2
+                    # (This session may be used while the page is being fetched)
+                    if prefetch_client is None:
+                        prefetch_client = self.clone()
+                    future = executor.submit(
+                        contextvars.copy_context().run,
+                        fetch,
+                        prefetch_client,
+                        offset,
+                        limit,
+                    )
+                # (Only the filtered workouts are held while they're processed)
+                workouts = _filter_workouts(data, start_date, end_date, ride_ids)
+                del data
+                if workouts:
+                    yield workouts
+                data = future.result() if future else None
+        finally:
+            executor.shutdown()
 
     def get_rides(self, ride_ids: List[str]):
         return [self.get_json(f"/api/ride/{ride_id}") for ride_id in ride_ids]
@@ -139,20 +481,16 @@ class PelotonClient(requests.Session):
         instructor_id: str = None,
         duration: int = None,
     ) -> List[dict]:
-        if isinstance(content_format, (tuple, list, set)):
-            content_format = ",".join(content_format)
-        params = {
-            "browse_category": category,
-            "content_format": content_format,
-            "limit": limit,
-            "page": page,
-            "sort_by": sort_by,
-            "desc": desc,
-        }
-        if instructor_id:
-            params["instructor_id"] = instructor_id
-        if duration:
-            params["duration"] = duration
+        params = _ride_search_params(
+            category=category,
+            content_format=content_format,
+            limit=limit,
+            page=page,
+            sort_by=sort_by,
+            desc=desc,
+            instructor_id=instructor_id,
+            duration=duration,
+        )
         return self.get_json("/api/v2/ride/archived", params=params)
 
     def search_users(self, user_query: str, limit: int = 40) -> List[dict]:
@@ -161,3 +499,68 @@ class PelotonClient(requests.Session):
             params={"user_query": user_query, "limit": limit},
         )
         return data["data"]
+
+
+def _filter_workouts(
+    data: dict,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    ride_ids: Optional[List[str]],
+) -> List[dict]:
+    """Returns the workouts from a page of results that meet all search criteria."""
+    workouts = []
+    for workout in data["data"]:
+        keep = True
+        # Filter workouts outside the requested range
+        if start_date or end_date:
+            workout_ts = float(workout["created_at"])
+            if start_date and (workout_ts < start_date.timestamp()):
+                keep = False
+            if end_date and (workout_ts > end_date.timestamp()):
+                keep = False
+        # Filter workouts not matching the requested ride ids
+        if ride_ids and workout["ride"]["id"] not in ride_ids:
+            keep = False
+        # Only record workouts meeting all search criteria
+        if keep:
+            workouts.append(workout)
+    return workouts
+
+
+def _has_more_workouts(data: dict, start_date: Optional[datetime], limit: int) -> bool:
+    """Checks whether the next page of (reverse chronological) workouts is needed."""
+    workouts = data["data"]
+    if len(workouts) < limit:
+        return False
+    if "total" in data and data.get("page", 0) * limit + len(workouts) >= data["total"]:
+        return False
+    # Keep paging until the earliest workout is older than the start date (and just
+    # the first page is listed without one)
+    return bool(start_date) and workouts[-1]["created_at"] > start_date.timestamp()
+
+
+def _ride_search_params(
+    category: str,
+    content_format: Union[str, Collection[str]],
+    limit: int,
+    page: int,
+    sort_by: str,
+    desc: bool,
+    instructor_id: Optional[str],
+    duration: Optional[int],
+) -> dict:
+    if isinstance(content_format, (tuple, list, set)):
+        content_format = ",".join(content_format)
+    params = {
+        "browse_category": category,
+        "content_format": content_format,
+        "limit": limit,
+        "page": page,
+        "sort_by": sort_by,
+        "desc": desc,
+    }
+    if instructor_id:
+        params["instructor_id"] = instructor_id
+    if duration:
+        params["duration"] = duration
+    return params
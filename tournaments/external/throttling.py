@@ -0,0 +1,144 @@
+import fcntl
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Collection, Optional
+
+import requests
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class RetryPolicy:
+    """Decides when (and after how long) a failed request should be retried.
+
+    Only idempotent methods are retried, after connection errors or responses
+    with a `retry_statuses` status.  Delays grow exponentially with "full
+    jitter" (a random delay up to the exponential bound), unless the server
+    asks for a specific delay with `Retry-After`.  A `Retry-After` longer than
+    `max_delay` isn't worth waiting for, so the response is returned as-is.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        backoff: float = 0.5,
+        max_delay: float = 30,
+        retry_statuses: Collection[int] = (429, 500, 502, 503, 504),
+        retry_methods: Collection[str] = ("GET", "HEAD", "OPTIONS"),
+    ):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+        self.retry_methods = set(retry_methods)
+
+    def get_delay(
+        self,
+        method: str,
+        attempt: int,
+        response: Optional[requests.Response] = None,
+    ) -> Optional[float]:
+        """Returns the seconds to wait before retrying, or `None` to give up.
+
+        `attempt` counts from 1, and `response` is `None` if the request
+        failed to connect.
+        """
+        if method.upper() not in self.retry_methods or attempt >= self.max_attempts:
+            return None
+        if response is not None:
+            if response.status_code not in self.retry_statuses:
+                return None
+            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.backoff * 2**attempt))
+
+
+class TokenBucket:
+    """Limits outbound requests to `rate` per second (with bursts up to `capacity`).
+
+    The bucket's state lives in a small JSON file guarded by `flock`, so every
+    thread and process pointed at the same `path` (e.g. - all gunicorn workers
+    and sync workers on a dyno) shares a single budget.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        rate: float,
+        capacity: float = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.path = path
+        self.rate = rate
+        self.capacity = max(1.0, capacity or rate)
+        # (Wall clock time, since the state is shared between processes)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Blocks until `tokens` are available and takes them.
+
+        Returns the total number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                if waited:
+                    logger.debug("Rate limited Peloton request", waited=waited)
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Takes `tokens` if available, otherwise returns the seconds until they are."""
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read())
+                except ValueError:
+                    state = {"tokens": self.capacity, "updated_at": self.clock()}
+
+                now = self.clock()
+                elapsed = max(0.0, now - state["updated_at"])
+                available = min(self.capacity, state["tokens"] + elapsed * self.rate)
+                if available < tokens:
+                    return (tokens - available) / self.rate
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": available - tokens, "updated_at": now}))
+                f.flush()
+                return 0
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reset(self) -> None:
+        """Refills the bucket (e.g. - between tests)."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a `Retry-After` header, given either as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,41 @@
+import json
+import zlib
+
+from django.db import models
+
+
+class CompressedJSONField(models.BinaryField):
+    """JSON stored zlib-compressed, for bulky values that are rarely read back.
+
+    The value can't be filtered on, so keep anything worth querying elsewhere.
+    """
+
+    def __init__(self, *args, compression_level: int = 6, **kwargs):
+        self.compression_level = compression_level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.compression_level != 6:
+            kwargs["compression_level"] = self.compression_level
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(bytes(value)))
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        data = json.dumps(value, separators=(",", ":")).encode()
+        return zlib.compress(data, self.compression_level)
+
+    def to_python(self, value):
+        # (Serialized as plain JSON, e.g. - in fixtures)
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
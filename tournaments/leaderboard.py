@@ -0,0 +1,280 @@
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import (
+    BestWorkout,
+    PelotonProfile,
+    Ride,
+    TeamStanding,
+    Tournament,
+    TournamentMember,
+    TournamentTeam,
+)
+
+
+class Cell(NamedTuple):
+    """A rider's best workout for a ride."""
+
+    total_work: float
+    workout_peloton_id: str
+
+
+class RideRow(NamedTuple):
+    ride: Ride
+    cells: List[Optional[Cell]]  # One per team member (`None` if they haven't ridden)
+
+
+class TeamBoard:
+    """A team's best workouts, stored as flat (ride x member) arrays.
+
+    A missing workout is stored as NaN, which keeps each team's grid to a
+    couple of compact arrays no matter how many rides and riders it has.
+    The team's totals come from its materialized `TeamStanding`.
+    """
+
+    def __init__(
+        self, team: TournamentTeam, members: List[PelotonProfile], rides: List[Ride]
+    ):
+        self.team = team
+        self.members = members
+        self.rides = rides
+        size = len(rides) * len(members)
+        self.standing = getattr(team, "teamstanding", None) or TeamStanding(team=team)
+        self._total_work = array("d", [math.nan]) * size
+        self._workout_peloton_ids: List[Optional[str]] = [None] * size
+
+    def set(self, ride_index: int, member_index: int, best: dict) -> None:
+        i = ride_index * len(self.members) + member_index
+        self._total_work[i] = best["total_work"]
+        self._workout_peloton_ids[i] = best["workout__peloton_id"]
+
+    @property
+    def rows(self) -> Iterator[RideRow]:
+        width = len(self.members)
+        for ride_index, ride in enumerate(self.rides):
+            cells = []
+            for i in range(ride_index * width, (ride_index + 1) * width):
+                if math.isnan(self._total_work[i]):
+                    cells.append(None)
+                else:
+                    cells.append(
+                        Cell(self._total_work[i], self._workout_peloton_ids[i])
+                    )
+            yield RideRow(ride, cells)
+
+    @property
+    def member_totals(self) -> List[float]:
+        """Returns the total output of each member's best workouts."""
+        width = len(self.members)
+        totals = [0.0] * width
+        for i, total_work in enumerate(self._total_work):
+            if not math.isnan(total_work):
+                totals[i % width] += total_work
+        return totals
+
+    @property
+    def total_work(self) -> float:
+        return self.standing.total_work
+
+    @property
+    def total_duration(self) -> float:
+        return self.standing.total_duration
+
+    @property
+    def workout_count(self) -> int:
+        return self.standing.workout_count
+
+    @property
+    def average_output(self) -> float:
+        return self.standing.average_output
+
+
+class Leaderboard:
+    """Every team's best workouts for a tournament, loaded in a fixed number of queries."""
+
+    def __init__(
+        self, tournament: Tournament, rides: List[Ride], teams: List[TeamBoard]
+    ):
+        self.tournament = tournament
+        self.rides = rides
+        self.teams = teams
+
+    @classmethod
+    def for_tournament(cls, tournament: Tournament) -> "Leaderboard":
+        rides = list(tournament.rides.select_related("instructor").order_by("pk"))
+        ride_indexes = {ride.pk: i for i, ride in enumerate(rides)}
+
+        # Group the team members in the order they joined
+        memberships = (
+            TournamentMember.objects.filter(tournament=tournament)
+            .exclude(team__isnull=True)
+            .select_related("peloton_profile")
+            .order_by("pk")
+        )
+        members: Dict[int, List[PelotonProfile]] = {}
+        for membership in memberships:
+            members.setdefault(membership.team_id, []).append(
+                membership.peloton_profile
+            )
+        boards = [
+            TeamBoard(team, members.get(team.pk, []), rides)
+            for team in tournament.teams.select_related("teamstanding").order_by("pk")
+        ]
+
+        # Then slot every best workout into its team's grid
+        positions = {}
+        for board in boards:
+            for member_index, member in enumerate(board.members):
+                positions[member.pk] = (board, member_index)
+        best_workouts = BestWorkout.objects.filter(tournament=tournament).values(
+            "peloton_profile_id", "ride_id", "total_work", "workout__peloton_id"
+        )
+        for best in best_workouts:
+            ride_index = ride_indexes.get(best["ride_id"])
+            position = positions.get(best["peloton_profile_id"])
+            if ride_index is None or position is None:
+                continue
+            board, member_index = position
+            board.set(ride_index, member_index, best)
+
+        return cls(tournament, rides, boards)
+
+
+def stream_leaderboard(tournament: Tournament) -> Iterator[str]:
+    """Serializes a tournament's leaderboard as JSON, one chunk at a time.
+
+    Teams, members and best workouts are each read through a single ordered
+    query and merged as they stream, so memory use doesn't grow with the size
+    of the tournament.  Team totals come from the materialized standings,
+    while each rider's totals are tallied from their best workouts.
+    """
+    encode = DjangoJSONEncoder().encode
+    yield '{"tournament": ' + encode(
+        {
+            "uid": tournament.uid,
+            "name": tournament.name,
+            "start_date": tournament.start_date,
+            "end_date": tournament.end_date,
+            "last_synced": tournament.last_synced,
+        }
+    )
+
+    yield ', "rides": ['
+    rides = tournament.rides.select_related("instructor").order_by("pk")
+    for i, ride in enumerate(rides.iterator()):
+        yield (", " if i else "") + encode(
+            {
+                "peloton_id": ride.peloton_id,
+                "title": ride.title,
+                "instructor": ride.instructor.name if ride.instructor else None,
+            }
+        )
+
+    yield '], "teams": ['
+    teams = (
+        TournamentTeam.objects.filter(tournament=tournament)
+        .select_related("teamstanding")
+        .order_by("pk")
+    )
+    # Members and their best workouts are both ordered by team, then membership
+    memberships = _Lookahead(
+        TournamentMember.objects.filter(tournament=tournament, team__isnull=False)
+        .select_related("peloton_profile")
+        .order_by("team_id", "pk")
+        .iterator()
+    )
+    best_workouts = _Lookahead(
+        BestWorkout.objects.filter(
+            tournament=tournament,
+            peloton_profile__tournamentmember__tournament=tournament,
+            peloton_profile__tournamentmember__team__isnull=False,
+        )
+        .annotate(
+            team_id=F("peloton_profile__tournamentmember__team"),
+            membership_id=F("peloton_profile__tournamentmember"),
+        )
+        .order_by("team_id", "membership_id", "ride_id")
+        .values(
+            "membership_id",
+            "ride__peloton_id",
+            "workout__peloton_id",
+            "total_work",
+            "duration",
+            "average_output",
+        )
+        .iterator()
+    )
+    for i, team in enumerate(teams.iterator()):
+        standing = getattr(team, "teamstanding", None)
+        yield (", " if i else "") + '{"uid": %s, "name": %s, "totals": %s' % (
+            encode(team.uid),
+            encode(team.name),
+            encode(_totals(standing) if standing else _totals_of([])),
+        )
+        yield ', "riders": ['
+        members = memberships.take_while(lambda m: m.team_id == team.pk)
+        for j, membership in enumerate(members):
+            bests = list(
+                best_workouts.take_while(lambda b: b["membership_id"] == membership.pk)
+            )
+            profile = membership.peloton_profile
+            yield (", " if j else "") + encode(
+                {
+                    "username": profile.username,
+                    "peloton_id": profile.peloton_id,
+                    "image_url": profile.image_url,
+                    "best_workouts": [
+                        {
+                            "ride": best["ride__peloton_id"],
+                            "workout": best["workout__peloton_id"],
+                            "total_work": best["total_work"],
+                            "duration": best["duration"],
+                            "average_output": best["average_output"],
+                        }
+                        for best in bests
+                    ],
+                    "totals": _totals_of(bests),
+                }
+            )
+        yield "]}"
+    yield "]}"
+
+
+def _totals(standing) -> dict:
+    return {
+        "total_work": standing.total_work,
+        "total_duration": standing.total_duration,
+        "workout_count": standing.workout_count,
+        "average_output": standing.average_output,
+    }
+
+
+def _totals_of(bests: List[dict]) -> dict:
+    count = len(bests)
+    return {
+        "total_work": sum(best["total_work"] for best in bests),
+        "total_duration": sum(best["duration"] for best in bests),
+        "workout_count": count,
+        "average_output": (
+            sum(best["average_output"] for best in bests) / count if count else 0
+        ),
+    }
+
+
+class _Lookahead:
+    """Wraps an ordered iterator so that consecutive runs can be consumed."""
+
+    _EMPTY = object()
+
+    def __init__(self, iterable: Iterable):
+        self._iterator = iter(iterable)
+        self._next = next(self._iterator, self._EMPTY)
+
+    def take_while(self, predicate) -> Iterator:
+        while self._next is not self._EMPTY and predicate(self._next):
+            yield self._next
+            self._next = next(self._iterator, self._EMPTY)
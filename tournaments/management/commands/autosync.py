@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+import structlog
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tournaments.autosync import AutoSyncScheduler, SyncBudget
+
+logger = structlog.get_logger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Queues syncs for tournaments in progress, adapting to their activity"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.AUTOSYNC_POLL_INTERVAL,
+            help="Seconds to wait between checks for tournaments due a sync",
+        )
+        parser.add_argument(
+            "--calls-per-minute",
+            type=float,
+            default=settings.AUTOSYNC_CALLS_PER_MINUTE,
+            help="Most (estimated) Peloton calls per minute to queue syncs for",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Queue whatever is due now and exit",
+        )
+
+    def handle(
+        self,
+        *args,
+        poll_interval: float,
+        calls_per_minute: float,
+        once: bool,
+        **options,
+    ):
+        structlog.contextvars.bind_contextvars(view="autosync")
+        scheduler = AutoSyncScheduler(
+            SyncBudget(calls_per_minute),
+            min_interval=timedelta(seconds=settings.AUTOSYNC_MIN_INTERVAL),
+            max_interval=timedelta(seconds=settings.AUTOSYNC_MAX_INTERVAL),
+            recent=timedelta(seconds=settings.AUTOSYNC_RECENT_ACTIVITY),
+        )
+        logger.info(
+            "Auto-sync started",
+            poll_interval=poll_interval,
+            calls_per_minute=calls_per_minute,
+        )
+        while True:
+            scheduler.tick()
+            if once:
+                break
+            time.sleep(poll_interval)
+        logger.info("Auto-sync stopped")
@@ -0,0 +1,108 @@
+import json
+import logging
+import subprocess
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from tournaments.benchmarks import build_sample, measure_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks page renders against scaled-up copies of the sample tournament "
+        "(in a throwaway test database), failing if any page exceeds its query budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            type=int,
+            nargs="+",
+            default=[1, 4, 16],
+            help="How many times to scale up the sample tournament",
+        )
+        parser.add_argument("--repeats", type=int, default=5)
+        parser.add_argument(
+            "--output", help="Writes the results as JSON (e.g. - to compare later)"
+        )
+        parser.add_argument(
+            "--compare", help="A previous --output file to compare the results with"
+        )
+
+    def handle(self, *args, **options):
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                for result in json.load(f)["results"]:
+                    previous[(result["page"], result["scale"])] = result
+
+        if options["verbosity"] < 2:
+            # Every request is logged, which drowns out the results
+            logging.disable(logging.INFO)
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = []
+            for scale in options["scales"]:
+                tournament, user = build_sample(scale)
+                results.extend(
+                    measure_pages(tournament, user, scale, repeats=options["repeats"])
+                )
+                call_command("flush", interactive=False, verbosity=0)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(
+            f"{'page':<18} {'scale':>5} {'queries':>8} {'budget':>7} {'wall (ms)':>10}"
+            + ("  change" if previous else "")
+        )
+        for result in results:
+            line = (
+                f"{result.page:<18} {result.scale:>5} {result.queries:>8} "
+                f"{result.budget:>7} {result.wall_ms:>10.1f}"
+            )
+            before = previous.get((result.page, result.scale))
+            if before:
+                line += (
+                    f"  {result.queries - before['queries']:+d} queries, "
+                    f"{(result.wall_ms / before['wall_ms'] - 1) * 100:+.0f}% time"
+                )
+            if result.over_budget:
+                line = self.style.ERROR(line + "  OVER BUDGET")
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "commit": _git_commit(),
+                        "results": [
+                            dict(result._asdict(), budget=result.budget)
+                            for result in results
+                        ],
+                    },
+                    f,
+                    indent=2,
+                )
+
+        over_budget = sorted({result.page for result in results if result.over_budget})
+        if over_budget:
+            raise CommandError(f"Over query budget: {', '.join(over_budget)}")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
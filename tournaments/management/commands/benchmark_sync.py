@@ -0,0 +1,209 @@
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.external.peloton import PelotonClient
+from tournaments.models import (
+    PelotonProfile,
+    Ride,
+    SyncJob,
+    Tournament,
+    TournamentMember,
+    TournamentRide,
+    TournamentTeam,
+)
+from tournaments.sync import run_sync_job
+from tournaments.views import SyncView
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks tournament syncs against a fake Peloton API "
+        "(all data is rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--riders",
+            type=int,
+            nargs="+",
+            default=[10, 100, 1000],
+            help="Tournament sizes to benchmark",
+        )
+        parser.add_argument("--rides", type=int, default=4)
+        parser.add_argument("--team-size", type=int, default=4)
+        parser.add_argument("--workouts-per-rider", type=int, default=30)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.02,
+            help="Seconds each fake Peloton call takes",
+        )
+        parser.add_argument(
+            "--throttle-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of fake Peloton calls answered with a 429",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.SYNC_CONCURRENCY,
+            help="Overrides SYNC_CONCURRENCY",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            action="store_true",
+            help="Keep the configured outbound rate limit (disabled by default)",
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Keep the configured response cache (disabled by default)",
+        )
+
+    def handle(self, *args, **options):
+        if options["verbosity"] < 2:
+            # Syncs log every page of workouts, which drowns out the results
+            logging.disable(logging.INFO)
+
+        defaults = {
+            "transport": PelotonClient.transport,
+            "rate_limiter": PelotonClient.rate_limiter,
+            "response_cache": PelotonClient.response_cache,
+        }
+        if not options["rate_limit"]:
+            PelotonClient.rate_limiter = None
+        if not options["response_cache"]:
+            PelotonClient.response_cache = None
+        try:
+            self.stdout.write(
+                f"{'riders':>8} {'wall (s)':>9} {'upstream':>9} {'throttled':>10} "
+                f"{'queries':>8}  status"
+            )
+            for riders in options["riders"]:
+                with override_settings(SYNC_CONCURRENCY=options["concurrency"]):
+                    self.benchmark(riders, options)
+        finally:
+            for name, value in defaults.items():
+                setattr(PelotonClient, name, value)
+            logging.disable(logging.NOTSET)
+
+    def benchmark(self, riders: int, options: dict) -> None:
+        end_date = timezone.now().replace(hour=11, minute=59, second=59)
+        start_date = end_date.replace(hour=0, minute=0, second=0) - timedelta(days=13)
+        with transaction.atomic():
+            tournament, user = _create_tournament(
+                riders=riders,
+                rides=options["rides"],
+                team_size=options["team_size"],
+                start_date=start_date,
+                end_date=end_date,
+            )
+            ride_ids = list(tournament.rides.values_list("peloton_id", flat=True))
+            adapter = FakePelotonAdapter(
+                FakePeloton(
+                    ride_ids=ride_ids,
+                    start=start_date,
+                    end=end_date,
+                    workouts_per_user=options["workouts_per_rider"],
+                ),
+                latency=options["latency"],
+                throttle_rate=options["throttle_rate"],
+                seed=riders,
+            )
+            PelotonClient.transport = adapter
+
+            # Queue the sync just like the "Sync Now" button, then run it inline
+            request = RequestFactory().post(
+                reverse("tournaments:sync", args=[tournament.uid])
+            )
+            request.user = user
+            response = SyncView.as_view()(request, uid=tournament.uid)
+            job = SyncJob.claim(
+                json.loads(response.content)["job_id"], stale_after=timedelta(days=1)
+            )
+
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                run_sync_job(job)
+            elapsed = time.perf_counter() - started
+
+            throttled = adapter.calls.pop("throttled", 0)
+            self.stdout.write(
+                f"{riders:>8} {elapsed:>9.2f} {sum(adapter.calls.values()):>9} "
+                f"{throttled:>10} {len(queries):>8}  {job.status}"
+            )
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"{'':>8} {dict(adapter.calls)}")
+            if job.error:
+                self.stderr.write(f"{'':>8} {job.error}")
+            transaction.set_rollback(True)
+
+
+def _create_tournament(
+    riders: int, rides: int, team_size: int, start_date, end_date
+) -> Tuple[Tournament, User]:
+    """Creates a tournament with generated riders, teams and rides.
+
+    Returns the tournament along with its owner (the first rider's user).
+    """
+    tournament = Tournament.objects.create(
+        name=f"Benchmark ({riders} riders)",
+        start_date=start_date,
+        end_date=end_date,
+    )
+    prefix = f"bench-{tournament.uid}"
+    # (Re-queried after each bulk insert, since not every database returns pks)
+    Ride.objects.bulk_create(
+        Ride(peloton_id=f"{prefix}-ride-{i}") for i in range(rides)
+    )
+    TournamentRide.objects.bulk_create(
+        TournamentRide(tournament=tournament, ride=ride)
+        for ride in Ride.objects.filter(peloton_id__startswith=f"{prefix}-")
+    )
+    TournamentTeam.objects.bulk_create(
+        TournamentTeam(tournament=tournament, name=f"Team {i + 1}")
+        for i in range((riders + team_size - 1) // team_size)
+    )
+    teams = list(tournament.teams.order_by("pk"))
+    PelotonProfile.objects.bulk_create(
+        PelotonProfile(username=f"{prefix}-rider-{i}", peloton_id=f"{prefix}-rider-{i}")
+        for i in range(riders)
+    )
+    profiles = list(
+        PelotonProfile.objects.filter(username__startswith=f"{prefix}-").order_by("pk")
+    )
+    TournamentMember.objects.bulk_create(
+        TournamentMember(
+            tournament=tournament,
+            peloton_profile=profile,
+            team=teams[i // team_size],
+            role=TournamentMember.Role.OWNER
+            if i == 0
+            else TournamentMember.Role.MEMBER,
+        )
+        for i, profile in enumerate(profiles)
+    )
+
+    # The owner needs a (seemingly) valid session to sync
+    user = User.objects.create(username=prefix)
+    owner = profiles[0]
+    owner.user = user
+    owner.peloton_session_id = "benchmark"
+    owner.session_valid = True
+    owner.session_verified_at = timezone.now()
+    owner.save()
+    return tournament, user
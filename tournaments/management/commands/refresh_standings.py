@@ -0,0 +1,25 @@
+import structlog
+from django.core.management.base import BaseCommand
+
+from tournaments.models import Tournament
+from tournaments.standings import refresh_standings
+
+logger = structlog.get_logger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the best workouts and standings for tournaments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "uids", nargs="*", help="Tournaments to rebuild (defaults to all)"
+        )
+
+    def handle(self, *args, uids, **options):
+        tournaments = Tournament.objects.all()
+        if uids:
+            tournaments = tournaments.filter(uid__in=uids)
+        for tournament in tournaments:
+            refresh_standings(tournament)
+            tournament.bump_revision()
+        logger.info("Refreshed standings", tournaments=len(tournaments))
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+import structlog
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tournaments.models import SyncJob
+from tournaments.sync import run_sync_jobs
+
+logger = structlog.get_logger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processes queued tournament syncs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.SYNC_WORKER_POLL_INTERVAL,
+            help="Seconds to wait between checks when the queue is empty",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SYNC_JOBS_PER_BATCH,
+            help="Most jobs to claim (and sync together) at a time",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for more jobs",
+        )
+
+    def handle(
+        self, *args, poll_interval: float, batch_size: int, burst: bool, **options
+    ):
+        stale_after = timedelta(seconds=settings.SYNC_JOB_STALE_AFTER)
+        structlog.contextvars.bind_contextvars(view="sync_worker")
+        logger.info(
+            "Sync worker started",
+            poll_interval=poll_interval,
+            batch_size=batch_size,
+            burst=burst,
+        )
+        while True:
+            jobs = SyncJob.claim_batch(stale_after=stale_after, limit=batch_size)
+            if jobs:
+                run_sync_jobs(jobs)
+            elif burst:
+                break
+            else:
+                time.sleep(poll_interval)
+        logger.info("Sync worker stopped")
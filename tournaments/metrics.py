@@ -0,0 +1,84 @@
+import hmac
+import os
+import time
+
+import structlog
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .external.metrics import current_view
+
+DB_QUERIES = Counter("db_queries_total", "Database queries", ["view"])
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time spent on database queries",
+    ["view"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """A database execute wrapper counting (and timing) every query."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        view = current_view()
+        DB_QUERIES.labels(view).inc()
+        DB_QUERY_DURATION.labels(view).observe(time.perf_counter() - started)
+
+
+def install_query_metrics(sender, connection, **kwargs):
+    """Adds `record_query` to each new database connection (a `connection_created` receiver)."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ViewContextMiddleware:
+    """Binds the name of the view handling a request to the structlog context.
+
+    Used to label metrics (and logs) with where they came from.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            structlog.contextvars.unbind_contextvars("view")
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        structlog.contextvars.bind_contextvars(view=request.resolver_match.view_name)
+
+
+def metrics(request):
+    """Exposes metrics from every process in Prometheus' text format.
+
+    Only available with `Authorization: Bearer <METRICS_TOKEN>` (or when DEBUG).
+    """
+    if not settings.DEBUG:
+        auth = request.headers.get("Authorization", "")
+        if (
+            not settings.METRICS_TOKEN
+            or not auth.startswith("Bearer ")
+            or not hmac.compare_digest(auth[len("Bearer ") :], settings.METRICS_TOKEN)
+        ):
+            raise Http404()
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
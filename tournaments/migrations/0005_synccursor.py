@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import tournaments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0004_syncjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCursor",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "uid",
+                    models.CharField(
+                        default=tournaments.models.random_uid,
+                        editable=False,
+                        max_length=32,
+                        unique=True,
+                    ),
+                ),
+                ("latest_workout_at", models.DateTimeField(null=True)),
+                ("is_finalized", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "peloton_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.pelotonprofile",
+                    ),
+                ),
+                (
+                    "tournament",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.tournament",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("tournament", "peloton_profile")},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0005_synccursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pelotonprofile",
+            name="session_valid",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="pelotonprofile",
+            name="session_verified_at",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
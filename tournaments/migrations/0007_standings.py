@@ -0,0 +1,141 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import tournaments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0006_session_check"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeamStanding",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "uid",
+                    models.CharField(
+                        default=tournaments.models.random_uid,
+                        editable=False,
+                        max_length=32,
+                        unique=True,
+                    ),
+                ),
+                ("total_work", models.FloatField(default=0)),
+                ("total_duration", models.FloatField(default=0)),
+                ("workout_count", models.PositiveIntegerField(default=0)),
+                ("average_output", models.FloatField(default=0)),
+                (
+                    "team",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.tournamentteam",
+                    ),
+                ),
+                (
+                    "tournament",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="team_standings",
+                        to="tournaments.tournament",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="RiderStanding",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "uid",
+                    models.CharField(
+                        default=tournaments.models.random_uid,
+                        editable=False,
+                        max_length=32,
+                        unique=True,
+                    ),
+                ),
+                ("total_work", models.FloatField(default=0)),
+                ("total_duration", models.FloatField(default=0)),
+                ("workout_count", models.PositiveIntegerField(default=0)),
+                ("average_output", models.FloatField(default=0)),
+                (
+                    "peloton_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.pelotonprofile",
+                    ),
+                ),
+                (
+                    "tournament",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rider_standings",
+                        to="tournaments.tournament",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("tournament", "peloton_profile")},
+            },
+        ),
+        migrations.CreateModel(
+            name="BestWorkout",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "uid",
+                    models.CharField(
+                        default=tournaments.models.random_uid,
+                        editable=False,
+                        max_length=32,
+                        unique=True,
+                    ),
+                ),
+                ("total_work", models.FloatField()),
+                ("duration", models.FloatField()),
+                ("average_output", models.FloatField()),
+                (
+                    "peloton_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.pelotonprofile",
+                    ),
+                ),
+                (
+                    "ride",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tournaments.ride",
+                    ),
+                ),
+                (
+                    "tournament",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="best_workouts",
+                        to="tournaments.tournament",
+                    ),
+                ),
+                (
+                    "workout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="best_in",
+                        to="tournaments.workout",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("tournament", "peloton_profile", "ride")},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0007_standings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tournament",
+            name="revision",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
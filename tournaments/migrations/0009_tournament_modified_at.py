@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0008_tournament_revision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tournament",
+            name="modified_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
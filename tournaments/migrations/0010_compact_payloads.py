@@ -0,0 +1,116 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:42
+
+import structlog
+from django.db import migrations, transaction
+
+import tournaments.fields
+
+logger = structlog.get_logger(__name__)
+
+# Keys of the payloads kept inline in `raw` (as of this migration)
+INLINE_RAW_FIELDS = {
+    "ride": (
+        "title",
+        "duration",
+        "fitness_discipline",
+        "instructor_id",
+        "scheduled_start_time",
+    ),
+    "workout": (
+        "created_at",
+        "start_time",
+        "end_time",
+        "status",
+        "fitness_discipline",
+        "total_work",
+    ),
+}
+BATCH_SIZE = 1000
+
+
+def compact_payloads(apps, schema_editor):
+    """Moves full payloads into `raw_payload`, keeping only a few keys in `raw`.
+
+    Each batch is committed as it goes (and already compacted rows are
+    skipped), so this can safely be re-run if interrupted.
+    """
+    for model, fields in INLINE_RAW_FIELDS.items():
+        Model = apps.get_model("tournaments", model)
+        rows = Model.objects.filter(raw__isnull=False, raw_payload__isnull=True)
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                row.raw_payload = row.raw
+                row.raw = {key: row.raw[key] for key in fields if key in row.raw}
+            with transaction.atomic():
+                Model.objects.bulk_update(batch, ["raw", "raw_payload"])
+            last_pk = batch[-1].pk
+            logger.info("Compacted payloads", model=model, last_pk=last_pk)
+
+
+def restore_payloads(apps, schema_editor):
+    for model in INLINE_RAW_FIELDS:
+        Model = apps.get_model("tournaments", model)
+        Model.objects.filter(raw_payload__isnull=False).update(raw=None)
+        rows = Model.objects.filter(raw__isnull=True, raw_payload__isnull=False)
+        while True:
+            batch = list(rows[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                row.raw = row.raw_payload
+            with transaction.atomic():
+                Model.objects.bulk_update(batch, ["raw"])
+
+
+class Migration(migrations.Migration):
+
+    # (Batches of rows are committed separately, see `compact_payloads`)
+    atomic = False
+
+    dependencies = [
+        ("tournaments", "0009_tournament_modified_at"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="instructor",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="pelotonprofile",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="ride",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="workout",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AddField(
+            model_name="instructor",
+            name="raw_payload",
+            field=tournaments.fields.CompressedJSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name="pelotonprofile",
+            name="raw_payload",
+            field=tournaments.fields.CompressedJSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name="ride",
+            name="raw_payload",
+            field=tournaments.fields.CompressedJSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name="workout",
+            name="raw_payload",
+            field=tournaments.fields.CompressedJSONField(null=True),
+        ),
+        migrations.RunPython(compact_payloads, restore_payloads),
+    ]
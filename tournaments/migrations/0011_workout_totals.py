@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:44
+
+import structlog
+from django.db import migrations, models, transaction
+
+logger = structlog.get_logger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def populate_totals(apps, schema_editor):
+    """Derives each completed workout's duration and average output, a batch at a time."""
+    Workout = apps.get_model("tournaments", "workout")
+    rows = Workout.objects.filter(
+        start_time__isnull=False, end_time__isnull=False
+    ).only("pk", "start_time", "end_time", "total_work", "average_output")
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            row.duration_seconds = (row.end_time - row.start_time).total_seconds()
+            if row.duration_seconds > 0 and row.total_work is not None:
+                row.average_output = row.total_work / row.duration_seconds
+        with transaction.atomic():
+            Workout.objects.bulk_update(batch, ["duration_seconds", "average_output"])
+        last_pk = batch[-1].pk
+        logger.info("Populated workout totals", last_pk=last_pk)
+
+
+class Migration(migrations.Migration):
+
+    # (Batches of rows are committed separately, see `populate_totals`)
+    atomic = False
+
+    dependencies = [
+        ("tournaments", "0010_compact_payloads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workout",
+            name="average_output",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="workout",
+            name="duration_seconds",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:45
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """Builds the index without blocking writes to the table (on Postgres)."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    # (Indexes can only be built concurrently outside of a transaction)
+    atomic = False
+
+    dependencies = [
+        ("tournaments", "0011_workout_totals"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name="tournament",
+            index=models.Index(fields=["end_date"], name="tournament_end_date_idx"),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="tournamentmember",
+            index=models.Index(
+                fields=["peloton_profile", "tournament"],
+                name="member_rider_tournament_idx",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="tournamentmember",
+            index=models.Index(fields=["tournament", "role"], name="member_role_idx"),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="tournamentmember",
+            index=models.Index(
+                fields=["tournament", "team", "id"], name="member_team_idx"
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="workout",
+            index=models.Index(
+                fields=["peloton_profile", "ride", "-total_work"],
+                include=("id", "duration_seconds", "average_output"),
+                name="workout_rider_ride_work_idx",
+            ),
+        ),
+    ]
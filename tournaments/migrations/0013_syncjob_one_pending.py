@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:57
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_jobs(apps, schema_editor):
+    """Leaves only the oldest of any syncs queued at once for the same tournament."""
+    SyncJob = apps.get_model("tournaments", "syncjob")
+    seen = set()
+    duplicates = []
+    pending = SyncJob.objects.filter(status__in=["queued", "running"])
+    for pk, tournament_id in pending.order_by("created_at", "pk").values_list(
+        "pk", "tournament_id"
+    ):
+        if tournament_id in seen:
+            duplicates.append(pk)
+        seen.add(tournament_id)
+    SyncJob.objects.filter(pk__in=duplicates).update(
+        status="failed", error="Duplicate of an earlier job", finished_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tournaments", "0012_leaderboard_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="syncjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["queued", "running"])),
+                fields=("tournament",),
+                name="syncjob_one_pending_per_tournament",
+            ),
+        ),
+    ]
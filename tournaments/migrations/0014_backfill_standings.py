@@ -0,0 +1,102 @@
+import structlog
+from django.db import migrations, transaction
+from django.db.models import Avg, Count, Sum
+
+logger = structlog.get_logger(__name__)
+
+# (As in `tournaments.standings`, which can't be used with historical models)
+TOTALS = {
+    "total_work": Sum("total_work"),
+    "total_duration": Sum("duration"),
+    "workout_count": Count("pk"),
+    "average_output": Avg("average_output"),
+}
+
+
+def backfill_standings(apps, schema_editor):
+    """Builds the standings of tournaments last synced before they were materialized.
+
+    Tournaments synced since are kept up to date by `tournaments.standings`.
+    """
+    Tournament = apps.get_model("tournaments", "tournament")
+    Workout = apps.get_model("tournaments", "workout")
+    BestWorkout = apps.get_model("tournaments", "bestworkout")
+    RiderStanding = apps.get_model("tournaments", "riderstanding")
+    TeamStanding = apps.get_model("tournaments", "teamstanding")
+
+    tournaments = Tournament.objects.exclude(
+        pk__in=BestWorkout.objects.values("tournament")
+    ).order_by("pk")
+    for tournament in tournaments.iterator():
+        workouts = Workout.objects.filter(
+            ride__tournament=tournament,
+            peloton_profile__tournament=tournament,
+            total_work__isnull=False,
+        ).order_by("-total_work")
+        # Workouts are sorted by output, so the first seen for each ride wins
+        best = {}
+        for workout in workouts.values(
+            "pk",
+            "peloton_profile_id",
+            "ride_id",
+            "total_work",
+            "duration_seconds",
+            "average_output",
+        ):
+            key = (workout["peloton_profile_id"], workout["ride_id"])
+            if key not in best:
+                best[key] = BestWorkout(
+                    tournament=tournament,
+                    peloton_profile_id=workout["peloton_profile_id"],
+                    ride_id=workout["ride_id"],
+                    workout_id=workout["pk"],
+                    total_work=workout["total_work"],
+                    duration=workout["duration_seconds"],
+                    average_output=workout["average_output"],
+                )
+        if not best:
+            continue
+
+        with transaction.atomic():
+            BestWorkout.objects.bulk_create(best.values())
+            best_workouts = BestWorkout.objects.filter(tournament=tournament)
+            RiderStanding.objects.filter(tournament=tournament).delete()
+            RiderStanding.objects.bulk_create(
+                RiderStanding(
+                    tournament=tournament,
+                    peloton_profile_id=row.pop("peloton_profile"),
+                    **row,
+                )
+                for row in best_workouts.values("peloton_profile").annotate(**TOTALS)
+            )
+            TeamStanding.objects.filter(tournament=tournament).delete()
+            TeamStanding.objects.bulk_create(
+                TeamStanding(
+                    tournament=tournament,
+                    team_id=row.pop("peloton_profile__tournamentmember__team"),
+                    **row,
+                )
+                for row in best_workouts.filter(
+                    peloton_profile__tournamentmember__tournament=tournament,
+                    peloton_profile__tournamentmember__team__isnull=False,
+                )
+                .values("peloton_profile__tournamentmember__team")
+                .annotate(**TOTALS)
+            )
+        logger.info(
+            "Backfilled standings", tournament=tournament.uid, best_workouts=len(best)
+        )
+
+
+class Migration(migrations.Migration):
+
+    # (Each tournament's standings are committed separately)
+    atomic = False
+
+    dependencies = [
+        ("tournaments", "0013_syncjob_one_pending"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_standings, migrations.RunPython.noop),
+    ]
@@ -1,21 +1,43 @@
+import threading
 from abc import abstractmethod
-from datetime import datetime
-from functools import reduce
+from datetime import datetime, timedelta
+from functools import partial, reduce
 from operator import ior
-from typing import TypeVar
+from typing import (
+    TYPE_CHECKING,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+)
 
 import nanoid
+import structlog
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import F, Q, QuerySet, Subquery, Sum, Window
-from django.db.models.functions import FirstValue
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from fernet_fields import EncryptedTextField
 
 from .external.peloton import NotAuthenticated, PelotonClient
+from .fields import CompressedJSONField
+
+if TYPE_CHECKING:
+    from .sync import SyncProgress
+
+logger = structlog.get_logger(__name__)
 
 PelotonModelType = TypeVar("PelotonModelType", bound="PelotonModel")
 
+# Models already loaded for a batch of payloads, keyed by model class and peloton_id
+ResolvedModels = Dict[Type["PelotonModel"], Dict[str, "PelotonModel"]]
+
 
 def random_uid():
     """
@@ -25,6 +47,15 @@ def random_uid():
     return nanoid.generate(size=21)
 
 
+def _get_resolved(
+    resolved: Optional[ResolvedModels], model_class: Type, peloton_id: str
+) -> Optional["PelotonModel"]:
+    """Returns a model from a batch loaded by `PelotonModel.resolve_related`."""
+    if not resolved:
+        return None
+    return resolved.get(model_class, {}).get(peloton_id)
+
+
 class BaseModel(models.Model):
     id = models.BigAutoField(primary_key=True)
     uid = models.CharField(
@@ -40,14 +71,74 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class PelotonManager(models.Manager):
+    """Leaves out full API payloads (see `PelotonModel.raw_payload`) until they're used."""
+
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().defer("raw_payload")
+
+
 class PelotonModel(BaseModel):
     peloton_id = models.CharField(max_length=64, unique=True)
+    # The API payload the model was last updated from (or just the
+    # `INLINE_RAW_FIELDS` of it, with the rest compressed in `raw_payload`)
     raw = models.JSONField(null=True)
+    raw_payload = CompressedJSONField(null=True)
+
+    objects = PelotonManager()
+
+    # Peloton API endpoint describing a single object of this type
+    API_PATH: str = None
+
+    # Keys of the payload to keep in `raw`, for bulky payloads (`None` keeps it all)
+    INLINE_RAW_FIELDS: Optional[Collection[str]] = None
+
+    # Keys an API payload must contain for `update_from_data` to hydrate a model
+    # from it without fetching the object from the API again
+    REQUIRED_FIELDS: Collection[str] = ()
+
+    # Fields that are maintained locally and never populated from the Peloton API
+    LOCAL_FIELDS: Collection[str] = ()
+
+    @property
+    def payload(self) -> Optional[dict]:
+        """The full API payload the model was last updated from."""
+        return self.raw if self.INLINE_RAW_FIELDS is None else self.raw_payload
+
+    def set_payload(self, data: dict) -> None:
+        if self.INLINE_RAW_FIELDS is None:
+            self.raw, self.raw_payload = data, None
+        else:
+            self.raw = {key: data[key] for key in self.INLINE_RAW_FIELDS if key in data}
+            self.raw_payload = data
 
-    @abstractmethod
     def update_from_api(self, client: PelotonClient) -> None:
+        data = client.get_json(self.API_PATH.format(peloton_id=self.peloton_id))
+        self.update_from_data(data, client)
+
+    @abstractmethod
+    def update_from_data(
+        self, data: dict, client: PelotonClient, resolved: ResolvedModels = None
+    ) -> None:
+        """Merges in fields from a Peloton API payload describing this object.
+
+        Implementations should keep the payload itself with `set_payload`.
+        `resolved` optionally holds related models that were already loaded in
+        bulk (see `resolve_related`), which saves looking them up one-by-one.
+        """
         raise NotImplementedError
 
+    @classmethod
+    def resolve_related(
+        cls, payloads: List[dict], client: PelotonClient, max_workers: int = 1
+    ) -> ResolvedModels:
+        """Loads (in bulk) every related model referenced by a batch of payloads.
+
+        Child classes with foreign keys to other Peloton models should override
+        this, and look up the results in `update_from_data`.
+        """
+        return {}
+
     @classmethod
     def from_peloton_id(
         cls, peloton_id: str, client: PelotonClient
@@ -66,6 +157,138 @@ class PelotonModel(BaseModel):
         model.save()
         return model
 
+    @classmethod
+    def from_peloton_data(cls, data: dict, client: PelotonClient) -> PelotonModelType:
+        """Like `from_peloton_id`, but hydrates from a payload that was already fetched.
+
+        This is useful for objects embedded in other API responses (e.g. - the
+        workouts in a page of a user's workout history).  If the payload is
+        missing any of the `REQUIRED_FIELDS`, the object is fetched instead.
+        """
+        # Return existing model if it exists and cannot be changed
+        model = cls.objects.filter(peloton_id=data["id"]).first()
+        if model and model.is_finalized():
+            return model
+
+        # Create a model class if we don't have one yet
+        if not model:
+            model = cls(peloton_id=data["id"])  # type: PelotonModelType
+
+        # Merge in fields from the payload (or the Peloton API if it's incomplete)
+        if all(field in data for field in cls.REQUIRED_FIELDS):
+            model.update_from_data(data, client)
+        else:
+            model.update_from_api(client)
+        model.save()
+        return model
+
+    @classmethod
+    def from_peloton_ids(
+        cls,
+        peloton_ids: Iterable[str],
+        client: PelotonClient,
+        max_workers: int = 1,
+        force: bool = False,
+    ) -> Dict[str, PelotonModelType]:
+        """Bulk version of `from_peloton_id`, returning models keyed by peloton_id.
+
+        Existing models are loaded in a single query, and only those missing or
+        not yet finalized (or all of them, if `force` is set) are fetched from
+        the Peloton API, using up to `max_workers` concurrent requests.
+        """
+        peloton_ids = set(peloton_ids)
+        existing = cls.objects.in_bulk(peloton_ids, field_name="peloton_id")
+        stale_ids = [
+            peloton_id
+            for peloton_id in peloton_ids
+            if force
+            or peloton_id not in existing
+            or not existing[peloton_id].is_finalized()
+        ]
+        payloads = client.get_json_many(
+            [cls.API_PATH.format(peloton_id=peloton_id) for peloton_id in stale_ids],
+            max_workers=max_workers,
+        )
+        return cls._hydrate_many(
+            existing, dict(zip(stale_ids, payloads)), client, max_workers
+        )
+
+    @classmethod
+    def from_peloton_data_many(
+        cls, payloads: Iterable[dict], client: PelotonClient, max_workers: int = 1
+    ) -> Dict[str, PelotonModelType]:
+        """Bulk version of `from_peloton_data`, returning models keyed by peloton_id."""
+        payloads = {data["id"]: data for data in payloads}
+        existing = cls.objects.in_bulk(list(payloads), field_name="peloton_id")
+        stale = {
+            peloton_id: data
+            for peloton_id, data in payloads.items()
+            if peloton_id not in existing or not existing[peloton_id].is_finalized()
+        }
+
+        # Fetch any payloads that are too incomplete to hydrate from
+        incomplete_ids = [
+            peloton_id
+            for peloton_id, data in stale.items()
+            if not all(field in data for field in cls.REQUIRED_FIELDS)
+        ]
+        fetched = client.get_json_many(
+            [
+                cls.API_PATH.format(peloton_id=peloton_id)
+                for peloton_id in incomplete_ids
+            ],
+            max_workers=max_workers,
+        )
+        stale.update(zip(incomplete_ids, fetched))
+        return cls._hydrate_many(existing, stale, client, max_workers)
+
+    @classmethod
+    def _hydrate_many(
+        cls,
+        existing: Dict[str, PelotonModelType],
+        payloads: Dict[str, dict],
+        client: PelotonClient,
+        max_workers: int,
+    ) -> Dict[str, PelotonModelType]:
+        """Merges payloads into new/existing models and saves them in bulk."""
+        resolved = cls.resolve_related(list(payloads.values()), client, max_workers)
+        created, updated = [], []
+        for peloton_id, data in payloads.items():
+            model = existing.get(peloton_id)
+            if model:
+                updated.append(model)
+            else:
+                model = cls(peloton_id=peloton_id)  # type: PelotonModelType
+                created.append(model)
+            model.update_from_data(data, client, resolved=resolved)
+
+        with transaction.atomic():
+            cls.objects.bulk_create(created)
+            if updated:
+                cls.objects.bulk_update(updated, cls._api_field_names())
+
+        models = dict(existing)
+        models.update({model.peloton_id: model for model in created})
+        # Not every database reports primary keys back from `bulk_create`
+        if any(model.pk is None for model in created):
+            models.update(
+                cls.objects.in_bulk(
+                    [model.peloton_id for model in created], field_name="peloton_id"
+                )
+            )
+        return models
+
+    @classmethod
+    def _api_field_names(cls) -> List[str]:
+        """Names of the fields `update_from_data` may have changed."""
+        return [
+            field.name
+            for field in cls._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in {"uid", "peloton_id"}
+            and field.name not in cls.LOCAL_FIELDS
+        ]
+
     def is_finalized(self) -> bool:
         """Indicates whether an object is immutable or if it can be updated from Peloton API data.
 
@@ -78,6 +301,8 @@ class PelotonModel(BaseModel):
 
     class Meta:
         abstract = True
+        # (So related objects, e.g. - `workout.ride`, leave out payloads too)
+        base_manager_name = "objects"
 
 
 class PelotonProfile(PelotonModel):
@@ -91,22 +316,19 @@ class PelotonProfile(PelotonModel):
         User, null=True, on_delete=models.DO_NOTHING, related_name="profile"
     )
     last_linked = models.DateTimeField(null=True)
-
-    @property
-    def best_workouts(self) -> QuerySet:
-        """Returns a query set producing the highest-output workout for each ride."""
-        subquery = (
-            Workout.objects.filter(peloton_profile=self)
-            .annotate(
-                best_pk=Window(
-                    expression=FirstValue("pk"),
-                    partition_by=[F("ride__id")],
-                    order_by=F("total_work").desc(),
-                )
-            )
-            .values("best_pk")
-        )
-        return Workout.objects.filter(pk__in=Subquery(subquery))
+    # Result of the last time the Peloton session was checked
+    session_valid = models.BooleanField(default=False)
+    session_verified_at = models.DateTimeField(null=True)
+
+    API_PATH = "/api/user/{peloton_id}"
+    REQUIRED_FIELDS = ("id", "username", "image_url")
+    LOCAL_FIELDS = (
+        "peloton_session_id",
+        "user",
+        "last_linked",
+        "session_valid",
+        "session_verified_at",
+    )
 
     @classmethod
     def from_peloton_id_or_username(
@@ -136,28 +358,82 @@ class PelotonProfile(PelotonModel):
 
     def update_from_api(self, client: PelotonClient) -> None:
         if self.peloton_id:
-            data = client.get_json(f"/api/user/{self.peloton_id}")
-            self.username = self.username = data["username"]
+            data = client.get_json(self.API_PATH.format(peloton_id=self.peloton_id))
         elif self.username:
-            data = client.get_json(f"/api/user/{self.username}")
-            self.peloton_id = data["id"]
+            data = client.get_json(self.API_PATH.format(peloton_id=self.username))
         else:
             raise ValueError("Unable to lookup user without peloton_id or username")
+        self.update_from_data(data, client)
+
+    def update_from_data(
+        self, data: dict, client: PelotonClient, resolved: ResolvedModels = None
+    ) -> None:
+        self.peloton_id = data["id"]
+        self.username = data["username"]
         self.image_url = data["image_url"]
-        self.raw = data
+        self.set_payload(data)
 
     def is_finalized(self) -> bool:
         return bool(self.image_url)
 
     def has_valid_session(self) -> bool:
+        """Indicates whether the linked Peloton session is still active.
+
+        The result of checking with Peloton is remembered on the profile for
+        `settings.PELOTON_SESSION_TTL` seconds (or until a Peloton call made
+        with the session is rejected), so this is usually free to call.
+        """
         if not self.peloton_session_id:
             return False
+        if self.session_verified_at and timezone.now() < (
+            self.session_verified_at + timedelta(seconds=settings.PELOTON_SESSION_TTL)
+        ):
+            return self.session_valid
         client = PelotonClient()
         try:
             client.load_session(str(self.peloton_session_id))
-            return True
+            valid = True
         except NotAuthenticated:
-            return False
+            valid = False
+        self.record_session_check(valid)
+        return valid
+
+    def record_session_check(self, valid: bool, save: bool = True) -> None:
+        self.session_valid = valid
+        self.session_verified_at = timezone.now()
+        self._unsaved_session_check = not save
+        if save and self.pk:
+            self.save(update_fields=["session_valid", "session_verified_at"])
+
+    def save_session_check(self) -> None:
+        """Saves a session check that was only recorded (see `_check_authorized`)."""
+        if getattr(self, "_unsaved_session_check", False):
+            self.record_session_check(self.session_valid)
+
+    def get_client(self) -> PelotonClient:
+        """Returns a client logged into the Peloton API with this profile's session.
+
+        Raises `NotAuthenticated` if the profile doesn't have a valid session.
+        """
+        if not self.has_valid_session():
+            raise NotAuthenticated(username=self.username)
+        client = PelotonClient(username=self.username)
+        client.set_session(str(self.peloton_session_id))
+        client.hooks["response"].append(
+            partial(self._check_authorized, thread_id=threading.get_ident())
+        )
+        return client
+
+    def _check_authorized(self, response, *args, thread_id: int, **kwargs):
+        """Response hook that forgets the session once Peloton stops accepting it.
+
+        Clones of the client (see `PelotonClient.clone`) also call this from
+        other threads, where the DB isn't touched: the rejection is only saved
+        once the thread that made the client calls `save_session_check`.
+        """
+        if response.status_code == 401 and self.session_valid:
+            logger.info("Peloton session rejected", username=self.username)
+            self.record_session_check(False, save=threading.get_ident() == thread_id)
 
     def __str__(self):
         return self.username
@@ -167,11 +443,15 @@ class Instructor(PelotonModel):
     name = models.CharField(max_length=150)
     image_url = models.CharField(max_length=150)
 
-    def update_from_api(self, client: PelotonClient) -> None:
-        data = client.get_json(f"/api/instructor/{self.peloton_id}")
+    API_PATH = "/api/instructor/{peloton_id}"
+    REQUIRED_FIELDS = ("name", "image_url")
+
+    def update_from_data(
+        self, data: dict, client: PelotonClient, resolved: ResolvedModels = None
+    ) -> None:
         self.name = data["name"]
         self.image_url = data["image_url"]
-        self.raw = data
+        self.set_payload(data)
 
     def is_finalized(self) -> bool:
         return bool(self.name)
@@ -187,16 +467,46 @@ class Ride(PelotonModel):
     scheduled_start_time = models.DateTimeField(null=True)
     instructor = models.ForeignKey(Instructor, null=True, on_delete=models.CASCADE)
 
-    def update_from_api(self, client: PelotonClient) -> None:
-        data = client.get_json(f"/api/ride/{self.peloton_id}")
+    API_PATH = "/api/ride/{peloton_id}"
+    INLINE_RAW_FIELDS = (
+        "title",
+        "duration",
+        "fitness_discipline",
+        "instructor_id",
+        "scheduled_start_time",
+    )
+    REQUIRED_FIELDS = (
+        "title",
+        "description",
+        "image_url",
+        "scheduled_start_time",
+        "instructor_id",
+    )
+
+    @classmethod
+    def resolve_related(
+        cls, payloads: List[dict], client: PelotonClient, max_workers: int = 1
+    ) -> ResolvedModels:
+        instructor_ids = {data["instructor_id"] for data in payloads}
+        return {
+            Instructor: Instructor.from_peloton_ids(
+                instructor_ids, client, max_workers=max_workers
+            )
+        }
+
+    def update_from_data(
+        self, data: dict, client: PelotonClient, resolved: ResolvedModels = None
+    ) -> None:
         self.title = data["title"]
         self.description = data["description"]
         self.image_url = data["image_url"]
         self.scheduled_start_time = datetime.utcfromtimestamp(
             data["scheduled_start_time"]
         )
-        self.instructor = Instructor.from_peloton_id(data["instructor_id"], client)
-        self.raw = data
+        self.instructor = _get_resolved(
+            resolved, Instructor, data["instructor_id"]
+        ) or Instructor.from_peloton_id(data["instructor_id"], client)
+        self.set_payload(data)
 
     def is_finalized(self) -> bool:
         return bool(self.title)
@@ -220,26 +530,55 @@ class Workout(PelotonModel):
         null=True
     )  # KJs (divide by 1000 to get recognizable value)
 
-    @property
-    def duration(self) -> float:
-        """Returns the duration of the workout in seconds (or 0 if not yet completed)"""
-        if self.raw.get("start_time") and self.raw.get("end_time"):
-            return self.raw["end_time"] - self.raw["start_time"]
-        else:
-            return 0
-
-    @property
-    def average_output(self) -> float:
-        duration = self.duration
-        if duration <= 0:
-            return 0
-        else:
-            return self.total_work / duration
+    # Derived from the payload as it's synced (so standings can be totalled in SQL)
+    duration_seconds = models.FloatField(default=0)  # 0 if not yet completed
+    average_output = models.FloatField(default=0)  # watts
+
+    class Meta(PelotonModel.Meta):
+        indexes = [
+            # Each rider's workouts for a ride, best first (see `ranked_workouts`),
+            # covering everything copied into their `BestWorkout` (on Postgres)
+            models.Index(
+                fields=["peloton_profile", "ride", "-total_work"],
+                include=["id", "duration_seconds", "average_output"],
+                name="workout_rider_ride_work_idx",
+            ),
+        ]
+
+    API_PATH = "/api/workout/{peloton_id}"
+    INLINE_RAW_FIELDS = (
+        "created_at",
+        "start_time",
+        "end_time",
+        "status",
+        "fitness_discipline",
+        "total_work",
+    )
+    # NOTE: The workouts listed by `PelotonClient.get_workouts` embed the full ride
+    REQUIRED_FIELDS = ("ride", "user_id", "status")
 
-    def update_from_api(self, client: PelotonClient) -> None:
-        data = client.get_json(f"/api/workout/{self.peloton_id}")
-        ride = Ride.from_peloton_id(data["ride"]["id"], client)
-        profile = PelotonProfile.from_peloton_id(data["user_id"], client)
+    @classmethod
+    def resolve_related(
+        cls, payloads: List[dict], client: PelotonClient, max_workers: int = 1
+    ) -> ResolvedModels:
+        rides = [data["ride"] for data in payloads]
+        user_ids = {data["user_id"] for data in payloads}
+        return {
+            Ride: Ride.from_peloton_data_many(rides, client, max_workers=max_workers),
+            PelotonProfile: PelotonProfile.from_peloton_ids(
+                user_ids, client, max_workers=max_workers
+            ),
+        }
+
+    def update_from_data(
+        self, data: dict, client: PelotonClient, resolved: ResolvedModels = None
+    ) -> None:
+        ride = _get_resolved(
+            resolved, Ride, data["ride"]["id"]
+        ) or Ride.from_peloton_data(data["ride"], client)
+        profile = _get_resolved(
+            resolved, PelotonProfile, data["user_id"]
+        ) or PelotonProfile.from_peloton_id(data["user_id"], client)
         self.ride = ride
         self.peloton_profile = profile
         self.status = data["status"]
@@ -248,7 +587,15 @@ class Workout(PelotonModel):
             self.start_time = datetime.utcfromtimestamp(data["start_time"])
         if data.get("end_time"):
             self.end_time = datetime.utcfromtimestamp(data["end_time"])
-        self.raw = data
+        if data.get("start_time") and data.get("end_time"):
+            self.duration_seconds = data["end_time"] - data["start_time"]
+        else:
+            self.duration_seconds = 0
+        if self.duration_seconds > 0 and self.total_work is not None:
+            self.average_output = self.total_work / self.duration_seconds
+        else:
+            self.average_output = 0
+        self.set_payload(data)
 
     def is_finalized(self) -> bool:
         return self.status and self.status == "COMPLETED"
@@ -277,10 +624,19 @@ class Tournament(BaseModel):
     end_date = models.DateTimeField()
     last_synced = models.DateTimeField(null=True)
     visibility = models.CharField(max_length=16, default=Visibility.PRIVATE)
+    # Bumped by any edit that changes what the tournament page shows
+    revision = models.PositiveIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
 
     participants = models.ManyToManyField(PelotonProfile, through="TournamentMember")
     rides = models.ManyToManyField(Ride, through="TournamentRide")
 
+    class Meta:
+        indexes = [
+            # Active tournaments, to auto-sync (past ones pile up, upcoming don't)
+            models.Index(fields=["end_date"], name="tournament_end_date_idx"),
+        ]
+
     @property
     def admins(self) -> QuerySet:
         return PelotonProfile.objects.filter(
@@ -301,6 +657,27 @@ class Tournament(BaseModel):
     def roles(self):
         return TournamentMember.Role.choices
 
+    @property
+    def cache_version(self) -> str:
+        """Identifies the current state of the tournament page (for caching)."""
+        last_synced = self.last_synced.timestamp() if self.last_synced else 0
+        return f"{self.revision}-{last_synced}"
+
+    def bump_revision(self) -> None:
+        """Marks the tournament as edited, invalidating any cached page fragments."""
+        Tournament.objects.filter(pk=self.pk).update(
+            revision=F("revision") + 1, modified_at=timezone.now()
+        )
+        self.refresh_from_db(fields=["revision", "modified_at"])
+
+    def reset_sync_cursors(self) -> None:
+        """Forces the next sync to re-read every participant's full workout history.
+
+        Needed whenever a change (e.g. - adding a ride, moving the start date)
+        could make previously-skipped workouts relevant.
+        """
+        SyncCursor.objects.filter(tournament=self).delete()
+
     def __str__(self):
         return self.name
 
@@ -315,41 +692,40 @@ class TournamentTeam(BaseModel):
     @property
     def best_workouts(self) -> QuerySet:
         """Returns the best ride for each rider for this tournament"""
-        subquery = self._best_workouts_filter(returns="pk").values("pk")
-        return Workout.objects.filter(pk__in=Subquery(subquery))
+        return Workout.objects.filter(
+            best_in__tournament=self.tournament,
+            best_in__peloton_profile__tournamentmember__team=self,
+        )
+
+    @cached_property
+    def standing(self) -> "TeamStanding":
+        """Returns the team's totals (which are all zero until it has a workout)"""
+        return TeamStanding.objects.filter(team=self).first() or TeamStanding(
+            tournament=self.tournament, team=self
+        )
 
     @property
     def total_work(self) -> float:
         """Returns the sum of outputs the best ride for each rider for this tournament"""
-        return (
-            self._best_workouts_filter(returns="total_work").aggregate(
-                sum=Sum("total_work")
-            )["sum"]
-            or 0
-        )
+        return self.standing.total_work
 
     @property
     def total_duration(self) -> float:
         """Returns the sum of durations the best ride for each rider for this tournament (in seconds)"""
-        total_duration = 0
-        for workout in self.best_workouts:
-            total_duration += (
-                (workout.end_time - workout.start_time).total_seconds()
-                if workout.end_time
-                else 0
-            )
-        return total_duration
+        return self.standing.total_duration
 
-    def _best_workouts_filter(self, returns: str) -> QuerySet:
-        return Workout.objects.filter(
-            peloton_profile__tournamentteam=self, ride__tournament=self.tournament
-        ).annotate(
-            best_pk=Window(
-                expression=FirstValue(returns),
-                partition_by=[F("ride__id"), F("peloton_profile__id")],
-                order_by=F("total_work").desc(),
-            )
-        )
+    @property
+    def workout_count(self) -> int:
+        return self.standing.workout_count
+
+    @property
+    def average_output(self) -> float:
+        return self.standing.average_output
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The team's name is shown in the tournament's cached page fragments
+        self.tournament.bump_revision()
 
     def __str__(self):
         return self.name
@@ -373,7 +749,232 @@ class TournamentMember(BaseModel):
 
     class Meta:
         unique_together = [["tournament", "peloton_profile", "team"]]
+        indexes = [
+            # A rider's tournaments (e.g. - on the index page)
+            models.Index(
+                fields=["peloton_profile", "tournament"],
+                name="member_rider_tournament_idx",
+            ),
+            # A tournament's admins
+            models.Index(fields=["tournament", "role"], name="member_role_idx"),
+            # A tournament's teams' members, in the order they joined
+            models.Index(fields=["tournament", "team", "id"], name="member_team_idx"),
+        ]
 
     def __str__(self):
         team_name = self.team.name if self.team else "unassigned"
         return f"{self.peloton_profile.username} ({team_name})"
+
+
+class BestWorkout(BaseModel):
+    """A rider's highest-output workout for one of a tournament's rides.
+
+    Rows are maintained by `tournaments.standings` whenever workouts are synced
+    or the tournament's rides or participants change.
+    """
+
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="best_workouts"
+    )
+    peloton_profile = models.ForeignKey(PelotonProfile, on_delete=models.CASCADE)
+    ride = models.ForeignKey(Ride, on_delete=models.CASCADE)
+    workout = models.ForeignKey(
+        Workout, on_delete=models.CASCADE, related_name="best_in"
+    )
+    total_work = models.FloatField()
+    duration = models.FloatField()  # seconds
+    average_output = models.FloatField()  # watts
+
+    class Meta:
+        unique_together = [["tournament", "peloton_profile", "ride"]]
+
+
+class Standing(BaseModel):
+    """Totals across a set of `BestWorkout`s in a tournament."""
+
+    total_work = models.FloatField(default=0)
+    total_duration = models.FloatField(default=0)
+    workout_count = models.PositiveIntegerField(default=0)
+    average_output = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class RiderStanding(Standing):
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="rider_standings"
+    )
+    peloton_profile = models.ForeignKey(PelotonProfile, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [["tournament", "peloton_profile"]]
+
+
+class TeamStanding(Standing):
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="team_standings"
+    )
+    team = models.OneToOneField(TournamentTeam, on_delete=models.CASCADE)
+
+
+class SyncCursor(BaseModel):
+    """Tracks how far back a participant's workouts have been synced for a tournament.
+
+    `latest_workout_at` is the creation time of the newest workout seen in the
+    tournament window.  If every relevant workout up to that point was
+    `COMPLETED` the cursor is finalized, and later syncs only need to page back
+    as far as `latest_workout_at`.
+    """
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    peloton_profile = models.ForeignKey(PelotonProfile, on_delete=models.CASCADE)
+    latest_workout_at = models.DateTimeField(null=True)
+    is_finalized = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [["tournament", "peloton_profile"]]
+
+    @property
+    def resume_from(self) -> Optional[datetime]:
+        """Returns the point syncing can resume from, or `None` for a full sync."""
+        return self.latest_workout_at if self.is_finalized else None
+
+    def advance(self, pages: "SyncProgress") -> None:
+        """Moves the cursor past the workouts (from the Peloton list API) just synced.
+
+        `pages` must cover everything since `resume_from` (or the tournament
+        start), not just the workouts for the tournament's rides.
+        """
+        if pages.latest_workout_at:
+            if not self.resume_from or pages.latest_workout_at > self.resume_from:
+                self.latest_workout_at = pages.latest_workout_at
+        self.is_finalized = pages.all_completed
+
+    def __str__(self):
+        return f"{self.peloton_profile} @ {self.latest_workout_at}"
+
+
+class SyncJob(BaseModel):
+    """A queued request to sync a tournament's rides and workouts from Peloton.
+
+    Jobs are enqueued by `SyncView` and processed out-of-band by the
+    `sync_worker` management command, which claims a few jobs at a time
+    (so riders in several of their tournaments are only fetched once).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        SUCCEEDED = "succeeded", _("Succeeded")
+        FAILED = "failed", _("Failed")
+
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="sync_jobs"
+    )
+    # Whose Peloton session the worker should use to talk to the API
+    requested_by = models.ForeignKey(
+        PelotonProfile, null=True, on_delete=models.SET_NULL
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress_current = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    PENDING_STATUSES = (Status.QUEUED, Status.RUNNING)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tournament"],
+                condition=Q(status__in=["queued", "running"]),
+                name="syncjob_one_pending_per_tournament",
+            )
+        ]
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in {self.Status.SUCCEEDED, self.Status.FAILED}
+
+    @classmethod
+    def enqueue(
+        cls, tournament: Tournament, requested_by: PelotonProfile = None
+    ) -> "SyncJob":
+        """Queues a sync for the tournament, or returns the one already pending."""
+        pending = cls.objects.filter(
+            tournament=tournament, status__in=cls.PENDING_STATUSES
+        )
+        job = pending.first()
+        if job:
+            return job
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    tournament=tournament, requested_by=requested_by
+                )
+        except IntegrityError:
+            # Queued at the same time by someone else (see `Meta.constraints`)
+            return pending.get()
+
+    @classmethod
+    def claim_next(cls, stale_after: timedelta) -> Optional["SyncJob"]:
+        """Atomically marks the next runnable job as running and returns it."""
+        jobs = cls.claim_batch(stale_after, limit=1)
+        return jobs[0] if jobs else None
+
+    @classmethod
+    def claim(cls, uid: str, stale_after: timedelta) -> Optional["SyncJob"]:
+        """Atomically marks a specific job as running (if runnable) and returns it."""
+        jobs = cls._claim(cls.objects.filter(uid=uid), stale_after, limit=1)
+        return jobs[0] if jobs else None
+
+    @classmethod
+    def claim_batch(cls, stale_after: timedelta, limit: int) -> List["SyncJob"]:
+        """Atomically marks up to `limit` runnable jobs as running and returns them.
+
+        Jobs left `RUNNING` by a worker that stopped heart-beating for longer
+        than `stale_after` are considered abandoned and are claimed again.
+        """
+        return cls._claim(cls.objects.all(), stale_after, limit)
+
+    @classmethod
+    def _claim(
+        cls, jobs: QuerySet, stale_after: timedelta, limit: int
+    ) -> List["SyncJob"]:
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                jobs.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=cls.Status.QUEUED, run_after__lte=now)
+                    | Q(status=cls.Status.RUNNING, heartbeat_at__lt=now - stale_after)
+                )
+                .order_by("run_after")[:limit]
+            )
+            for job in jobs:
+                job.status = cls.Status.RUNNING
+                job.attempts += 1
+                job.started_at = now
+                job.heartbeat_at = now
+                job.error = None
+                job.save()
+        return jobs
+
+    def update_progress(self, current: int, total: int) -> None:
+        self.progress_current = current
+        self.progress_total = total
+        self.heartbeat_at = timezone.now()
+        self.save(update_fields=["progress_current", "progress_total", "heartbeat_at"])
+
+    def __str__(self):
+        return f"Sync {self.tournament} ({self.status})"
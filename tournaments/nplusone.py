@@ -0,0 +1,139 @@
+import random
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+from typing import Dict, List, NamedTuple
+
+import structlog
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = structlog.get_logger(__name__)
+
+# Near-identical statements differ only in their literals (and the length of IN lists)
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"(?:%s|\?)(?:\s*,\s*(?:%s|\?))+"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+"), " "),
+)
+_WRAPPER_ARGS = {"execute", "sql", "params", "many", "context"}
+
+
+class NPlusOneError(Exception):
+    """Raised (instead of logging) when `NPLUSONE_RAISE` is set, e.g. - in tests."""
+
+    def __init__(self, path: str, patterns: List["RepeatedQuery"]):
+        self.path = path
+        self.patterns = patterns
+        super().__init__(
+            f"{path} repeated {len(patterns)} query pattern(s): "
+            + "; ".join(
+                f"{pattern.count}x from {pattern.origin}: {pattern.sql}"
+                for pattern in patterns
+            )
+        )
+
+
+class RepeatedQuery(NamedTuple):
+    sql: str  # The fingerprint
+    count: int
+    origin: str  # Where most of the queries came from
+
+
+def fingerprint(sql: str) -> str:
+    for pattern, replacement in _NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def query_origin() -> str:
+    """Describes what made the current query: a template line or else a project frame."""
+    frame = sys._getframe(1)
+    code_frame = None
+    while frame:
+        # (`type`, since `isinstance` would evaluate lazy objects, making more queries)
+        node = frame.f_locals.get("self")
+        if issubclass(type(node), Node) and getattr(node, "token", None):
+            origin = getattr(node, "origin", None)
+            name = getattr(origin, "template_name", None) or "<template>"
+            return f"{name}:{node.token.lineno}"
+        filename = frame.f_code.co_filename
+        if (
+            code_frame is None
+            and filename.startswith(str(settings.BASE_DIR))
+            and "site-packages" not in filename
+            and not _is_execute_wrapper(frame.f_code)
+        ):
+            code_frame = f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return code_frame or "unknown"
+
+
+def _is_execute_wrapper(code) -> bool:
+    """Whether code is a database execute wrapper (like `QueryCollector`)."""
+    return _WRAPPER_ARGS <= set(code.co_varnames[: code.co_argcount])
+
+
+class QueryCollector:
+    """An execute wrapper grouping a request's queries by fingerprint."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.origins: Dict[str, Counter] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.origins.setdefault(key, Counter())[query_origin()] += 1
+        self.counts[key] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold: int) -> List[RepeatedQuery]:
+        return [
+            RepeatedQuery(sql, count, self.origins[sql].most_common(1)[0][0])
+            for sql, count in self.counts.most_common()
+            if count > threshold
+        ]
+
+
+class NPlusOneMiddleware:
+    """Flags requests repeating near-identical queries (usually lazy loads in a loop).
+
+    A `NPLUSONE_SAMPLE_RATE` fraction of requests have their queries
+    fingerprinted.  Any fingerprint seen more than `NPLUSONE_THRESHOLD` times
+    is logged as a warning (or raised as a `NPlusOneError` if
+    `NPLUSONE_RAISE` is set), along with the template line or view frame
+    that made most of those queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.NPLUSONE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        collector = QueryCollector()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        self.report(request, collector.repeated(settings.NPLUSONE_THRESHOLD))
+        return response
+
+    def report(self, request, patterns: List[RepeatedQuery]) -> None:
+        if not patterns:
+            return
+        if settings.NPLUSONE_RAISE:
+            raise NPlusOneError(request.path, patterns)
+        for pattern in patterns:
+            logger.warning(
+                "Repeated query",
+                path=request.path,
+                count=pattern.count,
+                origin=pattern.origin,
+                sql=pattern.sql,
+            )
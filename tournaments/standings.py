@@ -0,0 +1,129 @@
+from typing import Iterable
+
+import structlog
+from django.db import transaction
+from django.db.models import Avg, Count, QuerySet, Sum
+
+from .models import (
+    BestWorkout,
+    PelotonProfile,
+    RiderStanding,
+    TeamStanding,
+    Tournament,
+    Workout,
+)
+
+logger = structlog.get_logger(__name__)
+
+# Aggregates over `BestWorkout`s used to populate each `Standing`
+_TOTALS = {
+    "total_work": Sum("total_work"),
+    "total_duration": Sum("duration"),
+    "workout_count": Count("pk"),
+    "average_output": Avg("average_output"),
+}
+
+
+@transaction.atomic
+def refresh_standings(
+    tournament: Tournament, profiles: Iterable[PelotonProfile] = None
+) -> None:
+    """Recomputes the best workouts (and all totals) for a tournament.
+
+    If `profiles` is given, only the best workouts of those riders are
+    recomputed, which is all that's needed after syncing their workouts.
+    """
+    stale = BestWorkout.objects.filter(tournament=tournament)
+    if profiles is not None:
+        profiles = list(profiles)
+        stale = stale.filter(peloton_profile__in=profiles)
+    workouts = ranked_workouts(tournament, profiles)
+
+    # Workouts are sorted by output, so the first seen for each ride wins
+    best = {}
+    for workout in workouts.values(
+        "pk",
+        "peloton_profile_id",
+        "ride_id",
+        "total_work",
+        "duration_seconds",
+        "average_output",
+    ):
+        key = (workout["peloton_profile_id"], workout["ride_id"])
+        if key not in best:
+            best[key] = BestWorkout(
+                tournament=tournament,
+                peloton_profile_id=workout["peloton_profile_id"],
+                ride_id=workout["ride_id"],
+                workout_id=workout["pk"],
+                total_work=workout["total_work"],
+                duration=workout["duration_seconds"],
+                average_output=workout["average_output"],
+            )
+    stale.delete()
+    BestWorkout.objects.bulk_create(best.values())
+    logger.info(
+        "Refreshed best workouts", tournament=tournament.uid, best_workouts=len(best)
+    )
+
+    refresh_rider_standings(tournament)
+    refresh_team_standings(tournament)
+
+
+def ranked_workouts(
+    tournament: Tournament, profiles: Iterable[PelotonProfile] = None
+) -> QuerySet:
+    """Returns the workouts counting toward a tournament, highest output first.
+
+    Limited to those of `profiles`, if given.
+    """
+    workouts = Workout.objects.filter(
+        ride__tournament=tournament,
+        peloton_profile__tournament=tournament,
+        total_work__isnull=False,
+    ).order_by("-total_work")
+    if profiles is not None:
+        workouts = workouts.filter(peloton_profile__in=profiles)
+    return workouts
+
+
+@transaction.atomic
+def refresh_rider_standings(tournament: Tournament) -> None:
+    """Recomputes each rider's totals from the tournament's best workouts."""
+    totals = (
+        BestWorkout.objects.filter(tournament=tournament)
+        .values("peloton_profile")
+        .annotate(**_TOTALS)
+    )
+    RiderStanding.objects.filter(tournament=tournament).delete()
+    RiderStanding.objects.bulk_create(
+        RiderStanding(
+            tournament=tournament,
+            peloton_profile_id=row.pop("peloton_profile"),
+            **row,
+        )
+        for row in totals
+    )
+
+
+@transaction.atomic
+def refresh_team_standings(tournament: Tournament) -> None:
+    """Recomputes each team's totals, e.g. - after riders switch teams."""
+    totals = (
+        BestWorkout.objects.filter(
+            tournament=tournament,
+            peloton_profile__tournamentmember__tournament=tournament,
+            peloton_profile__tournamentmember__team__isnull=False,
+        )
+        .values("peloton_profile__tournamentmember__team")
+        .annotate(**_TOTALS)
+    )
+    TeamStanding.objects.filter(tournament=tournament).delete()
+    TeamStanding.objects.bulk_create(
+        TeamStanding(
+            tournament=tournament,
+            team_id=row.pop("peloton_profile__tournamentmember__team"),
+            **row,
+        )
+        for row in totals
+    )
@@ -0,0 +1,405 @@
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import structlog
+from django.conf import settings
+from django.utils import timezone
+
+from .external.peloton import NotAuthenticated, PelotonClient
+from .models import (
+    PelotonProfile,
+    Ride,
+    SyncCursor,
+    SyncJob,
+    Tournament,
+    TournamentMember,
+    TournamentRide,
+    Workout,
+)
+from .standings import refresh_standings
+
+logger = structlog.get_logger(__name__)
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class SyncProgress:
+    """Tallies the pages of a participant's workouts synced, for their `SyncCursor`.
+
+    Only the newest workout time and whether every workout for the
+    tournament's rides was `COMPLETED` are kept, not the pages themselves.
+    """
+
+    def __init__(self, ride_ids: Collection[str]):
+        self.ride_ids = ride_ids
+        self.latest_workout_at: Optional[datetime] = None
+        self.all_completed = True
+
+    def add(self, workouts: List[dict]) -> None:
+        for workout in workouts:
+            created_at = datetime.fromtimestamp(
+                float(workout["created_at"]), tz=timezone.utc
+            )
+            if not self.latest_workout_at or created_at > self.latest_workout_at:
+                self.latest_workout_at = created_at
+            if workout["ride"]["id"] in self.ride_ids:
+                self.all_completed &= workout["status"] == "COMPLETED"
+
+
+class SyncWindow(NamedTuple):
+    """The workouts one tournament needs from one of its riders."""
+
+    tournament: Tournament
+    start_date: datetime
+    end_date: datetime
+    ride_ids: Set[str]
+    cursor: Optional[SyncCursor]
+
+    def contains(self, workout: dict) -> bool:
+        created_at = float(workout["created_at"])
+        return self.start_date.timestamp() <= created_at <= self.end_date.timestamp()
+
+
+class RiderPlan(NamedTuple):
+    """What to fetch for a rider, across every tournament being synced."""
+
+    profile: PelotonProfile
+    windows: List[SyncWindow]
+    # Whose session to fetch with (that of one of the rider's tournaments)
+    client: PelotonClient
+
+    @property
+    def start_date(self) -> datetime:
+        return min(window.start_date for window in self.windows)
+
+    @property
+    def end_date(self) -> datetime:
+        return max(window.end_date for window in self.windows)
+
+
+def plan_sync(clients: Dict[Tournament, PelotonClient]) -> List[RiderPlan]:
+    """Works out the widest window of workouts needed from each rider.
+
+    `clients` maps each tournament being synced to the client to sync it
+    with.  Riders in several of the tournaments get a single plan covering
+    all of them.
+    """
+    tournaments = {tournament.pk: tournament for tournament in clients}
+    ride_ids: Dict[int, Set[str]] = {pk: set() for pk in tournaments}
+    for tournament_id, peloton_id in TournamentRide.objects.filter(
+        tournament__in=tournaments
+    ).values_list("tournament_id", "ride__peloton_id"):
+        ride_ids[tournament_id].add(peloton_id)
+    cursors = {
+        (cursor.tournament_id, cursor.peloton_profile_id): cursor
+        for cursor in SyncCursor.objects.filter(tournament__in=tournaments)
+    }
+
+    plans: Dict[int, RiderPlan] = {}
+    memberships = (
+        TournamentMember.objects.filter(tournament__in=tournaments)
+        .select_related("peloton_profile")
+        .order_by("pk")
+    )
+    for membership in memberships:
+        tournament = tournaments[membership.tournament_id]
+        profile = membership.peloton_profile
+        # Only page back as far as workouts already synced (if all were complete)
+        start_date = tournament.start_date
+        cursor = cursors.get((tournament.pk, profile.pk))
+        if cursor and cursor.resume_from:
+            start_date = max(start_date, cursor.resume_from)
+        window = SyncWindow(
+            tournament=tournament,
+            start_date=start_date,
+            # TODO[RWS]: HACK!  This is covering for two bugs:
+            #   1. The end date is set to noon, not midnight (+12)
+            #   2. The start/end dates are non-configurably anchored in UTC (+5)
+            end_date=tournament.end_date + timedelta(hours=17),
+            ride_ids=ride_ids[tournament.pk],
+            cursor=cursor,
+        )
+        if profile.pk not in plans:
+            plans[profile.pk] = RiderPlan(profile, [], clients[tournament])
+        plans[profile.pk].windows.append(window)
+    return list(plans.values())
+
+
+def sync_tournament(
+    tournament: Tournament,
+    client: PelotonClient,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """Pulls ride metadata and participant workouts for a tournament from Peloton.
+
+    `on_progress` (if provided) is called with `(current, total)` after each
+    ride and participant is synced.
+    """
+    sync_tournaments({tournament: client}, on_progress=on_progress)
+
+
+def sync_tournaments(
+    clients: Dict[Tournament, PelotonClient],
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """Syncs several tournaments (each with its own client) at once.
+
+    Each rider's workouts are fetched just once, across the widest window
+    any of their tournaments needs (see `plan_sync`), and then shared out
+    between those tournaments.  `on_progress` is called as in
+    `sync_tournament`, counting each ride and rider once.
+    """
+    tournaments = list(clients)
+    rides = list(Ride.objects.filter(tournament__in=tournaments).distinct())
+    plans = plan_sync(clients)
+    total = len(rides) + len(plans)
+    current = 0
+
+    # Sync the rides (updates ride metadata, regardless of activity or participants)
+    Ride.from_peloton_ids(
+        [ride.peloton_id for ride in rides],
+        clients[tournaments[0]],
+        max_workers=settings.SYNC_CONCURRENCY,
+        force=True,
+    )
+    current += len(rides)
+    if on_progress:
+        on_progress(current, total)
+
+    # Sync all relevant workouts from these tournaments.  Peloton calls for each
+    # rider fan out across a bounded thread pool, while all database writes
+    # happen here on the calling thread as each page of workouts arrives.
+    synced_riders: Dict[int, List[PelotonProfile]] = {t.pk: [] for t in tournaments}
+    progress: Dict[Tuple[int, int], SyncProgress] = {}
+    # Workouts waiting to be stored for each rider, keyed by peloton_id
+    batches: Dict[int, Dict[str, dict]] = {}
+
+    def store(plan: RiderPlan, batch: Dict[str, dict]) -> None:
+        if batch:
+            Workout.from_peloton_data_many(
+                batch.values(), plan.client, max_workers=settings.SYNC_CONCURRENCY
+            )
+
+    for plan, workouts in _fetch_riders(plans):
+        profile = plan.profile
+        if profile.pk not in batches:
+            profile.save()
+            batches[profile.pk] = {}
+            for window in plan.windows:
+                progress[window.tournament.pk, profile.pk] = SyncProgress(
+                    window.ride_ids
+                )
+        if workouts is not None:
+            # Share the page out between the rider's tournaments
+            batch = batches[profile.pk]
+            for window in plan.windows:
+                in_window = [data for data in workouts if window.contains(data)]
+                progress[window.tournament.pk, profile.pk].add(in_window)
+                # The listed workouts embed their ride, so this rarely hits the API
+                for data in in_window:
+                    if data["ride"]["id"] in window.ride_ids:
+                        batch[data["id"]] = data
+                        if profile not in synced_riders[window.tournament.pk]:
+                            synced_riders[window.tournament.pk].append(profile)
+            if len(batch) >= settings.SYNC_BATCH_SIZE:
+                store(plan, batch)
+                batch.clear()
+            continue
+
+        # Only move the cursors once every page before them has been stored
+        store(plan, batches.pop(profile.pk))
+        for window in plan.windows:
+            cursor = window.cursor or SyncCursor(
+                tournament=window.tournament, peloton_profile=profile
+            )
+            cursor.advance(progress.pop((window.tournament.pk, profile.pk)))
+            cursor.save()
+
+        current += 1
+        if on_progress:
+            on_progress(current, total)
+
+    for tournament in tournaments:
+        # Only riders with new or updated workouts can have new best workouts
+        if synced_riders[tournament.pk]:
+            refresh_standings(tournament, profiles=synced_riders[tournament.pk])
+        tournament.last_synced = timezone.now()
+        tournament.save(update_fields=["last_synced"])
+
+
+def _fetch_riders(
+    plans: List[RiderPlan],
+) -> Iterator[Tuple[RiderPlan, Optional[List[dict]]]]:
+    """Fetches profile metadata and workouts for each planned rider from Peloton.
+
+    Yields `(plan, workouts)` pairs a page at a time, covering every workout
+    in the plan's window (regardless of ride), then `(plan, None)` once that
+    rider is done.  Up to `settings.SYNC_CONCURRENCY` riders are fetched
+    concurrently, each worker thread using its own clones of the clients and
+    handing pages over through a small queue (so only a few pages are held
+    at once, however long a rider's history).  Each client also has a clone
+    that prefetches pages, reused for every rider fetched with it.
+    """
+
+    def fetch(plan: RiderPlan, clients: Tuple[PelotonClient, PelotonClient]):
+        client, prefetch_client = clients
+        # Sync user first (updates profile metadata, but doesn't save it)
+        plan.profile.update_from_api(client)
+        # Then page through the workouts, stopping once we reach those already synced
+        return client.iter_workouts(
+            user_id=plan.profile.peloton_id,
+            start_date=plan.start_date,
+            end_date=plan.end_date,
+            prefetch_client=prefetch_client,
+        )
+
+    concurrency = min(settings.SYNC_CONCURRENCY, len(plans))
+    if concurrency <= 1:
+        clients = {}
+        for plan in plans:
+            if id(plan.client) not in clients:
+                clients[id(plan.client)] = (plan.client, plan.client.clone())
+            for workouts in fetch(plan, clients[id(plan.client)]):
+                yield plan, workouts
+            yield plan, None
+        return
+
+    local = threading.local()
+    pages = queue.Queue(maxsize=concurrency)
+    stopped = threading.Event()
+
+    def fetch_in_thread(plan: RiderPlan):
+        if not hasattr(local, "clients"):
+            local.clients = {}
+        if id(plan.client) not in local.clients:
+            local.clients[id(plan.client)] = (
+                plan.client.clone(),
+                plan.client.clone(),
+            )
+        try:
+            for workouts in fetch(plan, local.clients[id(plan.client)]):
+                if stopped.is_set():
+                    return
+                pages.put((plan, workouts))
+            pages.put((plan, None))
+        except Exception as e:
+            pages.put((plan, e))
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="sync"
+    ) as executor:
+        # (Each fetch runs in a copy of this context, e.g. - to label its metrics)
+        futures = [
+            executor.submit(contextvars.copy_context().run, fetch_in_thread, plan)
+            for plan in plans
+        ]
+        try:
+            remaining = len(plans)
+            while remaining:
+                plan, workouts = pages.get()
+                if isinstance(workouts, Exception):
+                    raise workouts
+                if workouts is None:
+                    remaining -= 1
+                yield plan, workouts
+        finally:
+            # Don't start fetching anyone else if we bailed out early, and
+            # unblock anyone still handing over a page
+            stopped.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+
+def run_sync_job(job: SyncJob) -> None:
+    """Runs a claimed `SyncJob`, recording its outcome and scheduling any retry."""
+    run_sync_jobs([job])
+
+
+def run_sync_jobs(jobs: List[SyncJob]) -> None:
+    """Runs claimed `SyncJob`s together, recording outcomes and scheduling retries.
+
+    Riders in more than one of the jobs' tournaments are only fetched once
+    (see `sync_tournaments`), so the jobs succeed or fail together.
+    """
+    structlog.contextvars.bind_contextvars(
+        jobs=[job.uid for job in jobs],
+        tournaments=[job.tournament.uid for job in jobs],
+    )
+    logger.info("Running sync jobs")
+    # Each tournament's riders are fetched as whoever asked to sync it
+    requesters: List[Optional[PelotonProfile]] = []
+    sessions: Dict[Optional[int], PelotonClient] = {}
+    clients = {}
+    try:
+        for job in jobs:
+            if job.requested_by_id not in sessions:
+                requesters.append(job.requested_by)
+                sessions[job.requested_by_id] = _client_for(job.requested_by)
+            clients[job.tournament] = sessions[job.requested_by_id]
+
+        def on_progress(current: int, total: int) -> None:
+            for job in jobs:
+                job.update_progress(current, total)
+
+        sync_tournaments(clients, on_progress=on_progress)
+    except Exception as e:
+        for job in jobs:
+            job.error = repr(e)
+            if job.attempts < job.max_attempts:
+                # Exponential backoff between attempts
+                delay = settings.SYNC_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                job.status = SyncJob.Status.QUEUED
+                job.run_after = timezone.now() + timedelta(seconds=delay)
+                logger.warning(
+                    "Sync job failed, retrying",
+                    job=job.uid,
+                    attempt=job.attempts,
+                    error=job.error,
+                    delay=delay,
+                )
+            else:
+                job.status = SyncJob.Status.FAILED
+                job.finished_at = timezone.now()
+                logger.exception("Sync job failed", job=job.uid, attempt=job.attempts)
+    else:
+        for job in jobs:
+            job.status = SyncJob.Status.SUCCEEDED
+            job.finished_at = timezone.now()
+        logger.info("Sync jobs succeeded")
+    finally:
+        structlog.contextvars.unbind_contextvars("jobs", "tournaments")
+    for profile in requesters:
+        # (Rejected sessions are only noted by the fetching threads)
+        if profile:
+            profile.save_session_check()
+    for job in jobs:
+        job.save()
+
+
+def _client_for(profile: Optional[PelotonProfile]) -> PelotonClient:
+    """Creates a client logged into the Peloton API as `profile` (if possible)."""
+    try:
+        if profile:
+            return profile.get_client()
+    except NotAuthenticated:
+        pass
+    return PelotonClient()
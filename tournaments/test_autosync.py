@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tournaments.autosync import AutoSyncScheduler, SyncBudget
+from tournaments.models import (
+    PelotonProfile,
+    SyncCursor,
+    SyncJob,
+    Tournament,
+    TournamentMember,
+)
+
+
+class AutoSyncSchedulerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.clock = 0.0
+        self.scheduler = AutoSyncScheduler(
+            SyncBudget(100, clock=lambda: self.clock),
+            min_interval=timedelta(minutes=2),
+            max_interval=timedelta(minutes=10),
+            recent=timedelta(minutes=30),
+        )
+
+    def create_tournament(self, riders=1, **kwargs) -> Tournament:
+        kwargs.setdefault("start_date", self.now - timedelta(days=1))
+        kwargs.setdefault("end_date", self.now + timedelta(days=1))
+        tournament = Tournament.objects.create(name="Tournament", **kwargs)
+        for i in range(riders):
+            profile = PelotonProfile.objects.create(
+                username=f"{tournament.uid}-{i}", peloton_id=f"{tournament.uid}-{i}"
+            )
+            TournamentMember.objects.create(
+                tournament=tournament, peloton_profile=profile
+            )
+        return tournament
+
+    def finish_sync(self, tournament: Tournament, at, latest_workout_at, done=True):
+        tournament.sync_jobs.update(status=SyncJob.Status.SUCCEEDED)
+        Tournament.objects.filter(pk=tournament.pk).update(last_synced=at)
+        for profile in tournament.participants.all():
+            SyncCursor.objects.update_or_create(
+                tournament=tournament,
+                peloton_profile=profile,
+                defaults={
+                    "latest_workout_at": latest_workout_at,
+                    "is_finalized": done,
+                },
+            )
+
+    def queued(self, now) -> list:
+        return [job.tournament for job in self.scheduler.tick(now)]
+
+    def test_only_active_tournaments(self):
+        active = self.create_tournament()
+        self.create_tournament(start_date=self.now + timedelta(days=1))
+        self.create_tournament(end_date=self.now - timedelta(days=2))
+        self.assertEqual(self.queued(self.now), [active])
+        # (Not queued again while a sync is pending)
+        self.assertEqual(self.queued(self.now + timedelta(hours=1)), [])
+
+    def test_quiet_tournaments_back_off(self):
+        tournament = self.create_tournament()
+        self.queued(self.now)
+        quiet_since = self.now - timedelta(days=1)
+
+        synced_at = self.now
+        for interval in [2, 4, 8, 10, 10]:
+            self.finish_sync(tournament, synced_at, latest_workout_at=quiet_since)
+            due_at = synced_at + timedelta(minutes=interval)
+            self.assertEqual(self.queued(due_at - timedelta(seconds=1)), [])
+            self.assertEqual(self.queued(due_at), [tournament])
+            synced_at = due_at
+
+    def test_active_tournaments_stay_frequent(self):
+        tournament = self.create_tournament()
+        self.queued(self.now)
+
+        # Riders mid-workout
+        synced_at = self.now
+        for _ in range(3):
+            self.finish_sync(
+                tournament, synced_at, latest_workout_at=synced_at, done=False
+            )
+            synced_at += timedelta(minutes=2)
+            self.assertEqual(self.queued(synced_at), [tournament])
+
+        # New workouts since the last sync (even if not recent)
+        self.finish_sync(
+            tournament, synced_at, latest_workout_at=synced_at - timedelta(hours=1)
+        )
+        synced_at += timedelta(minutes=2)
+        self.assertEqual(self.queued(synced_at), [tournament])
+
+    def test_budget(self):
+        big = self.create_tournament(riders=60)
+        small = self.create_tournament(riders=1)
+        # The first sync goes over budget, so the next waits for it to be paid off
+        self.assertEqual(self.queued(self.now), [big])
+        self.assertEqual(self.queued(self.now), [])
+        self.clock += 60
+        self.assertEqual(self.queued(self.now), [small])
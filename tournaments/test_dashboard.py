@@ -0,0 +1,121 @@
+import logging
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tournaments.benchmarks import build_sample
+from tournaments.dashboard import load_dashboard
+from tournaments.external.peloton import NotAuthenticated, PelotonClient
+from tournaments.models import RiderStanding, Tournament, TournamentMember
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tournament, cls.user = build_sample()
+        cls.profile = cls.user.profile
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def join(self, **dates) -> Tournament:
+        tournament = Tournament.objects.create(name="Joined", **dates)
+        TournamentMember.objects.create(
+            tournament=tournament, peloton_profile=self.profile
+        )
+        return tournament
+
+    def test_buckets(self):
+        now = timezone.now()
+        upcoming = self.join(
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=8)
+        )
+        recent = self.join(
+            start_date=now - timedelta(days=8), end_date=now - timedelta(days=1)
+        )
+        self.join(
+            start_date=now - timedelta(days=60), end_date=now - timedelta(days=30)
+        )
+
+        dashboard = load_dashboard(self.profile, datetime.utcnow())
+        self.assertEqual(
+            {
+                key: [t["uid"] for t in tournaments]
+                for key, tournaments in dashboard.items()
+            },
+            {
+                "active": [self.tournament.uid],
+                "upcoming": [upcoming.uid],
+                "recent": [recent.uid],
+            },
+        )
+
+    def test_summary(self):
+        [summary] = load_dashboard(self.profile, datetime.utcnow())["active"]
+        standings = RiderStanding.objects.filter(tournament=self.tournament)
+        mine = standings.get(peloton_profile=self.profile)
+        self.assertEqual(summary["team_count"], self.tournament.teams.count())
+        self.assertEqual(
+            summary["participant_count"], self.tournament.participants.count()
+        )
+        self.assertEqual(
+            summary["rank"],
+            standings.filter(total_work__gt=mine.total_work).count() + 1,
+        )
+
+    # (As in `benchmarks.measure_pages`, to skip `collectstatic`)
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_cached_until_changed(self):
+        url = reverse("tournaments:index")
+        self.client.get(url)
+        with self.assertNumQueries(4):  # Session, user, profile and what's listed
+            response = self.client.get(url)
+        self.assertContains(response, self.tournament.name)
+
+        # Synced
+        self.tournament.last_synced = timezone.now()
+        self.tournament.save(update_fields=["last_synced"])
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+        # Joined
+        now = timezone.now()
+        joined = self.join(start_date=now, end_date=now + timedelta(days=7))
+        self.assertContains(self.client.get(url), joined.name)
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_session_rechecked_once_expired(self):
+        url = reverse("tournaments:index")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Peloton has since revoked the session, which the page must show
+        self.profile.session_verified_at -= timedelta(
+            seconds=settings.PELOTON_SESSION_TTL
+        )
+        self.profile.save(update_fields=["session_verified_at"])
+        revoked = NotAuthenticated(username=self.profile.username)
+        with mock.patch.object(PelotonClient, "load_session", side_effect=revoked):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Link your Peloton profile to manage tournaments")
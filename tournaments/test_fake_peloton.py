@@ -0,0 +1,95 @@
+import requests
+from django.test import SimpleTestCase
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.test_sync import END, START
+
+BASE_URL = "https://api.onepeloton.com"
+
+
+class FakePelotonAdapterTests(SimpleTestCase):
+    def session(self, **kwargs) -> requests.Session:
+        self.data = FakePeloton(["first-ride", "second-ride"], START, END, 50)
+        self.adapter = FakePelotonAdapter(self.data, **kwargs)
+        session = requests.Session()
+        session.mount(BASE_URL, self.adapter)
+        return session
+
+    def test_routes(self):
+        session = self.session()
+        self.assertEqual(
+            session.get(f"{BASE_URL}/api/user/rider").json(), self.data.user("rider")
+        )
+        self.assertEqual(
+            session.get(f"{BASE_URL}/api/ride/first-ride").json()["title"],
+            "Ride first-ride",
+        )
+        self.assertEqual(
+            session.get(f"{BASE_URL}/api/instructor/i1").json()["name"],
+            "Instructor i1",
+        )
+        self.assertEqual(
+            session.get(f"{BASE_URL}/api/workout/rider-3").json(),
+            self.data._workout("rider", 3),
+        )
+        self.assertTrue(
+            session.get(f"{BASE_URL}/auth/check_session").json()["is_valid"]
+        )
+        # (Past the rider's last workout, or off the API entirely)
+        self.assertEqual(
+            session.get(f"{BASE_URL}/api/workout/rider-50").status_code, 404
+        )
+        self.assertEqual(session.get(f"{BASE_URL}/api/nothing").status_code, 404)
+        self.assertEqual(
+            dict(self.adapter.calls),
+            {
+                "user": 1,
+                "ride": 1,
+                "instructor": 1,
+                "workout": 2,
+                "check_session": 1,
+                "unknown": 1,
+            },
+        )
+
+    def test_workouts_paging(self):
+        session = self.session()
+        url = f"{BASE_URL}/api/user/rider/workouts"
+        pages = [
+            session.get(url, params={"page": page, "limit": 20}).json()
+            for page in range(3)
+        ]
+        self.assertEqual(
+            [(page["page"], page["limit"], page["total"]) for page in pages],
+            [(0, 20, 50), (1, 20, 50), (2, 20, 50)],
+        )
+        workouts = [workout for page in pages for workout in page["data"]]
+        # (Newest first, with their rides joined)
+        self.assertEqual(
+            [workout["id"] for workout in workouts],
+            [f"rider-{i}" for i in range(49, -1, -1)],
+        )
+        self.assertEqual(
+            [workout["created_at"] for workout in workouts],
+            sorted((workout["created_at"] for workout in workouts), reverse=True),
+        )
+        self.assertEqual(workouts[0]["ride"], self.data.ride("second-ride"))
+        self.assertEqual(session.get(url, params={"page": 3}).json()["data"], [])
+
+    def test_throttling(self):
+        session = self.session(throttle_rate=0.25, retry_after=2, seed=1)
+        responses = [session.get(f"{BASE_URL}/api/user/rider") for _ in range(400)]
+        throttled = [response for response in responses if response.status_code == 429]
+        self.assertEqual(len(throttled), self.adapter.calls["throttled"])
+        self.assertAlmostEqual(len(throttled) / len(responses), 0.25, delta=0.05)
+        self.assertEqual(
+            {response.headers["Retry-After"] for response in throttled}, {"2"}
+        )
+        self.assertEqual(self.adapter.calls["user"], 400)
+
+        # Throttled the same way for the same seed
+        session = self.session(throttle_rate=0.25, retry_after=2, seed=1)
+        self.assertEqual(
+            [session.get(f"{BASE_URL}/api/user/rider").status_code for _ in range(400)],
+            [response.status_code for response in responses],
+        )
@@ -0,0 +1,101 @@
+import json
+
+from django.core import serializers
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from tournaments.fields import CompressedJSONField
+from tournaments.models import Instructor, Ride
+
+PAYLOAD = {
+    "id": "ride",
+    "title": "A ride",
+    "duration": 1800,
+    "description": "Long text that is rarely read back " * 20,
+    "instructor_id": None,
+}
+# (The keys of it that `Ride` keeps inline)
+INLINE = {"title": "A ride", "duration": 1800, "instructor_id": None}
+
+
+class CompressedJSONFieldTests(TestCase):
+    def create_ride(self) -> Ride:
+        ride = Ride(peloton_id="ride")
+        ride.set_payload(PAYLOAD)
+        ride.save()
+        return ride
+
+    def test_compressed(self):
+        stored = CompressedJSONField().get_prep_value(PAYLOAD)
+        self.assertLess(len(stored), len(json.dumps(PAYLOAD)) / 2)
+        self.assertIsNone(CompressedJSONField().get_prep_value(None))
+
+    def test_round_trip(self):
+        ride = self.create_ride()
+        ride = Ride.objects.get(pk=ride.pk)
+        self.assertEqual(ride.raw, INLINE)
+        self.assertEqual(ride.payload, PAYLOAD)
+
+        # Models keeping all of the payload inline don't use the field
+        instructor = Instructor(peloton_id="instructor")
+        instructor.set_payload({"id": "instructor"})
+        instructor.save()
+        instructor = Instructor.objects.get(pk=instructor.pk)
+        self.assertEqual(instructor.payload, {"id": "instructor"})
+        self.assertIsNone(instructor.raw_payload)
+
+    def test_deferred_until_used(self):
+        ride = self.create_ride()
+        with self.assertNumQueries(1):
+            ride = Ride.objects.get(pk=ride.pk)
+        self.assertEqual(ride.get_deferred_fields(), {"raw_payload"})
+        with self.assertNumQueries(1):
+            self.assertEqual(ride.payload, PAYLOAD)
+
+    def test_serialized_as_json(self):
+        ride = Ride.objects.get(pk=self.create_ride().pk)
+        data = serializers.serialize("json", [ride])
+        self.assertEqual(
+            json.loads(data)[0]["fields"]["raw_payload"], json.dumps(PAYLOAD)
+        )
+        [deserialized] = serializers.deserialize("json", data)
+        self.assertEqual(deserialized.object.raw_payload, PAYLOAD)
+
+
+class CompactPayloadsMigrationTests(TransactionTestCase):
+    before = [("tournaments", "0009_tournament_modified_at")]
+    after = [("tournaments", "0010_compact_payloads")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # (Back to the latest migration, for the tests that follow)
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_moves_payloads(self):
+        apps = self.migrate(self.before)
+        apps.get_model("tournaments", "Ride").objects.create(
+            peloton_id="ride", raw=PAYLOAD
+        )
+        apps.get_model("tournaments", "Instructor").objects.create(
+            peloton_id="instructor", raw={"id": "instructor"}
+        )
+
+        self.migrate(self.after)
+        ride = Ride.objects.get(peloton_id="ride")
+        self.assertEqual(ride.raw, INLINE)
+        self.assertEqual(ride.payload, PAYLOAD)
+        instructor = Instructor.objects.get(peloton_id="instructor")
+        self.assertEqual(instructor.raw, {"id": "instructor"})
+        self.assertIsNone(instructor.raw_payload)
+
+        # And back again
+        apps = self.migrate(self.before)
+        ride = apps.get_model("tournaments", "Ride").objects.get(peloton_id="ride")
+        self.assertEqual(ride.raw, PAYLOAD)
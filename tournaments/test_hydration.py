@@ -0,0 +1,186 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.models import Instructor, PelotonProfile, Ride, Workout
+from tournaments.test_sync import END, START, fake_client
+
+
+class HydrationTests(TestCase):
+    """Models are hydrated from payloads already listed, fetching only what's missing."""
+
+    def setUp(self):
+        self.data = FakePeloton(["first-ride", "second-ride"], START, END, 40)
+        self.adapter = FakePelotonAdapter(self.data)
+        self.peloton = fake_client(self.adapter)
+        for username in ("rider", "other"):
+            PelotonProfile.objects.create(username=username, peloton_id=username)
+
+    def payload(self, index: int, user_id: str = "rider", **changes) -> dict:
+        data = self.data._workout(user_id, index)
+        data.update(changes)
+        return data
+
+    def test_from_payload(self):
+        data = self.payload(0)
+        workout = Workout.from_peloton_data(data, self.peloton)
+        self.assertEqual(self.adapter.calls["workout"], 0)
+        workout = Workout.objects.get(pk=workout.pk)
+        self.assertEqual(workout.peloton_profile.username, "rider")
+        self.assertEqual(workout.total_work, data["total_work"])
+        self.assertEqual(workout.payload, data)
+        # (Along with the ride embedded in it)
+        self.assertEqual(workout.ride.title, "Ride first-ride")
+        self.assertEqual(self.adapter.calls["ride"], 0)
+
+    def test_duration_and_average_output(self):
+        data = self.payload(0)
+        workouts = [
+            Workout.from_peloton_data(data, self.peloton),
+            Workout.from_peloton_data(self.payload(1, total_work=None), self.peloton),
+            # (Not yet finished, or somehow over in no time)
+            Workout.from_peloton_data(
+                self.payload(2, status="IN_PROGRESS", end_time=None), self.peloton
+            ),
+            Workout.from_peloton_data(
+                self.payload(3, end_time=self.payload(3)["start_time"]), self.peloton
+            ),
+        ]
+        self.assertEqual(
+            [
+                (workout.duration_seconds, workout.average_output)
+                for workout in Workout.objects.filter(
+                    pk__in=[workout.pk for workout in workouts]
+                ).order_by("peloton_id")
+            ],
+            [(30 * 60, data["total_work"] / (30 * 60)), (30 * 60, 0), (0, 0), (0, 0)],
+        )
+
+        # Once finished
+        workout = Workout.from_peloton_data(self.payload(2), self.peloton)
+        workout = Workout.objects.get(pk=workout.pk)
+        self.assertEqual(workout.duration_seconds, 30 * 60)
+        self.assertAlmostEqual(
+            workout.average_output, self.payload(2)["total_work"] / (30 * 60)
+        )
+
+    def test_many_duration_and_average_output(self):
+        Workout.from_peloton_data_many(
+            [
+                self.payload(0),
+                self.payload(1, start_time=None),
+                self.payload(2, status="IN_PROGRESS", end_time=None),
+            ],
+            self.peloton,
+        )
+        self.assertEqual(
+            list(
+                Workout.objects.order_by("peloton_id").values_list(
+                    "duration_seconds", "average_output"
+                )
+            ),
+            [(30 * 60, self.payload(0)["total_work"] / (30 * 60)), (0, 0), (0, 0)],
+        )
+
+    def test_incomplete_payload_is_fetched(self):
+        data = self.payload(0)
+        del data["status"]
+        workout = Workout.from_peloton_data(data, self.peloton)
+        self.assertEqual(self.adapter.calls["workout"], 1)
+        self.assertEqual(workout.status, "COMPLETED")
+
+    def test_only_unfinished_workouts_are_updated(self):
+        Workout.from_peloton_data(self.payload(0, total_work=1), self.peloton)
+        Workout.from_peloton_data(
+            self.payload(1, status="IN_PROGRESS", total_work=1), self.peloton
+        )
+        Workout.from_peloton_data(self.payload(0, total_work=2), self.peloton)
+        Workout.from_peloton_data(self.payload(1, total_work=2), self.peloton)
+        self.assertEqual(
+            dict(Workout.objects.values_list("peloton_id", "total_work")),
+            {"rider-0": 1, "rider-1": 2},
+        )
+
+    def test_many_from_payloads(self):
+        Workout.from_peloton_data(self.payload(0, total_work=1), self.peloton)
+        Workout.from_peloton_data(
+            self.payload(1, status="IN_PROGRESS", total_work=1), self.peloton
+        )
+        incomplete = self.payload(2)
+        del incomplete["ride"]
+
+        workouts = Workout.from_peloton_data_many(
+            [
+                self.payload(0, total_work=2),
+                self.payload(1, total_work=2),
+                incomplete,
+                self.payload(3),
+            ],
+            self.peloton,
+        )
+        self.assertEqual(set(workouts), {"rider-0", "rider-1", "rider-2", "rider-3"})
+        self.assertTrue(all(workout.pk for workout in workouts.values()))
+        self.assertEqual(self.adapter.calls["workout"], 1)
+        stored = {workout.peloton_id: workout for workout in Workout.objects.all()}
+        self.assertEqual(stored["rider-0"].total_work, 1)
+        self.assertEqual(stored["rider-1"].total_work, 2)
+        self.assertEqual(stored["rider-1"].status, "COMPLETED")
+        self.assertEqual(stored["rider-2"].ride.peloton_id, "first-ride")
+        self.assertEqual(stored["rider-3"].total_work, self.payload(3)["total_work"])
+
+    def test_many_from_ids(self):
+        rides = Ride.from_peloton_ids(["first-ride", "second-ride"], self.peloton)
+        self.assertEqual(set(rides), {"first-ride", "second-ride"})
+        self.assertEqual(self.adapter.calls["ride"], 2)
+        self.assertEqual(
+            set(Instructor.objects.values_list("peloton_id", flat=True)),
+            {self.data.ride(ride_id)["instructor_id"] for ride_id in rides},
+        )
+
+        # Finished rides aren't fetched again...
+        Ride.objects.create(peloton_id="unfinished-ride")
+        rides = Ride.from_peloton_ids(
+            ["first-ride", "second-ride", "unfinished-ride"], self.peloton
+        )
+        self.assertEqual(self.adapter.calls["ride"], 3)
+        self.assertEqual(rides["unfinished-ride"].title, "Ride unfinished-ride")
+
+        # ...unless forced
+        Ride.objects.filter(peloton_id="first-ride").update(title="Renamed")
+        rides = Ride.from_peloton_ids(
+            ["first-ride", "second-ride"], self.peloton, max_workers=2, force=True
+        )
+        self.assertEqual(self.adapter.calls["ride"], 5)
+        self.assertEqual(
+            Ride.objects.get(peloton_id="first-ride").title, "Ride first-ride"
+        )
+
+    def test_queries_per_batch(self):
+        def queries(payloads) -> int:
+            with CaptureQueriesContext(connection) as captured:
+                Workout.from_peloton_data_many(payloads, self.peloton)
+            return len(captured)
+
+        # (Once the rides and instructors are stored)
+        queries([self.payload(0), self.payload(1)])
+        self.assertEqual(
+            queries([self.payload(i) for i in range(2, 5)]),
+            queries([self.payload(i) for i in range(5, 25)]),
+        )
+        # Likewise, when updating workouts (of more than one rider)
+        for i in range(25, 40):
+            for user_id in ("rider", "other"):
+                Workout.from_peloton_data(
+                    self.payload(i, user_id, status="IN_PROGRESS"), self.peloton
+                )
+        self.assertEqual(
+            queries([self.payload(i) for i in range(25, 30)]),
+            queries(
+                [
+                    self.payload(i, user_id)
+                    for i in range(30, 40)
+                    for user_id in ("rider", "other")
+                ]
+            ),
+        )
@@ -0,0 +1,268 @@
+import logging
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tournaments.models import PelotonProfile, SyncJob, Tournament, TournamentMember
+from tournaments.sync import run_sync_jobs
+
+STALE_AFTER = timedelta(minutes=10)
+
+
+def create_tournament(name: str = "Tournament") -> Tournament:
+    now = timezone.now()
+    return Tournament.objects.create(
+        name=name, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+    )
+
+
+class EnqueueTests(TestCase):
+    def setUp(self):
+        self.tournament = create_tournament()
+
+    def test_joins_pending_job(self):
+        job = SyncJob.enqueue(self.tournament)
+        self.assertEqual(SyncJob.enqueue(self.tournament), job)
+        SyncJob.objects.filter(pk=job.pk).update(status=SyncJob.Status.RUNNING)
+        self.assertEqual(SyncJob.enqueue(self.tournament), job)
+
+        # Once done, the next sync is a new job
+        SyncJob.objects.filter(pk=job.pk).update(status=SyncJob.Status.SUCCEEDED)
+        self.assertNotEqual(SyncJob.enqueue(self.tournament), job)
+        self.assertEqual(self.tournament.sync_jobs.count(), 2)
+
+        # (Other tournaments are queued separately)
+        other = create_tournament("Other")
+        self.assertEqual(SyncJob.enqueue(other).tournament, other)
+
+    def test_queued_concurrently(self):
+        job = SyncJob.enqueue(self.tournament)
+        # (As if queued by another request just after this one looked)
+        with mock.patch.object(QuerySet, "first", return_value=None):
+            self.assertEqual(SyncJob.enqueue(self.tournament), job)
+        self.assertEqual(self.tournament.sync_jobs.count(), 1)
+
+
+class ClaimTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def create_job(self, **kwargs) -> SyncJob:
+        tournament = create_tournament(f"Tournament {SyncJob.objects.count()}")
+        return SyncJob.objects.create(tournament=tournament, **kwargs)
+
+    def test_claims_runnable_jobs_in_order(self):
+        later = self.create_job(run_after=self.now - timedelta(minutes=1))
+        first = self.create_job(run_after=self.now - timedelta(minutes=2))
+        self.create_job(run_after=self.now + timedelta(minutes=1))
+        self.create_job(status=SyncJob.Status.SUCCEEDED)
+
+        self.assertEqual(SyncJob.claim_batch(STALE_AFTER, limit=10), [first, later])
+        first.refresh_from_db()
+        self.assertEqual(first.status, SyncJob.Status.RUNNING)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNotNone(first.heartbeat_at)
+        # (Running jobs aren't claimed again while they're heart-beating)
+        self.assertIsNone(SyncJob.claim_next(STALE_AFTER))
+
+    def test_reclaims_stale_jobs(self):
+        job = self.create_job()
+        self.assertEqual(SyncJob.claim(job.uid, STALE_AFTER), job)
+        job.refresh_from_db()
+        job.update_progress(1, 2)
+        self.assertIsNone(SyncJob.claim(job.uid, STALE_AFTER))
+
+        # The worker stopped heart-beating
+        SyncJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=self.now - STALE_AFTER - timedelta(seconds=1),
+            error="Interrupted",
+        )
+        reclaimed = SyncJob.claim_next(STALE_AFTER)
+        self.assertEqual(reclaimed, job)
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertIsNone(reclaimed.error)
+
+
+@skipUnless(connection.vendor == "postgresql", "Row locks are checked on Postgres")
+class SkipLockedTests(TransactionTestCase):
+    def test_skips_jobs_locked_by_another_worker(self):
+        locked, free = (
+            SyncJob.objects.create(tournament=create_tournament(f"Tournament {i}"))
+            for i in range(2)
+        )
+        has_lock = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    SyncJob.objects.select_for_update().get(pk=locked.pk)
+                    has_lock.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        worker = threading.Thread(target=hold_lock)
+        worker.start()
+        try:
+            self.assertTrue(has_lock.wait(10))
+            self.assertEqual(SyncJob.claim_batch(STALE_AFTER, limit=10), [free])
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(SyncJob.claim_next(STALE_AFTER), locked)
+
+
+@override_settings(SYNC_JOB_RETRY_DELAY=30)
+class RunSyncJobsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.tournament = create_tournament()
+        SyncJob.enqueue(self.tournament)
+
+    def run_claimed(self, error: Exception = None) -> SyncJob:
+        job = SyncJob.claim_next(STALE_AFTER)
+        with mock.patch(
+            "tournaments.sync.sync_tournaments", side_effect=error
+        ) as sync_tournaments:
+            self.started = timezone.now()
+            run_sync_jobs([job])
+        sync_tournaments.assert_called_once()
+        job.refresh_from_db()
+        return job
+
+    def test_succeeds(self):
+        job = self.run_claimed()
+        self.assertEqual(job.status, SyncJob.Status.SUCCEEDED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retries_with_backoff(self):
+        for attempt, delay in enumerate([30, 60], start=1):
+            job = self.run_claimed(ValueError("Peloton is down"))
+            self.assertEqual(job.status, SyncJob.Status.QUEUED)
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn("Peloton is down", job.error)
+            self.assertGreaterEqual(
+                job.run_after, self.started + timedelta(seconds=delay)
+            )
+            self.assertLess(job.run_after, self.started + timedelta(seconds=delay + 10))
+            # (Not claimed again until it's due)
+            self.assertIsNone(SyncJob.claim_next(STALE_AFTER))
+            SyncJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        # Until it's out of attempts
+        job = self.run_claimed(ValueError("Peloton is down"))
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertEqual(job.status, SyncJob.Status.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(SyncJob.claim_next(STALE_AFTER))
+
+    def test_retried_job_can_succeed(self):
+        self.run_claimed(ValueError("Peloton is down"))
+        SyncJob.objects.update(run_after=timezone.now())
+        job = self.run_claimed()
+        self.assertEqual(job.status, SyncJob.Status.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.error)
+
+
+class SyncViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.tournament = create_tournament()
+        self.admin = self.create_user("admin", TournamentMember.Role.OWNER)
+        self.member = self.create_user("member", TournamentMember.Role.MEMBER)
+        self.sync_url = reverse("tournaments:sync", args=[self.tournament.uid])
+
+    def create_user(self, username: str, role: str) -> User:
+        user = User.objects.create(username=username)
+        profile = PelotonProfile.objects.create(
+            username=username, peloton_id=username, user=user
+        )
+        TournamentMember.objects.create(
+            tournament=self.tournament, peloton_profile=profile, role=role
+        )
+        return user
+
+    def test_queues_one_job(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.sync_url)
+        self.assertEqual(response.status_code, 202)
+        status = response.json()
+        job = SyncJob.objects.get(uid=status["job_id"])
+        self.assertEqual(job.requested_by, self.admin.profile)
+        self.assertEqual(status["status"], SyncJob.Status.QUEUED)
+        self.assertFalse(status["done"])
+        self.assertEqual(status["progress"], {"current": 0, "total": 0})
+        self.assertEqual(
+            status["status_url"],
+            reverse("tournaments:sync_status", args=[self.tournament.uid, job.uid]),
+        )
+
+        # Syncing again joins the queued job
+        response = self.client.post(self.sync_url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["job_id"], job.uid)
+        self.assertEqual(SyncJob.objects.count(), 1)
+
+    def test_reports_status(self):
+        self.client.force_login(self.admin)
+        status_url = self.client.post(self.sync_url).json()["status_url"]
+        job = SyncJob.claim_next(STALE_AFTER)
+        job.update_progress(3, 8)
+
+        response = self.client.get(status_url)
+        self.assertEqual(response.status_code, 200)
+        status = response.json()
+        self.assertEqual(status["job_id"], job.uid)
+        self.assertEqual(status["status"], SyncJob.Status.RUNNING)
+        self.assertEqual(status["progress"], {"current": 3, "total": 8})
+
+        # (Jobs are only found under their own tournament)
+        other = create_tournament("Other")
+        TournamentMember.objects.create(
+            tournament=other,
+            peloton_profile=self.admin.profile,
+            role=TournamentMember.Role.OWNER,
+        )
+        response = self.client.get(
+            reverse("tournaments:sync_status", args=[other.uid, job.uid])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_admins_only(self):
+        self.client.force_login(self.admin)
+        status_url = self.client.post(self.sync_url).json()["status_url"]
+
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.post(self.sync_url).status_code, 403)
+        self.assertEqual(self.client.get(status_url).status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.client.post(self.sync_url).status_code, 302)
+        self.assertEqual(self.client.get(status_url).status_code, 302)
@@ -0,0 +1,140 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from tournaments.leaderboard import Cell, Leaderboard, stream_leaderboard
+from tournaments.models import (
+    Instructor,
+    PelotonProfile,
+    Ride,
+    TournamentMember,
+    TournamentTeam,
+)
+from tournaments.standings import refresh_standings
+from tournaments.test_standings import StandingsTestCase
+
+
+class LeaderboardTests(StandingsTestCase):
+    def setUp(self):
+        super().setUp()
+        # A rider yet to ride, and a team yet to have anyone
+        TournamentMember.objects.create(
+            tournament=self.tournament,
+            peloton_profile=PelotonProfile.objects.create(
+                username="a3", peloton_id="a3"
+            ),
+            team=self.teams["A"],
+        )
+        TournamentTeam.objects.create(tournament=self.tournament, name="C")
+        refresh_standings(self.tournament)
+
+    def test_for_tournament(self):
+        with self.assertNumQueries(4):
+            leaderboard = Leaderboard.for_tournament(self.tournament)
+            teams = {
+                board.team.name: (
+                    [member.username for member in board.members],
+                    [(row.ride.peloton_id, row.cells) for row in board.rows],
+                    board.member_totals,
+                    (board.total_work, board.workout_count),
+                )
+                for board in leaderboard.teams
+            }
+
+        self.assertEqual([ride.peloton_id for ride in leaderboard.rides], ["r1", "r2"])
+        self.assertEqual(list(teams), ["A", "B", "C"])
+        self.assertEqual(
+            teams["A"],
+            (
+                ["a1", "a2", "a3"],
+                [
+                    ("r1", [Cell(300, "a1-1"), Cell(50, "a2-0"), None]),
+                    ("r2", [Cell(200, "a1-2"), None, None]),
+                ],
+                [500, 50, 0],
+                (550, 3),
+            ),
+        )
+        self.assertEqual(
+            teams["B"],
+            (["b1"], [("r1", [None]), ("r2", [Cell(400, "b1-0")])], [400], (400, 1)),
+        )
+        self.assertEqual(teams["C"], ([], [("r1", []), ("r2", [])], [], (0, 0)))
+
+    def test_stream(self):
+        Ride.objects.filter(peloton_id="r1").update(
+            instructor=Instructor.objects.create(peloton_id="i1", name="Instructor")
+        )
+        leaderboard = json.loads("".join(stream_leaderboard(self.tournament)))
+        self.assertEqual(
+            leaderboard["tournament"],
+            {
+                "uid": self.tournament.uid,
+                "name": "Tournament",
+                "start_date": _json_date(self.tournament.start_date),
+                "end_date": _json_date(self.tournament.end_date),
+                "last_synced": None,
+            },
+        )
+        self.assertEqual(
+            leaderboard["rides"],
+            [
+                {"peloton_id": "r1", "title": "r1", "instructor": "Instructor"},
+                {"peloton_id": "r2", "title": "r2", "instructor": None},
+            ],
+        )
+
+        teams = {team["name"]: team for team in leaderboard["teams"]}
+        self.assertEqual(list(teams), ["A", "B", "C"])
+        self.assertEqual(
+            teams["A"]["totals"],
+            {
+                "total_work": 550,
+                "total_duration": 300,
+                "workout_count": 3,
+                "average_output": (3 + 2 + 0.5) / 3,
+            },
+        )
+        a1, a2, a3 = teams["A"]["riders"]
+        self.assertEqual(
+            a1,
+            {
+                "username": "a1",
+                "peloton_id": "a1",
+                "image_url": None,
+                "best_workouts": [
+                    {
+                        "ride": "r1",
+                        "workout": "a1-1",
+                        "total_work": 300,
+                        "duration": 100,
+                        "average_output": 3,
+                    },
+                    {
+                        "ride": "r2",
+                        "workout": "a1-2",
+                        "total_work": 200,
+                        "duration": 100,
+                        "average_output": 2,
+                    },
+                ],
+                "totals": {
+                    "total_work": 500,
+                    "total_duration": 200,
+                    "workout_count": 2,
+                    "average_output": 2.5,
+                },
+            },
+        )
+        self.assertEqual(
+            [workout["workout"] for workout in a2["best_workouts"]], ["a2-0"]
+        )
+        self.assertEqual(a3["best_workouts"], [])
+        self.assertEqual(a3["totals"]["workout_count"], 0)
+        self.assertEqual([rider["username"] for rider in teams["B"]["riders"]], ["b1"])
+        self.assertEqual(teams["C"]["riders"], [])
+        self.assertEqual(teams["C"]["totals"]["total_work"], 0)
+
+
+def _json_date(value) -> str:
+    return json.loads(DjangoJSONEncoder().encode(value))
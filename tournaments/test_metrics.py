@@ -0,0 +1,160 @@
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import structlog
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
+
+from tournaments.external.metrics import endpoint_template
+from tournaments.metrics import record_query
+
+# Loads the gunicorn config as the master does, then counts in a forked worker
+FORKED_WORKER = """
+import os
+import runpy
+import types
+
+config = runpy.run_path("gunicorn.conf.py")
+config["on_starting"](None)
+
+pid = os.fork()
+if pid == 0:
+    from prometheus_client import Counter
+
+    Counter("forked_total", "Counted by a forked worker").inc()
+    os._exit(0)
+os.waitpid(pid, 0)
+config["child_exit"](None, types.SimpleNamespace(pid=pid))
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.multiprocess import MultiProcessCollector
+
+registry = CollectorRegistry()
+MultiProcessCollector(registry)
+print(registry.get_sample_value("forked_total"))
+"""
+
+
+class GunicornMetricsTests(SimpleTestCase):
+    def test_forked_worker_metrics_are_collected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, TMPDIR=directory)
+            # (As when gunicorn is started without it, which settings defaults)
+            env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+            env.pop("prometheus_multiproc_dir", None)
+            output = subprocess.run(
+                [sys.executable, "-c", FORKED_WORKER],
+                cwd=settings.BASE_DIR,
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        self.assertEqual(output.strip(), "1.0")
+
+
+class EndpointTemplateTests(SimpleTestCase):
+    def test_templates_ids(self):
+        for url, endpoint in [
+            ("https://api.onepeloton.com/api/user/rider", "/api/user/{id}"),
+            (
+                "https://api.onepeloton.com/api/user/rider/workouts?page=2",
+                "/api/user/{id}/workouts",
+            ),
+            ("https://api.onepeloton.com/api/workout/abc123", "/api/workout/{id}"),
+            (
+                "https://api.onepeloton.com/api/ride/abc123/details",
+                "/api/ride/{id}/details",
+            ),
+            ("https://api.onepeloton.com/api/instructor/i1", "/api/instructor/{id}"),
+            # (Which aren't ids)
+            (
+                "https://api.onepeloton.com/api/user/search?user_query=x",
+                "/api/user/search",
+            ),
+            ("https://api.onepeloton.com/api/ride/filters", "/api/ride/filters"),
+            ("https://api.onepeloton.com/auth/check_session", "/auth/check_session"),
+            ("/api/me", "/api/me"),
+            ("api/me", "/api/me"),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(endpoint_template(url), endpoint)
+
+
+class RecordQueryTests(SimpleTestCase):
+    def tearDown(self):
+        structlog.contextvars.unbind_contextvars("view")
+
+    def sample(self, name: str, view: str) -> float:
+        return REGISTRY.get_sample_value(name, {"view": view}) or 0
+
+    def test_counts_and_times_queries(self):
+        structlog.contextvars.bind_contextvars(view="test-record-query")
+        queries = self.sample("db_queries_total", "test-record-query")
+        timed = self.sample("db_query_duration_seconds_count", "test-record-query")
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append((sql, params, many, context))
+            return "result"
+
+        self.assertEqual(record_query(execute, "SELECT 1", (), False, {}), "result")
+        self.assertEqual(calls, [("SELECT 1", (), False, {})])
+        self.assertEqual(
+            self.sample("db_queries_total", "test-record-query"), queries + 1
+        )
+        self.assertEqual(
+            self.sample("db_query_duration_seconds_count", "test-record-query"),
+            timed + 1,
+        )
+
+    def test_counts_failed_queries(self):
+        queries = self.sample("db_queries_total", "none")
+
+        def execute(sql, params, many, context):
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            record_query(execute, "SELECT 1", (), False, {})
+        # (Outside a view)
+        self.assertEqual(self.sample("db_queries_total", "none"), queries + 1)
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def get(self, authorization: str = None):
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        return self.client.get(reverse("metrics"), **headers)
+
+    def test_rejected(self):
+        # (As "Token  " is as long as "Bearer ")
+        for authorization in (None, "Bearer wrong", "secret", "Token  secret"):
+            with self.subTest(authorization=authorization):
+                self.assertEqual(self.get(authorization).status_code, 404)
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.get("Bearer ").status_code, 404)
+
+    def test_accepted(self):
+        response = self.get("Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], CONTENT_TYPE_LATEST)
+        self.assertContains(response, "db_queries_total")
+
+    @override_settings(DEBUG=True, METRICS_TOKEN=None)
+    def test_debug(self):
+        self.assertEqual(self.get().status_code, 200)
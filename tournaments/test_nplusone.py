@@ -0,0 +1,79 @@
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from tournaments.models import Tournament
+from tournaments.nplusone import NPlusOneError, NPlusOneMiddleware, fingerprint
+
+
+@override_settings(NPLUSONE_SAMPLE_RATE=1, NPLUSONE_THRESHOLD=3, NPLUSONE_RAISE=True)
+class NPlusOneMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Tournament.objects.create(
+                name=f"Tournament {i}",
+                start_date=timezone.now(),
+                end_date=timezone.now(),
+            )
+
+    def get(self, view):
+        return NPlusOneMiddleware(view)(RequestFactory().get("/"))
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) LIMIT 1"),
+        )
+        self.assertNotEqual(
+            fingerprint("SELECT * FROM t WHERE id = %s"),
+            fingerprint("SELECT * FROM u WHERE id = %s"),
+        )
+
+    def test_repeated_queries_in_view(self):
+        def view(request):
+            for tournament in Tournament.objects.all():
+                tournament.teams.count()
+            return HttpResponse()
+
+        with self.assertRaises(NPlusOneError) as raised:
+            self.get(view)
+        [pattern] = raised.exception.patterns
+        self.assertEqual(pattern.count, 5)
+        self.assertIn("test_nplusone.py", pattern.origin)
+        self.assertIn("in view", pattern.origin)
+
+    def test_repeated_queries_in_template(self):
+        template = Template(
+            "{% for tournament in tournaments %}\n"
+            "{{ tournament.teams.count }}\n"
+            "{% endfor %}"
+        )
+
+        def view(request):
+            context = Context({"tournaments": Tournament.objects.all()})
+            return HttpResponse(template.render(context))
+
+        with self.assertRaises(NPlusOneError) as raised:
+            self.get(view)
+        [pattern] = raised.exception.patterns
+        self.assertEqual(pattern.origin, "<template>:2")
+
+    def test_prefetched(self):
+        def view(request):
+            for tournament in Tournament.objects.prefetch_related("teams"):
+                len(tournament.teams.all())
+            return HttpResponse()
+
+        self.assertEqual(self.get(view).status_code, 200)
+
+    @override_settings(NPLUSONE_RAISE=False)
+    def test_logs_without_raising(self):
+        def view(request):
+            for tournament in Tournament.objects.all():
+                tournament.teams.count()
+            return HttpResponse()
+
+        with self.assertLogs("tournaments.nplusone", level="WARNING"):
+            self.assertEqual(self.get(view).status_code, 200)
@@ -0,0 +1,34 @@
+import logging
+
+from django.test import TestCase, override_settings
+
+from tournaments.benchmarks import QUERY_BUDGETS, build_sample, measure_pages
+
+
+@override_settings(NPLUSONE_SAMPLE_RATE=1, NPLUSONE_RAISE=True)
+class PageQueryBudgetTests(TestCase):
+    """Every page stays within its query budget (with no N+1s), at any scale."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def assertWithinBudgets(self, scale: int):
+        tournament, user = build_sample(scale)
+        measurements = measure_pages(tournament, user, scale, repeats=1)
+        self.assertEqual({m.page for m in measurements}, set(QUERY_BUDGETS))
+        for measurement in measurements:
+            with self.subTest(page=measurement.page):
+                self.assertLessEqual(measurement.queries, measurement.budget)
+
+    def test_sample_tournament(self):
+        self.assertWithinBudgets(scale=1)
+
+    def test_scaled_tournament(self):
+        self.assertWithinBudgets(scale=4)
@@ -0,0 +1,189 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import chain, product
+from typing import Iterator
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from tournaments.autosync import active_tournaments
+from tournaments.benchmarks import build_sample
+from tournaments.dashboard import dashboard_tournaments
+from tournaments.models import (
+    BestWorkout,
+    PelotonProfile,
+    Ride,
+    Tournament,
+    TournamentMember,
+    TournamentTeam,
+    Workout,
+)
+from tournaments.standings import ranked_workouts
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked on Postgres")
+class QueryPlanTests(TransactionTestCase):
+    """The hot queries are answered through the indexes meant for them.
+
+    The sample is padded out with what there's more of in production (so the
+    indexes are worth using), then vacuumed as it would be by autovacuum (so
+    index-only scans are planned).  The tables are still small enough that
+    Postgres would happily scan them anyway, so sequential scans are disabled.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.tournament, self.user = build_sample(scale=4)
+        riders = list(self.tournament.participants.all())
+        rides = list(self.tournament.rides.all())
+
+        # Past tournaments...
+        start_date = self.tournament.start_date - timedelta(days=365)
+        past = Tournament.objects.bulk_create(
+            Tournament(
+                name=f"Past {i}",
+                start_date=start_date + timedelta(days=i),
+                end_date=start_date + timedelta(days=i + 7),
+            )
+            for i in range(200)
+        )
+        teams = TournamentTeam.objects.bulk_create(
+            TournamentTeam(tournament=tournament, name=f"Team {i}")
+            for tournament in past
+            for i in range(2)
+        )
+        TournamentMember.objects.bulk_create(
+            TournamentMember(
+                tournament=team.tournament, peloton_profile=rider, team=team
+            )
+            for i, team in enumerate(teams)
+            for rider in riders[i % 2 :: 2]
+        )
+        # ...teams who've joined without riding yet (so admins are few)...
+        joined_teams = TournamentTeam.objects.bulk_create(
+            TournamentTeam(tournament=self.tournament, name=f"Joined {i}")
+            for i in range(20)
+        )
+        joined = PelotonProfile.objects.bulk_create(
+            PelotonProfile(username=f"joined-{i}", peloton_id=f"joined-{i}")
+            for i in range(500)
+        )
+        TournamentMember.objects.bulk_create(
+            TournamentMember(
+                tournament=self.tournament,
+                peloton_profile=rider,
+                team=joined_teams[i % len(joined_teams)],
+            )
+            for i, rider in enumerate(joined)
+        )
+        # ...and everyone's workouts of other rides
+        other_rides = Ride.objects.bulk_create(
+            Ride(peloton_id=f"other-ride-{i}") for i in range(50)
+        )
+        Workout.objects.bulk_create(
+            Workout(
+                peloton_id=f"other-{rider.pk}-{ride.pk}",
+                peloton_profile=rider,
+                ride=ride,
+                status="COMPLETED",
+                total_work=100_000,
+            )
+            for rider, ride in chain(
+                product(joined[:100], rides), product(riders, other_rides)
+            )
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE")
+            cursor.execute("SET enable_seqscan = off")
+        self.addCleanup(self.reset_seqscan)
+
+    def reset_seqscan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def assertUsesIndexes(
+        self, queryset: QuerySet, *indexes: str, streamed: bool = False
+    ):
+        """Checks that no table is scanned, and the named indexes are used.
+
+        Queries `streamed` (with `.iterator()`) are planned as Django runs
+        them, through a cursor (which favours plans that start quickly).
+        """
+        sql, params = queryset.query.sql_with_params()
+        if streamed:
+            sql = f"DECLARE plan_check CURSOR WITH HOLD FOR {sql}"
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            [result] = cursor.fetchone()
+        # (Only decoded by some drivers)
+        [plan] = json.loads(result) if isinstance(result, str) else result
+        nodes = list(_plan_nodes(plan["Plan"]))
+        scanned = [
+            node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"
+        ]
+        self.assertEqual(scanned, [], json.dumps(plan, indent=2))
+        used = {node["Index Name"] for node in nodes if "Index Name" in node}
+        self.assertLessEqual(set(indexes), used, json.dumps(plan, indent=2))
+
+    def test_ranked_workouts(self):
+        self.assertUsesIndexes(ranked_workouts(self.tournament))
+        # (As when refreshing the standings of the riders just synced)
+        profiles = list(self.tournament.participants.all()[:3])
+        self.assertUsesIndexes(
+            ranked_workouts(self.tournament, profiles).values(
+                "pk",
+                "peloton_profile_id",
+                "ride_id",
+                "total_work",
+                "duration_seconds",
+                "average_output",
+            ),
+            "workout_rider_ride_work_idx",
+        )
+
+    def test_best_workouts(self):
+        self.assertUsesIndexes(BestWorkout.objects.filter(tournament=self.tournament))
+
+    def test_members(self):
+        self.assertUsesIndexes(self.tournament.admins, "member_role_idx")
+        # (As streamed to the leaderboard)
+        self.assertUsesIndexes(
+            TournamentMember.objects.filter(
+                tournament=self.tournament, team__isnull=False
+            )
+            .select_related("peloton_profile")
+            .order_by("team_id", "pk"),
+            "member_team_idx",
+            streamed=True,
+        )
+
+    def test_dashboard(self):
+        self.assertUsesIndexes(
+            dashboard_tournaments(self.user.profile, datetime.utcnow()),
+            "member_rider_tournament_idx",
+        )
+
+    def test_active_tournaments(self):
+        self.assertUsesIndexes(
+            active_tournaments(timezone.now()), "tournament_end_date_idx"
+        )
+
+
+def _plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
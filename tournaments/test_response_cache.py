@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from tournaments.external.peloton import CachedResponse, DiskResponseCache
+
+
+class DiskResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def store(self, cache: DiskResponseCache, key: str) -> None:
+        cache.set(key, CachedResponse(b"x" * 1000, None, None, time.time()))
+
+    def directory_size(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory))
+
+    def test_round_trip(self):
+        cache = DiskResponseCache(self.directory)
+        response = CachedResponse(b'{"id": "ride"}', '"v1"', None, time.time())
+        cache.set("key", response)
+        self.assertEqual(cache.get("key"), response)
+        self.assertIsNone(cache.get("missing"))
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskResponseCache(self.directory, max_bytes=5000)
+        for i in range(10):
+            self.store(cache, f"key-{i}")
+            # Keeps the first response in use
+            self.assertIsNotNone(cache.get("key-0"))
+        self.assertLessEqual(self.directory_size(), 5000)
+        self.assertIsNotNone(cache.get("key-0"))
+        self.assertIsNotNone(cache.get("key-9"))
+        self.assertIsNone(cache.get("key-1"))
+        self.assertGreater(cache.stats["evicted"], 0)
+
+    def test_only_scans_when_needed(self):
+        cache = DiskResponseCache(self.directory, max_bytes=1_000_000)
+        with mock.patch.object(cache, "_scan", wraps=cache._scan) as scan:
+            for i in range(50):
+                self.store(cache, f"key-{i % 40}")
+            # Once to learn the directory's size, which is then kept track of
+            self.assertEqual(scan.call_count, 1)
+            self.assertEqual(cache._size, self.directory_size())
+
+            # And again every so often, to count what other processes wrote
+            for i in range(50, DiskResponseCache.RESCAN_EVERY):
+                self.store(cache, f"key-{i}")
+            self.assertEqual(scan.call_count, 2)
@@ -0,0 +1,108 @@
+import logging
+import threading
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from requests.adapters import BaseAdapter
+
+from tournaments.external.fake_peloton import FakePelotonAdapter
+from tournaments.external.peloton import NotAuthenticated, PelotonClient
+from tournaments.models import PelotonProfile
+
+
+class RejectingAdapter(BaseAdapter):
+    """Answers every call with a 401, as Peloton does once a session expires."""
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        return FakePelotonAdapter._response(request, 401, {"status": 401})
+
+    def close(self) -> None:
+        pass
+
+
+@override_settings(PELOTON_SESSION_TTL=60)
+class SessionCheckTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.profile = PelotonProfile.objects.create(
+            username="rider",
+            peloton_id="rider",
+            peloton_session_id="session",
+            session_valid=True,
+            session_verified_at=self.now,
+        )
+
+    def stored(self) -> PelotonProfile:
+        return PelotonProfile.objects.get(pk=self.profile.pk)
+
+    def test_reused_until_expired(self):
+        with mock.patch.object(PelotonClient, "load_session") as load_session:
+            self.assertTrue(self.profile.has_valid_session())
+            load_session.assert_not_called()
+
+            # (Even when Peloton last said no)
+            self.profile.session_valid = False
+            self.assertFalse(self.profile.has_valid_session())
+            load_session.assert_not_called()
+
+            self.profile.session_verified_at = self.now - timedelta(seconds=61)
+            self.assertTrue(self.profile.has_valid_session())
+            load_session.assert_called_once_with("session")
+        stored = self.stored()
+        self.assertTrue(stored.session_valid)
+        self.assertGreater(stored.session_verified_at, self.now)
+
+    def test_expired_session_rejected(self):
+        self.profile.session_verified_at = self.now - timedelta(seconds=61)
+        with mock.patch.object(
+            PelotonClient,
+            "load_session",
+            side_effect=NotAuthenticated(username="rider"),
+        ):
+            self.assertFalse(self.profile.has_valid_session())
+        self.assertFalse(self.stored().session_valid)
+        with self.assertRaises(NotAuthenticated):
+            self.profile.get_client()
+
+    def test_no_session(self):
+        self.profile.peloton_session_id = None
+        with mock.patch.object(PelotonClient, "load_session") as load_session:
+            self.assertFalse(self.profile.has_valid_session())
+        load_session.assert_not_called()
+
+    def rejected_client(self) -> PelotonClient:
+        client = self.profile.get_client()
+        client.rate_limiter = None
+        client.response_cache = None
+        client.transport = RejectingAdapter()
+        client.mount(client.base_url, client.transport)
+        return client
+
+    def test_rejected_call(self):
+        self.rejected_client().get("/api/me")
+        self.assertFalse(self.profile.session_valid)
+        self.assertFalse(self.stored().session_valid)
+
+    def test_rejected_call_by_clone(self):
+        clone = self.rejected_client().clone()
+        thread = threading.Thread(target=clone.get, args=["/api/me"])
+        thread.start()
+        thread.join()
+        self.assertFalse(self.profile.session_valid)
+        # Only saved once back on the thread that made the client
+        self.assertTrue(self.stored().session_valid)
+        self.profile.save_session_check()
+        self.assertFalse(self.stored().session_valid)
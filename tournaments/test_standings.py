@@ -0,0 +1,235 @@
+import json
+import logging
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from tournaments.models import (
+    BestWorkout,
+    PelotonProfile,
+    Ride,
+    RiderStanding,
+    TeamStanding,
+    Tournament,
+    TournamentMember,
+    TournamentRide,
+    TournamentTeam,
+    Workout,
+)
+from tournaments.standings import refresh_standings
+
+
+class StandingsTestCase(TestCase):
+    """A small tournament of two teams (and a rider yet to join one).
+
+    Every workout takes 100s, so its average output is a hundredth of its
+    total work.
+    """
+
+    # Each rider's workouts, as (ride, total_work)
+    WORKOUTS = {
+        "a1": [("r1", 100), ("r1", 300), ("r2", 200)],
+        "a2": [("r1", 50), ("r2", None)],
+        "b1": [("r2", 400), ("other-ride", 999)],
+        "u1": [("r1", 70)],
+        "not-joined": [("r1", 500)],
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        now = timezone.now()
+        self.tournament = Tournament.objects.create(
+            name="Tournament",
+            start_date=now - timedelta(days=7),
+            end_date=now + timedelta(days=7),
+        )
+        self.rides = {
+            peloton_id: Ride.objects.create(peloton_id=peloton_id, title=peloton_id)
+            for peloton_id in ("r1", "r2", "other-ride")
+        }
+        for peloton_id in ("r1", "r2"):
+            TournamentRide.objects.create(
+                tournament=self.tournament, ride=self.rides[peloton_id]
+            )
+        self.teams = {
+            name: TournamentTeam.objects.create(tournament=self.tournament, name=name)
+            for name in ("A", "B")
+        }
+        self.riders = {}
+        for username, team in [("a1", "A"), ("a2", "A"), ("b1", "B"), ("u1", None)]:
+            self.riders[username] = self.create_rider(username)
+            TournamentMember.objects.create(
+                tournament=self.tournament,
+                peloton_profile=self.riders[username],
+                team=self.teams.get(team),
+            )
+        self.create_rider("not-joined")
+        refresh_standings(self.tournament)
+
+    def create_rider(self, username: str) -> PelotonProfile:
+        profile = PelotonProfile.objects.create(username=username, peloton_id=username)
+        for i, (ride_id, total_work) in enumerate(self.WORKOUTS[username]):
+            Workout.objects.create(
+                peloton_id=f"{username}-{i}",
+                peloton_profile=profile,
+                ride=self.rides[ride_id],
+                status="COMPLETED" if total_work else "IN_PROGRESS",
+                total_work=total_work,
+                duration_seconds=100 if total_work else 0,
+                average_output=total_work / 100 if total_work else 0,
+            )
+        return profile
+
+    def best_workouts(self) -> dict:
+        return {
+            (best.peloton_profile.username, best.ride.peloton_id): (
+                best.workout.peloton_id,
+                best.total_work,
+            )
+            for best in BestWorkout.objects.filter(
+                tournament=self.tournament
+            ).select_related("peloton_profile", "ride", "workout")
+        }
+
+    def rider_standings(self) -> dict:
+        return {
+            standing.peloton_profile.username: _totals(standing)
+            for standing in RiderStanding.objects.filter(
+                tournament=self.tournament
+            ).select_related("peloton_profile")
+        }
+
+    def team_standings(self) -> dict:
+        return {
+            standing.team.name: _totals(standing)
+            for standing in TeamStanding.objects.filter(
+                tournament=self.tournament
+            ).select_related("team")
+        }
+
+
+class RefreshStandingsTests(StandingsTestCase):
+    def test_best_workouts(self):
+        self.assertEqual(
+            self.best_workouts(),
+            {
+                ("a1", "r1"): ("a1-1", 300),
+                ("a1", "r2"): ("a1-2", 200),
+                ("a2", "r1"): ("a2-0", 50),
+                ("b1", "r2"): ("b1-0", 400),
+                ("u1", "r1"): ("u1-0", 70),
+            },
+        )
+
+    def test_totals(self):
+        self.assertEqual(
+            self.rider_standings(),
+            {
+                "a1": (500, 200, 2, 2.5),
+                "a2": (50, 100, 1, 0.5),
+                "b1": (400, 100, 1, 4),
+                "u1": (70, 100, 1, 0.7),
+            },
+        )
+        self.assertEqual(
+            self.team_standings(),
+            {"A": (550, 300, 3, (3 + 2 + 0.5) / 3), "B": (400, 100, 1, 4)},
+        )
+
+    def test_refresh_for_riders(self):
+        Workout.objects.filter(peloton_id="a2-0").update(total_work=600)
+        # (Another rider's change isn't picked up until they're refreshed)
+        Workout.objects.filter(peloton_id="b1-0").update(total_work=1)
+        refresh_standings(self.tournament, profiles=[self.riders["a2"]])
+        self.assertEqual(self.best_workouts()[("a2", "r1")], ("a2-0", 600))
+        self.assertEqual(self.best_workouts()[("b1", "r2")], ("b1-0", 400))
+        self.assertEqual(self.rider_standings()["a2"][0], 600)
+        self.assertEqual(self.team_standings()["A"][0], 1100)
+
+
+class EditRefreshesStandingsTests(StandingsTestCase):
+    """Edits to the teams, riders or rides are reflected in the standings."""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create(username="owner")
+        owner = PelotonProfile.objects.create(
+            username="owner", peloton_id="owner", user=user
+        )
+        TournamentMember.objects.create(
+            tournament=self.tournament,
+            peloton_profile=owner,
+            role=TournamentMember.Role.OWNER,
+        )
+        self.client.force_login(user)
+
+    def delete(self, name: str, body: str):
+        response = self.client.delete(
+            reverse(f"tournaments:{name}", args=[self.tournament.uid]),
+            body,
+            content_type="text/plain; charset=utf-8",
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_changing_teams(self):
+        response = self.client.post(
+            reverse("tournaments:update_teams", args=[self.tournament.uid]),
+            json.dumps(
+                [
+                    {"team_id": self.teams["B"].pk, "usernames": ["a2", "u1"]},
+                    {"team_id": "unassigned", "usernames": ["b1"]},
+                ]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {team: totals[0] for team, totals in self.team_standings().items()},
+            {"A": 500, "B": 120},
+        )
+
+    def test_removing_team(self):
+        self.delete("teams", str(self.teams["A"].pk))
+        self.assertEqual(list(self.team_standings()), ["B"])
+        # (Its riders still have their own standings)
+        self.assertEqual(len(self.rider_standings()), 4)
+
+    def test_removing_rider(self):
+        self.delete("rider_search", "a1")
+        self.assertNotIn("a1", {rider for rider, _ in self.best_workouts()})
+        self.assertNotIn("a1", self.rider_standings())
+        self.assertEqual(self.team_standings()["A"], (50, 100, 1, 0.5))
+
+    def test_removing_ride(self):
+        self.delete("rides", str(self.rides["r2"].pk))
+        self.assertEqual(
+            {ride for _, ride in self.best_workouts()},
+            {"r1"},
+        )
+        self.assertEqual(self.rider_standings()["a1"], (300, 100, 1, 3))
+        self.assertNotIn("b1", self.rider_standings())
+        self.assertEqual(
+            {team: totals[0] for team, totals in self.team_standings().items()},
+            {"A": 350},
+        )
+
+
+def _totals(standing) -> tuple:
+    return (
+        standing.total_work,
+        standing.total_duration,
+        standing.workout_count,
+        standing.average_output,
+    )
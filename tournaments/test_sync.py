@@ -0,0 +1,467 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import requests
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.external.peloton import PelotonClient
+from tournaments.models import (
+    PelotonProfile,
+    Ride,
+    RiderStanding,
+    SyncCursor,
+    Tournament,
+    TournamentMember,
+    TournamentRide,
+    Workout,
+)
+from tournaments.sync import plan_sync, sync_tournament, sync_tournaments
+
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+END = datetime(2021, 4, 1, tzinfo=timezone.utc)
+
+
+def fake_client(adapter: FakePelotonAdapter) -> PelotonClient:
+    client = PelotonClient()
+    client.rate_limiter = None
+    client.response_cache = None
+    # (Also answers for the clones that fetch in other threads)
+    client.transport = adapter
+    client.mount(client.base_url, adapter)
+    return client
+
+
+class IterWorkoutsTests(SimpleTestCase):
+    def pager(self, workouts_per_user: int) -> PelotonClient:
+        self.data = FakePeloton(["ride"], START, END, workouts_per_user)
+        self.adapter = FakePelotonAdapter(self.data)
+        return fake_client(self.adapter)
+
+    def iter_workouts(self, client: PelotonClient, **kwargs):
+        """Returns the workouts listed and the `(page, limit)` of each request."""
+        with mock.patch.object(
+            self.data, "workouts", wraps=self.data.workouts
+        ) as workouts:
+            listed = [
+                workout
+                for page in client.iter_workouts("rider", **kwargs)
+                for workout in page
+            ]
+        requests = [
+            (call.kwargs["page"], call.kwargs["limit"])
+            for call in workouts.call_args_list
+        ]
+        return listed, requests
+
+    def test_pages_grow_in_line_with_offset(self):
+        client = self.pager(300)
+        workouts, requests = self.iter_workouts(client, start_date=START)
+        self.assertEqual(
+            requests, [(0, 20), (1, 20), (1, 40), (1, 80), (2, 80), (3, 80)]
+        )
+        # (Each workout listed exactly once, newest first)
+        self.assertEqual(
+            [workout["id"] for workout in workouts],
+            [f"rider-{i}" for i in range(299, -1, -1)],
+        )
+
+    def test_stops_at_total(self):
+        client = self.pager(40)
+        workouts, requests = self.iter_workouts(client, start_date=START)
+        # (No request for the empty page after the last)
+        self.assertEqual(requests, [(0, 20), (1, 20)])
+        self.assertEqual(len(workouts), 40)
+
+    def test_stops_at_start_date(self):
+        client = self.pager(300)
+        start_date = END - (END - START) / 10
+        workouts, requests = self.iter_workouts(client, start_date=start_date)
+        self.assertEqual(requests, [(0, 20), (1, 20)])
+        self.assertEqual(
+            len(workouts),
+            sum(
+                self.data._workout("rider", i)["created_at"] >= start_date.timestamp()
+                for i in range(300)
+            ),
+        )
+
+    def test_single_page_without_start_date(self):
+        client = self.pager(300)
+        workouts, requests = self.iter_workouts(client)
+        self.assertEqual(requests, [(0, 20)])
+        self.assertEqual(
+            [workout["id"] for workout in workouts],
+            [f"rider-{i}" for i in range(299, 279, -1)],
+        )
+
+    def test_prefetches_with_one_client(self):
+        client = self.pager(300)
+        prefetch_client = client.clone()
+        with mock.patch.object(PelotonClient, "clone") as clone:
+            self.iter_workouts(
+                client, start_date=START, prefetch_client=prefetch_client
+            )
+            # (Nor is one needed when there's just a single page)
+            self.iter_workouts(client, start_date=END - timedelta(days=1))
+        clone.assert_not_called()
+
+
+class PlanSyncTests(TestCase):
+    def setUp(self):
+        self.now = django_timezone.now()
+        self.riders = [
+            PelotonProfile.objects.create(username=name, peloton_id=name)
+            for name in ("both", "first", "second")
+        ]
+
+    def create_tournament(self, riders, ride_id, start_date, end_date) -> Tournament:
+        tournament = Tournament.objects.create(
+            name="Tournament", start_date=start_date, end_date=end_date
+        )
+        ride = Ride.objects.create(peloton_id=ride_id)
+        TournamentRide.objects.create(tournament=tournament, ride=ride)
+        for profile in riders:
+            TournamentMember.objects.create(
+                tournament=tournament, peloton_profile=profile
+            )
+        return tournament
+
+    def test_merges_windows_across_tournaments(self):
+        both, first_only, second_only = self.riders
+        first = self.create_tournament(
+            [both, first_only],
+            "first-ride",
+            self.now - timedelta(days=10),
+            self.now - timedelta(days=3),
+        )
+        second = self.create_tournament(
+            [second_only, both],
+            "second-ride",
+            self.now - timedelta(days=5),
+            self.now + timedelta(days=2),
+        )
+        # Already synced (completely) part way through the second tournament
+        synced_to = self.now - timedelta(days=1)
+        SyncCursor.objects.create(
+            tournament=second,
+            peloton_profile=both,
+            latest_workout_at=synced_to,
+            is_finalized=True,
+        )
+        clients = {first: PelotonClient(), second: PelotonClient()}
+
+        plans = {plan.profile: plan for plan in plan_sync(clients)}
+        self.assertEqual(set(plans), {both, first_only, second_only})
+
+        plan = plans[both]
+        self.assertEqual(
+            [window.tournament for window in plan.windows], [first, second]
+        )
+        self.assertIs(plan.client, clients[first])
+        self.assertEqual(plan.start_date, first.start_date)
+        self.assertEqual(plan.end_date, second.end_date + timedelta(hours=17))
+        first_window, second_window = plan.windows
+        self.assertEqual(first_window.ride_ids, {"first-ride"})
+        self.assertIsNone(first_window.cursor)
+        self.assertEqual(second_window.ride_ids, {"second-ride"})
+        self.assertEqual(second_window.start_date, synced_to)
+
+        self.assertEqual(len(plans[first_only].windows), 1)
+        self.assertEqual(plans[second_only].start_date, second.start_date)
+        self.assertIs(plans[second_only].client, clients[second])
+
+
+class FakeSyncTestCase(TestCase):
+    """Syncs against a `FakePeloton`, where each rider has done every ride."""
+
+    RIDE_IDS = ["first-ride", "second-ride", "other-ride"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.data = FakePeloton(self.RIDE_IDS, START, END, workouts_per_user=30)
+        self.adapter = FakePelotonAdapter(self.data)
+        self.peloton = fake_client(self.adapter)
+
+    def create_tournament(self, ride_ids, usernames, end_date=END) -> Tournament:
+        tournament = Tournament.objects.create(
+            name="Tournament", start_date=START, end_date=end_date
+        )
+        for ride_id in ride_ids:
+            ride, _ = Ride.objects.get_or_create(peloton_id=ride_id)
+            TournamentRide.objects.create(tournament=tournament, ride=ride)
+        for username in usernames:
+            profile, _ = PelotonProfile.objects.get_or_create(
+                username=username, peloton_id=username
+            )
+            TournamentMember.objects.create(
+                tournament=tournament, peloton_profile=profile
+            )
+        return tournament
+
+    def best_work(self, username: str, ride_ids) -> float:
+        """Totals the rider's best output for each of the rides, from the fake."""
+        best = {}
+        for i in range(self.data.workouts_per_user):
+            workout = self.data._workout(username, i)
+            ride_id = workout["ride"]["id"]
+            if ride_id in ride_ids:
+                best[ride_id] = max(best.get(ride_id, 0), workout["total_work"])
+        return sum(best.values())
+
+    def assertSynced(self, tournament: Tournament, ride_ids):
+        self.assertIsNotNone(tournament.last_synced)
+        standings = {
+            standing.peloton_profile.username: standing
+            for standing in RiderStanding.objects.filter(
+                tournament=tournament
+            ).select_related("peloton_profile")
+        }
+        riders = tournament.participants.all()
+        self.assertEqual(set(standings), {rider.username for rider in riders})
+        for rider in riders:
+            with self.subTest(rider=rider.username):
+                # (Workouts of rides outside the tournament aren't kept)
+                self.assertEqual(
+                    set(
+                        Workout.objects.filter(peloton_profile=rider).values_list(
+                            "ride__peloton_id", flat=True
+                        )
+                    ),
+                    set(ride_ids),
+                )
+                standing = standings[rider.username]
+                self.assertEqual(standing.workout_count, len(ride_ids))
+                self.assertAlmostEqual(
+                    standing.total_work, self.best_work(rider.username, ride_ids)
+                )
+
+    def sync(self, tournament: Tournament) -> int:
+        """Syncs the tournament, returning how many pages of workouts were listed."""
+        with mock.patch.object(
+            self.data, "workouts", wraps=self.data.workouts
+        ) as workouts:
+            sync_tournament(tournament, self.peloton)
+        tournament.refresh_from_db()
+        return workouts.call_count
+
+
+class SyncTournamentTests(FakeSyncTestCase):
+    def test_syncs_riders_concurrently(self):
+        for concurrency in (1, 4):
+            with self.subTest(concurrency=concurrency), override_settings(
+                SYNC_CONCURRENCY=concurrency
+            ):
+                ride_ids = self.RIDE_IDS[:2]
+                tournament = self.create_tournament(
+                    ride_ids, [f"rider-{concurrency}-{i}" for i in range(6)]
+                )
+                self.adapter.calls.clear()
+                sync_tournament(tournament, self.peloton)
+                self.assertEqual(self.adapter.calls["user"], 6)
+                tournament.refresh_from_db()
+                self.assertSynced(tournament, ride_ids)
+
+    @override_settings(SYNC_CONCURRENCY=2)
+    def test_worker_error_stops_others(self):
+        usernames = ["broken"] + [f"rider-{i}" for i in range(10)]
+        tournament = self.create_tournament(self.RIDE_IDS, usernames)
+        self.adapter.latency = 0.01
+        user = self.data.user
+        with mock.patch.object(
+            self.data,
+            "user",
+            side_effect=lambda user_id: None if user_id == "broken" else user(user_id),
+        ):
+            with self.assertRaises(requests.HTTPError):
+                sync_tournament(tournament, self.peloton)
+            calls = sum(self.adapter.calls.values())
+
+        # The other worker finished up with the rider it was on, and no more
+        self.assertLess(self.adapter.calls["user"], len(usernames))
+        self.assertEqual(sum(self.adapter.calls.values()), calls)
+        self.assertFalse(SyncCursor.objects.filter(tournament=tournament).exists())
+        tournament.refresh_from_db()
+        self.assertIsNone(tournament.last_synced)
+
+    def test_shared_riders_fetched_once(self):
+        tournaments = {
+            self.create_tournament(
+                ["first-ride", "second-ride"], ["shared-1", "shared-2", "only-1"]
+            ): self.peloton,
+            self.create_tournament(
+                ["second-ride", "other-ride"], ["shared-1", "shared-2", "only-2"]
+            ): fake_client(self.adapter),
+        }
+        self.adapter.calls.clear()
+        sync_tournaments(tournaments)
+        self.assertEqual(self.adapter.calls["user"], 4)
+
+        for tournament in tournaments:
+            tournament.refresh_from_db()
+            self.assertIsNotNone(tournament.last_synced)
+            ride_ids = set(tournament.rides.values_list("peloton_id", flat=True))
+            standings = RiderStanding.objects.filter(
+                tournament=tournament
+            ).select_related("peloton_profile")
+            self.assertEqual(
+                {
+                    standing.peloton_profile.username: (
+                        standing.workout_count,
+                        round(standing.total_work, 6),
+                    )
+                    for standing in standings
+                },
+                {
+                    rider.username: (
+                        len(ride_ids),
+                        round(self.best_work(rider.username, ride_ids), 6),
+                    )
+                    for rider in tournament.participants.all()
+                },
+            )
+
+
+class SyncCursorTests(FakeSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ride_ids = self.RIDE_IDS[:2]
+        self.tournament = self.create_tournament(self.ride_ids, ["rider"])
+        self.newest_workout_at = datetime.fromtimestamp(
+            self.data._workout("rider", self.data.workouts_per_user - 1)["created_at"],
+            timezone.utc,
+        )
+
+    def test_resumes_from_latest_workout(self):
+        self.assertEqual(self.sync(self.tournament), 2)
+        cursor = SyncCursor.objects.get(tournament=self.tournament)
+        self.assertEqual(cursor.latest_workout_at, self.newest_workout_at)
+        self.assertTrue(cursor.is_finalized)
+
+        # Only the newest page is listed again
+        self.assertEqual(self.sync(self.tournament), 1)
+        self.assertSynced(self.tournament, self.ride_ids)
+
+    def test_kept_when_sync_fails(self):
+        profile = PelotonProfile.objects.get(username="rider")
+        synced_to = START + timedelta(days=30)
+        cursor = SyncCursor.objects.create(
+            tournament=self.tournament,
+            peloton_profile=profile,
+            latest_workout_at=synced_to,
+            is_finalized=True,
+        )
+        with mock.patch.object(
+            Workout, "from_peloton_data_many", side_effect=RuntimeError("Rolled back")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.sync(self.tournament)
+        cursor.refresh_from_db()
+        self.assertEqual(cursor.latest_workout_at, synced_to)
+        self.assertIsNone(self.tournament.last_synced)
+
+        self.sync(self.tournament)
+        cursor.refresh_from_db()
+        self.assertEqual(cursor.latest_workout_at, self.newest_workout_at)
+
+
+class SyncCursorResetTests(FakeSyncTestCase):
+    """Edits that could make skipped workouts count make the next sync start over."""
+
+    def setUp(self):
+        super().setUp()
+        # (Ending just before noon, as the edit form sets it)
+        self.tournament = self.create_tournament(
+            self.RIDE_IDS[:1],
+            ["rider"],
+            end_date=datetime(2021, 4, 1, 11, 59, 59, 999000, timezone.utc),
+        )
+        user = User.objects.create(username="admin")
+        admin = PelotonProfile.objects.create(
+            username="admin",
+            peloton_id="admin",
+            user=user,
+            peloton_session_id="session",
+            session_valid=True,
+            session_verified_at=django_timezone.now(),
+        )
+        TournamentMember.objects.create(
+            tournament=self.tournament,
+            peloton_profile=admin,
+            role=TournamentMember.Role.OWNER,
+        )
+        self.client.force_login(user)
+        self.sync(self.tournament)
+        self.assertEqual(self.cursors(), 2)
+
+    def cursors(self) -> int:
+        return SyncCursor.objects.filter(tournament=self.tournament).count()
+
+    def edit(self, start_date: str, end_date: str):
+        response = self.client.post(
+            reverse("tournaments:edit", args=[self.tournament.uid, "settings"]),
+            {
+                "tournament_name": "Tournament",
+                "start_date": start_date,
+                "end_date": end_date,
+                "visibility": Tournament.Visibility.PUBLIC,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_narrowing_dates(self):
+        self.edit("2021-01-15", "2021-04-01")
+        self.assertEqual(self.cursors(), 2)
+        self.edit("2021-01-15", "2021-03-15")
+        self.assertEqual(self.cursors(), 2)
+
+    def test_moving_start_date_earlier(self):
+        self.edit("2020-12-01", "2021-04-01")
+        self.assertEqual(self.cursors(), 0)
+
+    def test_moving_end_date_later(self):
+        self.edit("2021-01-01", "2021-05-01")
+        self.assertEqual(self.cursors(), 0)
+
+    def test_adding_ride(self):
+        rides_url = reverse("tournaments:rides", args=[self.tournament.uid])
+        with mock.patch.multiple(
+            PelotonClient,
+            transport=self.adapter,
+            rate_limiter=None,
+            response_cache=None,
+        ):
+            response = self.client.post(
+                rides_url,
+                json.dumps({"ride_id": self.RIDE_IDS[1]}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.cursors(), 0)
+
+        # So the workouts of the new ride are picked up, however old
+        self.assertEqual(self.sync(self.tournament), 4)
+        self.assertSynced(self.tournament, self.RIDE_IDS[:2])
+
+        # (Removing one doesn't need a full sync)
+        response = self.client.delete(
+            rides_url,
+            str(Ride.objects.get(peloton_id="second-ride").pk),
+            content_type="text/plain; charset=utf-8",
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.cursors(), 2)
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from django.utils.http import http_date
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.external.peloton import PelotonClient
+from tournaments.external.throttling import RetryPolicy, TokenBucket
+
+
+class FakeClock:
+    """Wall clock time that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 1_600_000_000.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _response(status: int, **headers) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=4, backoff=0.5, max_delay=30)
+
+    def test_retry_after_seconds(self):
+        response = _response(429, **{"Retry-After": "3"})
+        self.assertEqual(self.policy.get_delay("GET", 1, response), 3)
+
+    def test_retry_after_date(self):
+        response = _response(503, **{"Retry-After": http_date(time.time() + 10)})
+        self.assertAlmostEqual(self.policy.get_delay("GET", 1, response), 10, delta=1)
+
+    def test_retry_after_too_long(self):
+        # Not worth waiting for, so the 429 is returned as-is
+        response = _response(429, **{"Retry-After": "120"})
+        self.assertIsNone(self.policy.get_delay("GET", 1, response))
+
+    def test_backoff(self):
+        for attempt in (1, 2, 3):
+            with self.subTest(attempt=attempt):
+                for response in (None, _response(502)):
+                    delay = self.policy.get_delay("GET", attempt, response)
+                    self.assertGreaterEqual(delay, 0)
+                    self.assertLessEqual(delay, 0.5 * 2**attempt)
+
+    def test_gives_up(self):
+        throttled = _response(429, **{"Retry-After": "1"})
+        self.assertIsNone(self.policy.get_delay("GET", 4, throttled))
+        self.assertIsNone(self.policy.get_delay("POST", 1, throttled))
+        self.assertIsNone(self.policy.get_delay("GET", 1, _response(404)))
+
+    def test_client_waits_as_asked(self):
+        adapter = FakePelotonAdapter(
+            FakePeloton(["ride"], datetime(2021, 1, 1), datetime(2021, 2, 1)),
+            throttle_rate=1,
+            retry_after=2,
+        )
+        client = PelotonClient()
+        client.rate_limiter = None
+        client.retry_policy = self.policy
+        client.mount(client.base_url, adapter)
+        with mock.patch("tournaments.external.peloton.time.sleep") as sleep:
+            response = client.get("/api/user/rider")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(adapter.calls["throttled"], 4)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2, 2, 2])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "bucket.json")
+
+    def bucket(self) -> TokenBucket:
+        return TokenBucket(
+            self.path, rate=2, capacity=4, clock=self.clock, sleep=self.clock.sleep
+        )
+
+    def test_bursts_then_waits(self):
+        bucket = self.bucket()
+        for _ in range(4):
+            self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 0.5)
+        self.assertEqual(bucket.acquire(2), 1)
+        self.assertEqual(self.clock.slept, [0.5, 1])
+
+    def test_refills_up_to_capacity(self):
+        bucket = self.bucket()
+        bucket.acquire(4)
+        self.clock.now += 60
+        self.assertEqual(bucket.acquire(4), 0)
+        self.assertEqual(bucket.acquire(), 0.5)
+
+    def test_shared_through_the_file(self):
+        # (Anything pointed at the same file, e.g. - each gunicorn worker)
+        self.bucket().acquire(4)
+        self.assertEqual(self.bucket().acquire(), 0.5)
+
+    def test_reset(self):
+        bucket = self.bucket()
+        bucket.acquire(4)
+        bucket.reset()
+        self.assertEqual(bucket.acquire(4), 0)
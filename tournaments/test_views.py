@@ -0,0 +1,192 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tournaments.external.fake_peloton import FakePeloton, FakePelotonAdapter
+from tournaments.leaderboard import stream_leaderboard
+from tournaments.models import (
+    PelotonProfile,
+    Tournament,
+    TournamentMember,
+    TournamentTeam,
+)
+from tournaments.sync import sync_tournament
+from tournaments.test_standings import StandingsTestCase
+from tournaments.test_sync import fake_client
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class DetailFragmentCacheTests(StandingsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.tournament.visibility = Tournament.Visibility.PUBLIC
+        self.tournament.last_synced = timezone.now()
+        self.tournament.save()
+        self.team = self.teams["A"]
+        self.team.name = "Original team"
+        self.team.save()
+        self.url = reverse("tournaments:detail", args=[self.tournament.uid])
+
+    def test_renamed_team(self):
+        self.assertContains(self.client.get(self.url), "Original team", count=2)
+
+        # (A change behind the tournament's back is still served from the cache)
+        TournamentTeam.objects.filter(pk=self.team.pk).update(name="Updated team")
+        response = self.client.get(self.url)
+        self.assertContains(response, "Original team", count=2)
+        self.assertNotContains(response, "Updated team")
+
+        self.team.name = "Renamed team"
+        self.team.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Renamed team", count=2)
+        self.assertNotContains(response, "Original team")
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class ConditionalGetTests(StandingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tournament.visibility = Tournament.Visibility.PUBLIC
+        self.tournament.save()
+        self.admin = self.create_user(
+            PelotonProfile.objects.create(username="owner", peloton_id="owner")
+        )
+        TournamentMember.objects.create(
+            tournament=self.tournament,
+            peloton_profile=self.admin.profile,
+            role=TournamentMember.Role.OWNER,
+        )
+        self.member = self.create_user(self.riders["a1"])
+        self.url = reverse("tournaments:detail", args=[self.tournament.uid])
+
+    def create_user(self, profile: PelotonProfile) -> User:
+        profile.user = User.objects.create(username=profile.username)
+        profile.peloton_session_id = "session"
+        profile.session_valid = True
+        profile.session_verified_at = timezone.now()
+        profile.save()
+        return profile.user
+
+    def etag(self, user: User = None, url: str = None) -> str:
+        if user:
+            self.client.force_login(user)
+        else:
+            self.client.logout()
+        response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def assertNotModified(self, etag: str, url: str = None):
+        response = self.client.get(url or self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified(self):
+        for user in (None, self.member, self.admin):
+            with self.subTest(user=user):
+                self.assertNotModified(self.etag(user))
+
+        # Anonymous users (and shared caches) can also revalidate by date
+        self.client.logout()
+        response = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+        self.client.force_login(self.member)
+        self.assertFalse(self.client.get(self.url).has_header("Last-Modified"))
+
+    def test_differs_by_user(self):
+        etags = {self.etag(), self.etag(self.member), self.etag(self.admin)}
+        self.assertEqual(len(etags), 3)
+
+    def test_changes_after_edit(self):
+        etag = self.etag(self.admin)
+        response = self.client.post(
+            reverse("tournaments:edit", args=[self.tournament.uid, "settings"]),
+            {
+                "tournament_name": "Renamed",
+                "start_date": self.tournament.start_date.date().isoformat(),
+                "end_date": self.tournament.end_date.date().isoformat(),
+                "visibility": Tournament.Visibility.PUBLIC,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed")
+
+    def test_changes_after_sync(self):
+        etags = [self.etag(), self.etag(self.admin)]
+        data = FakePeloton(
+            ["r1", "r2"], self.tournament.start_date, self.tournament.end_date
+        )
+        sync_tournament(self.tournament, fake_client(FakePelotonAdapter(data)))
+        self.assertNotEqual(self.etag(), etags[0])
+        self.assertNotEqual(self.etag(self.admin), etags[1])
+
+    def test_index(self):
+        index_url = reverse("tournaments:index")
+        etag = self.etag(self.admin, index_url)
+        self.assertNotModified(etag, index_url)
+        self.assertNotEqual(self.etag(self.member, index_url), etag)
+
+        # Edits to a tournament listed change it
+        self.client.force_login(self.admin)
+        self.tournament.bump_revision()
+        self.assertNotEqual(self.etag(self.admin, index_url), etag)
+
+
+class LeaderboardAPITests(StandingsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("tournaments:api_leaderboard", args=[self.tournament.uid])
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def leaderboard(self, response) -> dict:
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        return json.loads(response.getvalue())
+
+    def test_public(self):
+        self.tournament.visibility = Tournament.Visibility.PUBLIC
+        self.tournament.save()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.leaderboard(response),
+            json.loads("".join(stream_leaderboard(self.tournament))),
+        )
+        self.assertEqual(response["Cache-Control"], "public, no-cache")
+
+    def test_private(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.client.force_login(User.objects.create(username="rider"))
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [team["name"] for team in self.leaderboard(response)["teams"]], ["A", "B"]
+        )
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+    def test_not_modified(self):
+        self.tournament.visibility = Tournament.Visibility.PUBLIC
+        self.tournament.save()
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.tournament.bump_revision()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
@@ -10,6 +10,12 @@ urlpatterns = [
     path("new/", views.CreateView.as_view(), name="create"),
     # ex: /tournaments/authorize
     path("authorize/", views.LinkProfileView.as_view(), name="authorize"),
+    # ex: /api/v1/ZuwX4mKCPgK06sIin8QJxQ/leaderboard
+    path(
+        "api/v1/<uid>/leaderboard",
+        views.LeaderboardAPIView.as_view(),
+        name="api_leaderboard",
+    ),
     # ex: /ZuwX4mKCPgK06sIin8QJxQ/
     path("<uid>/", views.DetailView.as_view(), name="detail"),
     # ex: /ZuwX4mKCPgK06sIin8QJxQ/edit
@@ -17,6 +23,8 @@ urlpatterns = [
     path("<uid>/edit/<tab>", views.EditView.as_view(), name="edit"),
     # ex: /ZuwX4mKCPgK06sIin8QJxQ/sync
     path("<uid>/sync", views.SyncView.as_view(), name="sync"),
+    # ex: /ZuwX4mKCPgK06sIin8QJxQ/sync/V1StGXR8_Z5jdHi6B-myT
+    path("<uid>/sync/<job_uid>", views.SyncStatusView.as_view(), name="sync_status"),
     # ex: /ZuwX4mKCPgK06sIin8QJxQ/rider_search
     path("<uid>/rider_search", views.RiderSearchView.as_view(), name="rider_search"),
     # ex: /ZuwX4mKCPgK06sIin8QJxQ/teams
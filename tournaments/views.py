@@ -1,48 +1,108 @@
+import hashlib
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import Optional
 
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, HttpResponseNotFound, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db.models import (
+    Case,
+    Prefetch,
+    Value,
+    When,
+    prefetch_related_objects,
+)
+from django.http import (
+    HttpResponse,
+    HttpResponseNotFound,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render, reverse
 from django.utils import dateparse, timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
 from django.views import generic
+from django.views.decorators.http import condition
 
-from .external.peloton import BadCredentials, NotAuthenticated, PelotonClient
+from .dashboard import bucket_filters, load_dashboard
+from .external.peloton import BadCredentials, PelotonClient
+from .leaderboard import Leaderboard, stream_leaderboard
 from .models import (
     PelotonProfile,
     Ride,
+    SyncJob,
     Tournament,
     TournamentMember,
     TournamentRide,
     TournamentTeam,
-    Workout,
 )
+from .standings import refresh_standings, refresh_team_standings
+
+
+def _index_state(request) -> Optional[list]:
+    """Lists which tournaments the index page shows (and when they last changed).
+
+    Returns `None` for users without a linked Peloton profile.
+    """
+    if not hasattr(request, "_index_state"):
+        profile = getattr(request.user, "profile", None)
+        state = None
+        if profile:
+            filters = bucket_filters(datetime.utcnow())
+            state = list(
+                Tournament.objects.filter(participants=profile)
+                .annotate(
+                    listed_as=Case(
+                        *(When(q, then=Value(key)) for key, q in filters.items()),
+                    )
+                )
+                .exclude(listed_as=None)
+                .order_by("pk")
+                .values_list("uid", "modified_at", "last_synced", "listed_as")
+            )
+        request._index_state = state
+    return request._index_state
+
+
+def _session_state(request) -> Optional[bool]:
+    """Whether the user's Peloton session is valid, as their pages will show it.
+
+    Re-checked with Peloton once the last check expires, which a page
+    answered with a 304 would otherwise never do.
+    """
+    profile = getattr(request.user, "profile", None)
+    return profile.has_valid_session() if profile else None
+
+
+def _index_etag(request) -> Optional[str]:
+    state = _index_state(request)
+    if state is None:
+        return None
+    return _make_etag(request.user.pk, _session_state(request), state)
 
 
 class IndexView(LoginRequiredMixin, generic.View):
+    @method_decorator(condition(etag_func=_index_etag))
     def get(self, request):
-        now = datetime.utcnow()
-        tournaments = {}
-        if hasattr(request.user, "profile"):
-            common_filters = {"participants": self.request.user.profile}
-            tournaments["upcoming"] = Tournament.objects.filter(
-                start_date__gt=now,
-                start_date__lte=now + timedelta(weeks=2),
-                **common_filters,
-            ).order_by("-start_date")
-            tournaments["active"] = Tournament.objects.filter(
-                start_date__lte=now,
-                end_date__gte=now,
-                **common_filters,
-            ).order_by("-start_date")
-            tournaments["recent"] = Tournament.objects.filter(
-                end_date__lt=now,
-                end_date__gte=now - timedelta(weeks=2),
-                **common_filters,
-            ).order_by("-start_date")
-        context = {"tournaments": tournaments}
-        return render(request, "tournaments/index.html", context)
+        context = {"tournaments": {}, "has_valid_session": False}
+        profile = getattr(request.user, "profile", None)
+        if profile:
+            # Cached under the ETag, which changes with any tournament listed
+            # (e.g. - when it's edited, synced, or joined or left by the rider)
+            key = f"dashboard:{_index_etag(request)}"
+            context["tournaments"] = cache.get_or_set(
+                key,
+                lambda: load_dashboard(profile, datetime.utcnow()),
+                settings.DASHBOARD_CACHE_TIMEOUT,
+            )
+            context["has_valid_session"] = profile.has_valid_session()
+        response = render(request, "tournaments/index.html", context)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class CreateView(generic.View):
@@ -73,20 +133,128 @@ class CreateView(generic.View):
         return redirect("tournaments:detail", tournament.uid)
 
 
+def _can_view(request, visibility: str) -> bool:
+    """Whether the user can see a tournament with the given visibility."""
+    return visibility == Tournament.Visibility.PUBLIC or request.user.is_authenticated
+
+
+def _detail_state(request, uid) -> Optional[dict]:
+    """Loads just what's needed to validate a cached tournament page.
+
+    Returns `None` if the page doesn't exist or can't be viewed, so that the
+    view itself responds (with a 404 or 403).
+    """
+    if not hasattr(request, "_tournament_state"):
+        state = (
+            Tournament.objects.filter(uid=uid)
+            .values("visibility", "revision", "last_synced", "modified_at")
+            .first()
+        )
+        if state and not _can_view(request, state["visibility"]):
+            state = None
+        request._tournament_state = state
+    return request._tournament_state
+
+
+def _detail_etag(request, uid) -> Optional[str]:
+    state = _detail_state(request, uid)
+    if not state:
+        return None
+    parts = [state["revision"], state["last_synced"], state["modified_at"]]
+    if request.user.is_authenticated:
+        # Logged in users see their own admin controls and session status
+        parts += [request.user.pk, _session_state(request)]
+    return _make_etag(*parts)
+
+
+def _leaderboard_etag(request, uid) -> Optional[str]:
+    state = _detail_state(request, uid)
+    if not state:
+        return None
+    return _make_etag(state["revision"], state["last_synced"], state["modified_at"])
+
+
+def _leaderboard_last_modified(request, uid) -> Optional[datetime]:
+    state = _detail_state(request, uid)
+    if not state:
+        return None
+    return max(filter(None, [state["modified_at"], state["last_synced"]]))
+
+
+def _detail_last_modified(request, uid) -> Optional[datetime]:
+    state = _detail_state(request, uid)
+    # Pages rendered for a user can only be validated by their ETag
+    if not state or request.user.is_authenticated:
+        return None
+    return max(filter(None, [state["modified_at"], state["last_synced"]]))
+
+
 class DetailView(generic.View):
+    @method_decorator(
+        condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+    )
     def get(self, request, uid):
         tournament = get_object_or_404(Tournament, uid=uid)
-        if not (
-            tournament.visibility == Tournament.Visibility.PUBLIC
-            or request.user.is_authenticated
-        ):
+        if not _can_view(request, tournament.visibility):
             raise PermissionDenied()
-        context = {"tournament": tournament}
-        return render(request, "tournaments/detail.html", context)
+        # The team list and leaderboard are cached under `cache_version`, so
+        # they're only loaded if the template misses the cache
+        context = {
+            "tournament": tournament,
+            "teams_tournament": SimpleLazyObject(
+                lambda: _with_teams_prefetched(tournament)
+            ),
+            "leaderboard": SimpleLazyObject(
+                lambda: Leaderboard.for_tournament(tournament)
+            ),
+            "team_count": tournament.teams.count(),
+            "participant_count": tournament.participants.count(),
+            "is_admin": _is_admin(request, tournament),
+            "fragment_cache_timeout": settings.TOURNAMENT_FRAGMENT_CACHE_TIMEOUT,
+        }
+        response = render(request, "tournaments/detail.html", context)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            # Let shared caches (e.g. - a CDN) keep public pages, but always revalidate
+            patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+class LeaderboardAPIView(generic.View):
+    @method_decorator(
+        condition(
+            etag_func=_leaderboard_etag, last_modified_func=_leaderboard_last_modified
+        )
+    )
+    def get(self, request, uid):
+        tournament = get_object_or_404(Tournament, uid=uid)
+        if not _can_view(request, tournament.visibility):
+            raise PermissionDenied()
+        response = StreamingHttpResponse(
+            stream_leaderboard(tournament), content_type="application/json"
+        )
+        if tournament.visibility == Tournament.Visibility.PUBLIC:
+            # Same for every viewer, so shared caches can keep it (but must revalidate)
+            patch_cache_control(response, public=True, no_cache=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class EditView(LoginRequiredMixin, generic.View):
     SETTINGS_TABS = {"settings", "rides", "teams", "permissions"}
+    # What each tab lists, loaded up front rather than per row
+    TAB_PREFETCHES = {
+        "rides": [Prefetch("rides", Ride.objects.select_related("instructor"))],
+        "teams": ["teams__members"],
+        "permissions": [
+            Prefetch(
+                "tournamentmember_set",
+                TournamentMember.objects.select_related("peloton_profile"),
+            )
+        ],
+    }
 
     def get(self, request, uid, tab=None):
         # Redirect to the default settings tab (keeps URL consistent)
@@ -95,7 +263,10 @@ class EditView(LoginRequiredMixin, generic.View):
         elif tab not in self.SETTINGS_TABS:
             return HttpResponseNotFound()
 
-        tournament = get_object_or_404(Tournament, uid=uid)
+        tournament = get_object_or_404(
+            Tournament.objects.prefetch_related(*self.TAB_PREFETCHES.get(tab, [])),
+            uid=uid,
+        )
         if request.user.profile not in tournament.admins:
             raise PermissionDenied()
         context = {"tournament": tournament, "settings_tab": tab}
@@ -118,11 +289,17 @@ class EditView(LoginRequiredMixin, generic.View):
             dateparse.parse_date(request.POST["end_date"]),
             dateparse.parse_time("11:59:59.999"),
         )
+        start_date = timezone.utc.localize(start_date)
+        end_date = timezone.utc.localize(end_date)
+        if start_date < tournament.start_date or end_date > tournament.end_date:
+            # Workouts outside the old window were never looked at
+            tournament.reset_sync_cursors()
         tournament.name = request.POST["tournament_name"]
-        tournament.start_date = timezone.utc.localize(start_date)
-        tournament.end_date = timezone.utc.localize(end_date)
+        tournament.start_date = start_date
+        tournament.end_date = end_date
         tournament.visibility = request.POST["visibility"]
         tournament.save()
+        tournament.bump_revision()
 
         # Redirect to either the tournament page (new) or setting (edit)
         return redirect("tournaments:detail", tournament.uid)
@@ -135,43 +312,19 @@ class SyncView(LoginRequiredMixin, generic.View):
         if request.user.profile not in tournament.admins:
             raise PermissionDenied()
 
-        # Create a client logged into the Peloton API
-        profile = request.user.profile
-        client = PelotonClient()
-        try:
-            if profile.peloton_session_id:
-                client.load_session(profile.peloton_session_id)
-        except NotAuthenticated:
-            pass
-
-        # Sync the rides (updates ride metadata, regardless of activity or participants)
-        for ride in tournament.rides.all():
-            ride.update_from_api(client)
-            ride.save()
-
-        # Sync all relevant workouts from this tournament
-        for participant in tournament.participants.all():
-            # Sync user first (updates profile metadata)
-            participant.update_from_api(client)
-            participant.save()
-
-            # Then download the workouts
-            workouts = client.get_workouts(
-                user_id=participant.peloton_id,
-                start_date=tournament.start_date,
-                # TODO[RWS]: HACK!  This is covering for two bugs:
-                #   1. The end date is set to noon, not midnight (+12)
-                #   2. The start/end dates are non-configurably anchored in UTC (+5)
-                end_date=tournament.end_date + timedelta(hours=17),
-                ride_ids=tournament.rides.values_list("peloton_id", flat=True),
-            )
-            for workout_data in workouts:
-                Workout.from_peloton_id(workout_data["id"], client)
+        # Queue the sync for the background worker (or join one already queued)
+        job = SyncJob.enqueue(tournament, requested_by=request.user.profile)
+        return JsonResponse(_sync_job_status(job), status=202)
 
-        # Redirect back to the tournament page
-        tournament.last_synced = datetime.utcnow()
-        tournament.save()
-        return redirect("tournaments:detail", tournament.uid)
+
+class SyncStatusView(LoginRequiredMixin, generic.View):
+    def get(self, request, uid, job_uid):
+        tournament = get_object_or_404(Tournament, uid=uid)
+        if request.user.profile not in tournament.admins:
+            raise PermissionDenied()
+
+        job = get_object_or_404(SyncJob, uid=job_uid, tournament=tournament)
+        return JsonResponse(_sync_job_status(job), status=200)
 
 
 class RiderSearchView(LoginRequiredMixin, generic.View):
@@ -199,6 +352,8 @@ class RiderSearchView(LoginRequiredMixin, generic.View):
                 peloton_profile=profile,
                 role=TournamentMember.Role.MEMBER,
             )
+            refresh_standings(tournament, profiles=[profile])
+            tournament.bump_revision()
 
         return redirect("tournaments:edit", uid, "teams")
 
@@ -212,6 +367,10 @@ class RiderSearchView(LoginRequiredMixin, generic.View):
             tournament=tournament,
             peloton_profile__username=username,
         ).delete()
+        refresh_standings(
+            tournament, profiles=PelotonProfile.objects.filter(username=username)
+        )
+        tournament.bump_revision()
         return HttpResponse(status=204)
 
 
@@ -222,6 +381,7 @@ class EditTeamsView(LoginRequiredMixin, generic.View):
             raise PermissionDenied()
 
         team_name = request.POST["new_team_name"]
+        # (Which bumps the tournament's revision)
         TournamentTeam.objects.create(
             tournament=tournament,
             name=team_name,
@@ -236,6 +396,8 @@ class EditTeamsView(LoginRequiredMixin, generic.View):
         # Delete the team (cascade for members is setup to unassign them)
         team_id = request.body.decode(request.encoding)
         TournamentTeam.objects.filter(id=team_id).delete()
+        refresh_team_standings(tournament)
+        tournament.bump_revision()
         return HttpResponse(status=204)
 
 
@@ -257,6 +419,8 @@ class UpdateTeamsView(LoginRequiredMixin, generic.View):
             else:
                 team = TournamentTeam.objects.get(pk=team_id)
                 members.update(team=team)
+        refresh_team_standings(tournament)
+        tournament.bump_revision()
         return HttpResponse(status=200)
 
 
@@ -271,6 +435,7 @@ class UpdatePermissionsView(LoginRequiredMixin, generic.View):
             TournamentMember.objects.filter(id=item["tournament_member_id"]).update(
                 role=item["role"]
             )
+        tournament.bump_revision()
 
         return HttpResponse(status=200)
 
@@ -311,6 +476,10 @@ class EditRidesView(LoginRequiredMixin, generic.View):
             tournament=tournament,
             ride=ride,
         )
+        # Workouts for the new ride may predate the participants' sync cursors
+        tournament.reset_sync_cursors()
+        refresh_standings(tournament)
+        tournament.bump_revision()
         return redirect("tournaments:edit", uid, "rides")
 
     def delete(self, request, uid):
@@ -323,6 +492,8 @@ class EditRidesView(LoginRequiredMixin, generic.View):
             tournament=tournament,
             ride__id=ride_id,
         ).delete()
+        refresh_standings(tournament)
+        tournament.bump_revision()
         return HttpResponse(status=204)
 
 
@@ -350,6 +521,8 @@ class LinkProfileView(LoginRequiredMixin, generic.View):
         profile.user = request.user
         profile.peloton_session_id = login_resp["session_id"]
         profile.last_linked = datetime.utcnow()
+        profile.session_valid = True
+        profile.session_verified_at = timezone.now()
         profile.save()
 
         # Redirect to the tournaments page
@@ -364,8 +537,33 @@ class LinkProfileView(LoginRequiredMixin, generic.View):
         )
 
 
+def _is_admin(request, tournament: Tournament) -> bool:
+    profile = getattr(request.user, "profile", None)
+    return bool(profile) and tournament.admins.filter(pk=profile.pk).exists()
+
+
+def _with_teams_prefetched(tournament: Tournament) -> Tournament:
+    prefetch_related_objects([tournament], "teams__members")
+    return tournament
+
+
+def _make_etag(*parts) -> str:
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
 def _get_client(request) -> PelotonClient:
-    profile = request.user.profile
-    client = PelotonClient()
-    client.load_session(profile.peloton_session_id)
-    return client
+    return request.user.profile.get_client()
+
+
+def _sync_job_status(job: SyncJob) -> dict:
+    return {
+        "job_id": job.uid,
+        "status": job.status,
+        "done": job.is_done,
+        "progress": {"current": job.progress_current, "total": job.progress_total},
+        "error": job.error,
+        "last_synced": job.tournament.last_synced,
+        "status_url": reverse(
+            "tournaments:sync_status", args=[job.tournament.uid, job.uid]
+        ),
+    }